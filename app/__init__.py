@@ -1,14 +1,35 @@
+import time
+_inicio_importacion = time.perf_counter()
+
 import os
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_mail import Mail
 from config import config
+from app.replica import SesionEnrutada, init_replica
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': SesionEnrutada})
 mail = Mail()
 
-def create_app(config_name=None):
-    """Factory para crear aplicación Flask"""
+# Tiempo de importación del paquete (Flask, SQLAlchemy, extensiones)
+_tiempo_importacion = time.perf_counter() - _inicio_importacion
+
+
+def scheduler_habilitado(config_name):
+    """El scheduler corre en producción o si ENABLE_SCHEDULER=true"""
+    return config_name == 'production' or os.getenv('ENABLE_SCHEDULER') == 'true'
+
+
+def create_app(config_name=None, crear_tablas=None, iniciar_tareas=None):
+    """
+    Factory para crear aplicación Flask
+    
+    crear_tablas: ejecutar db.create_all() (por defecto CREAR_TABLAS_AL_INICIAR)
+    iniciar_tareas: iniciar el scheduler en este proceso. Con gunicorn
+    (gunicorn.conf.py) se inicia después del fork en un solo worker.
+    """
+    inicio = time.perf_counter()
+    tiempos = {}
     
     app = Flask(__name__)
     
@@ -23,32 +44,58 @@ def create_app(config_name=None):
     config[config_name].validate_email_config()
     config[config_name].validate_whatsapp_config()
     
+    if crear_tablas is None:
+        crear_tablas = app.config.get('CREAR_TABLAS_AL_INICIAR', False)
+    if iniciar_tareas is None:
+        iniciar_tareas = scheduler_habilitado(config_name) and os.getenv('SCHEDULER_DIFERIDO') != 'true'
+    
+    # Alguna instancia ejecuta las tareas programadas (p. ej. el envío de resúmenes)
+    app.config['SCHEDULER_ACTIVO'] = scheduler_habilitado(config_name)
+    
     # Inicializar extensiones
     db.init_app(app)
     mail.init_app(app)
     
+    from app.motores import init_motores
+    init_motores(app, db)
+    
+    init_replica(app, db)
+    
+    from app.monitoreo import init_monitoreo
+    init_monitoreo(app, db)
+    
+    from app.fragmentos import init_plantillas
+    init_plantillas(app)
+    
+    from app.invalidacion import init_invalidacion
+    init_invalidacion(app)
+    
+    # Comandos de consola (flask --app run metricas backfill ...)
+    from app.cli import registrar_comandos
+    registrar_comandos(app)
+    
     with app.app_context():
         # Registrar blueprints
+        marca = time.perf_counter()
         from app.routes import bp
         app.register_blueprint(bp)
+        tiempos['blueprints'] = time.perf_counter() - marca
         
         # Crear tablas (solo si no existen)
-        try:
-            db.create_all()
-            print(f"✅ Base de datos inicializada ({config_name})")
-        except Exception as e:
-            print(f"⚠️  Error al crear tablas: {e}")
-        
-        # Iniciar scheduler solo en producción
-        if config_name == 'production' or os.getenv('ENABLE_SCHEDULER') == 'true':
+        if crear_tablas:
+            marca = time.perf_counter()
             try:
-                from app.scheduler import iniciar_scheduler
-                iniciar_scheduler(app)
-                print("✅ Scheduler iniciado")
-            except ImportError:
-                print("⚠️  Scheduler no disponible")
+                db.create_all()
+                print(f"✅ Base de datos inicializada ({config_name})")
             except Exception as e:
-                print(f"⚠️  Error al iniciar scheduler: {e}")
+                print(f"⚠️  Error al crear tablas: {e}")
+            tiempos['create_all'] = time.perf_counter() - marca
+        
+        # Iniciar scheduler solo en producción
+        if iniciar_tareas:
+            iniciar_scheduler_app(app)
+    
+    tiempos['create_app'] = time.perf_counter() - inicio
     
     # Log de configuración
     print(f"\n{'='*50}")
@@ -56,8 +103,23 @@ def create_app(config_name=None):
     print(f"{'='*50}")
     print(f"Entorno: {config_name.upper()}")
     print(f"Base de datos: {'PostgreSQL' if 'postgresql' in app.config['SQLALCHEMY_DATABASE_URI'] else 'SQLite'}")
+    print(f"Réplica de lectura: {'✅ Configurada' if app.config.get('SQLALCHEMY_BINDS', {}).get('replica') else '❌ No configurada'}")
     print(f"Email: {'✅ Configurado' if app.config['MAIL_USERNAME'] else '❌ No configurado'}")
     print(f"WhatsApp: {'✅ Configurado' if app.config['WHATSAPP_PHONE_NUMBER_ID'] else '❌ No configurado'}")
+    print(f"Arranque: importación {_tiempo_importacion * 1000:.0f} ms · " + 
+          ' · '.join(f"{etapa} {segundos * 1000:.0f} ms" for etapa, segundos in tiempos.items()))
     print(f"{'='*50}\n")
     
     return app
+
+
+def iniciar_scheduler_app(app):
+    """Inicia el scheduler (APScheduler se importa solo aquí)"""
+    try:
+        from app.scheduler import iniciar_scheduler
+        iniciar_scheduler(app)
+        print("✅ Scheduler iniciado")
+    except ImportError:
+        print("⚠️  Scheduler no disponible")
+    except Exception as e:
+        print(f"⚠️  Error al iniciar scheduler: {e}")
@@ -0,0 +1,294 @@
+"""
+Evaluación de reglas de alerta multinivel sobre las métricas mensuales.
+
+Las reglas son datos (REGLAS_ALERTA, o REGLAS_ALERTA en la configuración):
+agregar un nivel nuevo no requiere cambiar código. Todas las reglas se
+evalúan para todos los items con una sola consulta con ventana sobre los
+últimos meses de Metrica; las alertas nuevas se agregan en bloque y se
+omiten las que ya tienen una alerta activa del mismo tipo para el item.
+
+Condiciones soportadas (se combinan con Y):
+- semaforo + meses: los últimos `meses` meses consecutivos tienen ese semáforo
+- sin_previo: ningún mes anterior de la ventana tiene ese semáforo
+- incidencias_min: el mes evaluado tiene al menos esas incidencias
+"""
+from flask import current_app
+from sqlalchemy import select, func
+
+from app import db
+from app.models import Alerta, Metrica, Item
+from app.catalogo import obtener_items
+from app.notificaciones_service import envio_inmediato, encolar_notificacion
+from app.whatsapp_service import enviar_alerta_whatsapp
+from app.suscripciones_service import destinatarios_alerta
+
+VENTANA_MESES = 3
+
+REGLAS_ALERTA = [
+    {
+        # NIVEL 1: ALERTA INMEDIATA - ROJO PRIMERA VEZ
+        'tipo': 'rojo_inmediato',
+        'nivel_urgencia': 'critica',
+        'condicion': {'semaforo': 'rojo', 'meses': 1, 'sin_previo': 'rojo'},
+        'mensaje': '🔴 CRÍTICO: {codigo} - {nombre} ha caído en estado ROJO. '
+                   'Incidencias: {incidencias}. Cumplimiento: {porcentaje}%. '
+                   'Se requiere revisión inmediata y plan de acción correctiva.'
+    },
+    {
+        # NIVEL 2: AMARILLO PERSISTENTE
+        'tipo': 'amarillo_recurrente',
+        'nivel_urgencia': 'media',
+        'condicion': {'semaforo': 'amarillo', 'meses': 2},
+        'mensaje': '⚠️ PREVENTIVO: {codigo} - {nombre} permanece en estado AMARILLO. '
+                   'Incidencias acumuladas: {incidencias}. '
+                   'Se recomienda mantenimiento preventivo antes de que escale a crítico.'
+    },
+    {
+        # NIVEL 3: ROJO SEGUNDO MES CONSECUTIVO
+        'tipo': 'rojo_mes2',
+        'nivel_urgencia': 'alta',
+        'condicion': {'semaforo': 'rojo', 'meses': 2},
+        'mensaje': '🔴 ESCALAMIENTO: {codigo} - {nombre} lleva 2 meses consecutivos en ROJO. '
+                   'Las acciones correctivas no han sido efectivas. '
+                   'Se requiere aprobación de reemplazo inmediato. '
+                   'Cumplimiento promedio: {promedio}%.'
+    },
+    {
+        # NIVEL 4: ROJO TERCER MES CONSECUTIVO
+        'tipo': 'rojo_mes3',
+        'nivel_urgencia': 'critica',
+        'condicion': {'semaforo': 'rojo', 'meses': 3},
+        'mensaje': '🔴🔴🔴 CRÍTICO MÁXIMO: {codigo} - {nombre} lleva 3 meses en ROJO. '
+                   'El equipo/servicio es INACEPTABLE para operación. '
+                   'REEMPLAZO OBLIGATORIO INMEDIATO. '
+                   'Este item está comprometiendo seriamente la operación del área.'
+    },
+    {
+        # NIVEL 5: INCIDENCIAS MASIVAS EN UN MES
+        'tipo': 'incidencias_masivas',
+        'nivel_urgencia': 'critica',
+        'condicion': {'incidencias_min': 5},
+        'mensaje': '🔴 CRÍTICO: {codigo} - {nombre} registró {incidencias} incidencias en el mes. '
+                   'Volumen anormal de fallas indica deterioro acelerado. '
+                   'Requiere diagnóstico técnico urgente y evaluación de reemplazo.'
+    },
+]
+
+
+def reglas_activas():
+    """Reglas de la configuración (REGLAS_ALERTA) o las predeterminadas"""
+    return current_app.config.get('REGLAS_ALERTA') or REGLAS_ALERTA
+
+
+def _mes_anterior(anio, mes, meses=1):
+    indice = anio * 12 + (mes - 1) - meses
+    return indice // 12, indice % 12 + 1
+
+
+# ====================================
+# HISTORIAL (CONSULTA CON VENTANA)
+# ====================================
+
+def historial_metricas(anio, mes, item_ids=None, ventana=VENTANA_MESES):
+    """
+    {item_id: [métrica del mes, del mes anterior, ...]} con None en los meses sin
+    métrica. Una sola consulta: ROW_NUMBER por item sobre los meses de la ventana.
+    """
+    desde = _mes_anterior(anio, mes, ventana - 1)
+    periodo = Metrica.anio * 100 + Metrica.mes
+    posicion = func.row_number().over(
+        partition_by=(Metrica.item_id, Metrica.anio, Metrica.mes),
+        order_by=Metrica.id.desc()
+    ).label('posicion')
+
+    consulta = select(
+        Metrica.item_id, Metrica.anio, Metrica.mes, Metrica.semaforo,
+        Metrica.incidencias, Metrica.porcentaje_cumplimiento, posicion
+    ).where(periodo.between(desde[0] * 100 + desde[1], anio * 100 + mes))
+    if item_ids is not None:
+        consulta = consulta.where(Metrica.item_id.in_(item_ids))
+
+    ventana_sub = consulta.subquery()
+    filas = db.session.execute(select(ventana_sub).where(ventana_sub.c.posicion == 1)).all()
+
+    historial = {}
+    for fila in filas:
+        atras = (anio * 12 + mes) - (fila.anio * 12 + fila.mes)
+        historial.setdefault(fila.item_id, [None] * ventana)[atras] = fila
+
+    # Solo se evalúan los items con métrica en el mes indicado
+    return {item_id: meses for item_id, meses in historial.items() if meses[0] is not None}
+
+
+def _cumple(condicion, meses):
+    actual = meses[0]
+
+    if 'semaforo' in condicion:
+        racha = meses[:condicion.get('meses', 1)]
+        if any(m is None or m.semaforo != condicion['semaforo'] for m in racha):
+            return False
+
+    if 'sin_previo' in condicion:
+        if any(m is not None and m.semaforo == condicion['sin_previo'] for m in meses[1:]):
+            return False
+
+    if 'incidencias_min' in condicion:
+        if (actual.incidencias or 0) < condicion['incidencias_min']:
+            return False
+
+    return True
+
+
+def _contexto_mensaje(condicion, meses, item):
+    actual = meses[0]
+    racha = [m for m in meses[:condicion.get('meses', 1)] if m is not None]
+    porcentajes = [m.porcentaje_cumplimiento or 0 for m in racha]
+    return {
+        'codigo': item.codigo,
+        'nombre': item.nombre,
+        'incidencias': actual.incidencias,
+        'porcentaje': actual.porcentaje_cumplimiento,
+        'promedio': sum(porcentajes) // len(porcentajes) if porcentajes else 0,
+        'meses': len(racha),
+        'mes': actual.mes,
+        'anio': actual.anio,
+    }
+
+
+# ====================================
+# EVALUACIÓN
+# ====================================
+
+def evaluar_alertas_periodo(anio, mes, item_ids=None, notificar=True):
+    """
+    Evalúa todas las reglas para los items con métrica en (anio, mes).
+    Agrega las alertas nuevas en un solo commit y notifica la primera alerta
+    (en el orden de las reglas) de cada item.
+    """
+    reglas = reglas_activas()
+    ventana = max([VENTANA_MESES] + [r['condicion'].get('meses', 1) for r in reglas])
+
+    historial = historial_metricas(anio, mes, item_ids, ventana)
+    if not historial:
+        return {'evaluados': 0, 'generadas': [], 'omitidas': 0}
+
+    items = obtener_items(historial.keys())
+
+    # Alertas activas existentes (una consulta) para no duplicar
+    existentes = set(db.session.execute(
+        select(Alerta.item_id, Alerta.tipo).where(
+            Alerta.estado == 'activa',
+            Alerta.item_id.in_(list(historial)),
+            Alerta.tipo.in_([r['tipo'] for r in reglas])
+        )
+    ).all())
+
+    nuevas = []
+    primera_por_item = {}
+    omitidas = 0
+
+    for item_id, meses in historial.items():
+        item = items.get(item_id)
+        if item is None:
+            continue
+
+        for regla in reglas:
+            if not _cumple(regla['condicion'], meses):
+                continue
+            if (item_id, regla['tipo']) in existentes:
+                omitidas += 1
+                continue
+
+            alerta = Alerta(
+                item_id=item_id,
+                tipo=regla['tipo'],
+                nivel_urgencia=regla.get('nivel_urgencia', 'media'),
+                mensaje=regla['mensaje'].format(**_contexto_mensaje(regla['condicion'], meses, item)),
+                estado='activa'
+            )
+            existentes.add((item_id, regla['tipo']))
+            nuevas.append(alerta)
+            primera_por_item.setdefault(item_id, alerta)
+
+    if nuevas:
+        try:
+            db.session.add_all(nuevas)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error al generar alertas: {e}")
+            return {'evaluados': len(historial), 'generadas': [], 'omitidas': omitidas, 'error': str(e)}
+
+        if notificar:
+            for alerta in primera_por_item.values():
+                enviar_notificaciones_alerta_critica(alerta)
+
+    print(f"🚨 Alertas {mes}/{anio}: {len(historial)} item(s) evaluados, "
+          f"{len(nuevas)} generada(s), {omitidas} ya activa(s)")
+
+    return {'evaluados': len(historial), 'generadas': nuevas, 'omitidas': omitidas}
+
+
+# ====================================
+# NOTIFICACIONES
+# ====================================
+
+def enviar_notificaciones_alerta_critica(alerta):
+    """
+    Envía notificaciones por email a los usuarios suscritos cuando se genera una alerta crítica
+
+    Args:
+        alerta: Objeto Alerta recién creado
+    """
+    try:
+        # Obtener el item relacionado
+        item = Item.query.get(alerta.item_id)
+        if not item:
+            print("⚠️ No se encontró el item para la alerta")
+            return False
+
+        # ✅ DESTINATARIOS SEGÚN SUSCRIPCIONES (una consulta, en caché del worker)
+        destinatarios = []
+        telefonos = []
+        for usuario in destinatarios_alerta(alerta, item):
+            if usuario.correo:
+                destinatarios.append(usuario.correo)
+                print(f"📧 Agregando destinatario: {usuario.nombres} ({usuario.correo})")
+            if usuario.telefono:
+                telefonos.append(usuario.telefono)
+
+        # WhatsApp solo para alertas críticas y siempre inmediato (también en modo resumen)
+        if alerta.nivel_urgencia == 'critica':
+            enviar_alerta_whatsapp(alerta, item, telefonos)
+
+        if not destinatarios:
+            print("⚠️ No hay destinatarios con correo registrado")
+            return False
+
+        # Modo resumen: la alerta espera al próximo correo de resumen
+        if not envio_inmediato(alerta):
+            encolar_notificacion(alerta, destinatarios)
+            return True
+        
+        # ✅ ENVIAR NOTIFICACIÓN
+        from app.email_service import enviar_notificacion_alerta_critica
+
+        resultado = enviar_notificacion_alerta_critica(
+            app=current_app._get_current_object(),
+            alerta=alerta,
+            item=item,
+            destinatarios=destinatarios
+        )
+
+        if resultado:
+            print(f"✅ Notificaciones de alerta enviadas a {len(destinatarios)} usuario(s)")
+        else:
+            print("❌ Error al enviar notificaciones de alerta")
+
+        return resultado
+
+    except Exception as e:
+        print(f"❌ Error al enviar notificaciones de alerta: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
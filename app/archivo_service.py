@@ -0,0 +1,221 @@
+"""
+Ciclo de vida de datos: archivo de incidencias y alertas resueltas y
+particiones mensuales de incidencia en PostgreSQL.
+
+- Las incidencias y alertas resueltas hace más de ARCHIVO_HORIZONTE_DIAS se
+  mueven (INSERT ... SELECT + DELETE) a incidencia_archivo / alerta_archivo
+  en lotes de ARCHIVO_LOTE filas, un commit por lote. Una incidencia no se
+  archiva mientras esté asociada a una alerta sin resolver.
+- Las relaciones alerta_incidencia de filas archivadas se mueven con ellas; las
+  notificaciones pendientes de las alertas archivadas se descartan.
+- Las vistas leen solo las tablas de trabajo salvo que se pida incluir el archivo
+  (como máximo ARCHIVO_CONSULTA_LIMITE filas archivadas, las más recientes).
+"""
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select, literal, func, or_, exists, text
+
+from app import db
+from app.models import (
+    Incidencia, Alerta, AlertaIncidencia, NotificacionPendiente,
+    IncidenciaArchivo, AlertaArchivo, AlertaIncidenciaArchivo
+)
+from app.cambios import registrar_cambios
+from app.contadores import reconciliar_contadores
+
+
+# ====================================
+# ARCHIVO
+# ====================================
+
+def _mover(connection, modelo, archivo, ids, ahora):
+    """Copia las filas al archivo y las elimina de la tabla de trabajo (misma transacción)"""
+    tabla = modelo.__table__
+    columnas = [c.name for c in tabla.columns]
+    connection.execute(
+        archivo.__table__.insert().from_select(
+            columnas + ['fecha_archivo'],
+            select(*[tabla.c[nombre] for nombre in columnas], literal(ahora, db.DateTime)).where(tabla.c.id.in_(ids))
+        )
+    )
+    connection.execute(tabla.delete().where(tabla.c.id.in_(ids)))
+
+
+def _candidatos_alertas(corte, lote):
+    return db.session.execute(
+        select(Alerta.id).where(
+            Alerta.estado == 'resuelta',
+            func.coalesce(Alerta.fecha_resolucion, Alerta.fecha_creacion) < corte
+        ).order_by(Alerta.id).limit(lote)
+    ).scalars().all()
+
+
+def _candidatos_incidencias(corte, lote):
+    alerta_abierta = exists().where(
+        AlertaIncidencia.incidencia_id == Incidencia.id,
+        AlertaIncidencia.alerta_id == Alerta.id,
+        Alerta.estado != 'resuelta'
+    )
+    return db.session.execute(
+        select(Incidencia.id).where(
+            Incidencia.estado == 'resuelta',
+            func.coalesce(Incidencia.fecha_resolucion, Incidencia.fecha_incidencia) < corte,
+            ~alerta_abierta
+        ).order_by(Incidencia.id).limit(lote)
+    ).scalars().all()
+
+
+def archivar_lote(corte, lote):
+    """Archiva hasta `lote` alertas y `lote` incidencias resueltas antes de `corte`. Un commit."""
+    alertas_ids = _candidatos_alertas(corte, lote)
+    incidencias_ids = _candidatos_incidencias(corte, lote)
+    if not alertas_ids and not incidencias_ids:
+        return 0, 0
+
+    connection = db.session.connection()
+    ahora = datetime.utcnow()
+
+    # Primero las relaciones (tienen claves foráneas hacia alerta e incidencia)
+    relaciones_ids = db.session.execute(
+        select(AlertaIncidencia.id).where(or_(
+            AlertaIncidencia.alerta_id.in_(alertas_ids),
+            AlertaIncidencia.incidencia_id.in_(incidencias_ids)
+        ))
+    ).scalars().all()
+    if relaciones_ids:
+        _mover(connection, AlertaIncidencia, AlertaIncidenciaArchivo, relaciones_ids, ahora)
+    pendientes = 0
+    if alertas_ids:
+        # Una alerta resuelta ya no se incluye en el resumen; su fila bloquearía el DELETE (FK)
+        pendientes = connection.execute(
+            NotificacionPendiente.__table__.delete().where(NotificacionPendiente.alerta_id.in_(alertas_ids))
+        ).rowcount
+        _mover(connection, Alerta, AlertaArchivo, alertas_ids, ahora)
+    if incidencias_ids:
+        _mover(connection, Incidencia, IncidenciaArchivo, incidencias_ids, ahora)
+
+    registrar_cambios(connection, [
+        tabla for tabla, ids in (('alerta_incidencia', relaciones_ids), ('notificacion_pendiente', pendientes),
+                                 ('alerta', alertas_ids), ('incidencia', incidencias_ids)) if ids
+    ])
+    # Las incidencias archivadas dejan de contar en item.incidencias_resueltas
+    if incidencias_ids:
+        item_ids = connection.execute(
+            select(IncidenciaArchivo.item_id).where(IncidenciaArchivo.id.in_(incidencias_ids)).distinct()
+        ).scalars().all()
+        reconciliar_contadores(connection, item_ids, alertas=False)
+    db.session.commit()
+    return len(incidencias_ids), len(alertas_ids)
+
+
+def archivar_datos(horizonte_dias=None, lote=None, max_lotes=None):
+    """
+    Archiva en lotes acotados (como máximo max_lotes por ejecución).
+    Devuelve {'incidencias', 'alertas', 'lotes', 'segundos'}.
+    """
+    config = current_app.config
+    horizonte_dias = horizonte_dias or config.get('ARCHIVO_HORIZONTE_DIAS', 365)
+    lote = lote or config.get('ARCHIVO_LOTE', 500)
+    max_lotes = max_lotes or config.get('ARCHIVO_MAX_LOTES', 20)
+
+    corte = datetime.utcnow() - timedelta(days=horizonte_dias)
+    inicio = time.perf_counter()
+    total_incidencias = total_alertas = lotes = 0
+
+    while lotes < max_lotes:
+        try:
+            incidencias, alertas = archivar_lote(corte, lote)
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error al archivar: {str(e)}")
+            break
+        if not incidencias and not alertas:
+            break
+        lotes += 1
+        total_incidencias += incidencias
+        total_alertas += alertas
+        # Último lote incompleto: no queda nada más por archivar
+        if incidencias < lote and alertas < lote:
+            break
+
+    resultado = {
+        'incidencias': total_incidencias,
+        'alertas': total_alertas,
+        'lotes': lotes,
+        'segundos': round(time.perf_counter() - inicio, 2)
+    }
+    print(f"🗄️  Archivo: {total_incidencias} incidencia(s), {total_alertas} alerta(s) "
+          f"en {lotes} lote(s) ({resultado['segundos']}s, corte {corte:%d/%m/%Y})")
+    return resultado
+
+
+# ====================================
+# CONSULTAS CON ARCHIVO OPCIONAL
+# ====================================
+
+def con_archivo(query, query_archivo, orden, incluir_archivo):
+    """
+    Resultados de la tabla de trabajo y, si se pide, del archivo con los mismos
+    filtros, ordenados por la columna `orden` (descendente). query_archivo ya
+    viene ordenada por `orden` descendente: del archivo solo se leen las
+    ARCHIVO_CONSULTA_LIMITE filas más recientes.
+    """
+    filas = query.all()
+    if incluir_archivo:
+        filas += query_archivo.limit(current_app.config.get('ARCHIVO_CONSULTA_LIMITE', 500)).all()
+        filas.sort(key=lambda fila: getattr(fila, orden) or datetime.min, reverse=True)
+    return filas
+
+
+# ====================================
+# PARTICIONES (POSTGRESQL)
+# ====================================
+
+def incidencia_particionada():
+    """True si incidencia es una tabla particionada de PostgreSQL"""
+    if db.engine.dialect.name != 'postgresql':
+        return False
+    return bool(db.session.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = 'incidencia'"
+    )).scalar())
+
+
+def nombre_particion(anio, mes):
+    return f'incidencia_p{anio}{mes:02d}'
+
+
+def crear_particion(anio, mes):
+    """Crea la partición mensual de incidencia si no existe (no hace commit)"""
+    desde = datetime(anio, mes, 1)
+    hasta = datetime(anio + mes // 12, mes % 12 + 1, 1)
+    db.session.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {nombre_particion(anio, mes)} PARTITION OF incidencia "
+        f"FOR VALUES FROM ('{desde:%Y-%m-%d}') TO ('{hasta:%Y-%m-%d}')"
+    ))
+
+
+def asegurar_particiones(meses_adelante=None):
+    """Crea las particiones del mes actual y de los próximos meses (solo si incidencia está particionada)"""
+    if not incidencia_particionada():
+        return []
+
+    meses_adelante = meses_adelante if meses_adelante is not None else \
+        current_app.config.get('PARTICIONES_MESES_ADELANTE', 3)
+
+    hoy = datetime.utcnow()
+    particiones = []
+    for desplazamiento in range(meses_adelante + 1):
+        indice = hoy.year * 12 + hoy.month - 1 + desplazamiento
+        anio, mes = indice // 12, indice % 12 + 1
+        try:
+            crear_particion(anio, mes)
+            db.session.commit()
+            particiones.append(nombre_particion(anio, mes))
+        except Exception as e:
+            # p. ej. filas de ese mes ya guardadas en la partición por defecto
+            db.session.rollback()
+            print(f"⚠️  No se pudo crear {nombre_particion(anio, mes)}: {e}")
+    return particiones
@@ -0,0 +1,181 @@
+from app import db
+from app.models import ContadorCambios
+from flask import request, session, make_response, g, has_request_context
+from functools import wraps
+from datetime import datetime
+from sqlalchemy import event, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+import hashlib
+
+# ====================================
+# CONTADOR DE CAMBIOS POR TABLA
+# ====================================
+
+def _incrementar_contadores(connection, tablas):
+    """Incrementa el contador de cada tabla (crea la fila si no existe) y devuelve {tabla: versión nueva}"""
+    _escribir_contadores(connection, tablas)
+    # Las filas siguen bloqueadas por esta transacción: las versiones leídas son las escritas aquí
+    tabla = ContadorCambios.__table__
+    return dict(connection.execute(
+        select(tabla.c.tabla, tabla.c.version).where(tabla.c.tabla.in_(tablas))
+    ).all())
+
+
+def _escribir_contadores(connection, tablas):
+    tabla = ContadorCambios.__table__
+    ahora = datetime.utcnow()
+    filas = [{'tabla': nombre, 'version': 1, 'actualizado': ahora} for nombre in sorted(tablas)]
+
+    if connection.dialect.name in ('postgresql', 'sqlite'):
+        insert = pg_insert if connection.dialect.name == 'postgresql' else sqlite_insert
+        stmt = insert(tabla).values(filas)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['tabla'],
+            set_={'version': tabla.c.version + 1, 'actualizado': ahora}
+        )
+        connection.execute(stmt)
+        return
+
+    for fila in filas:
+        resultado = connection.execute(
+            update(tabla).where(tabla.c.tabla == fila['tabla']).values(
+                version=tabla.c.version + 1, actualizado=ahora
+            )
+        )
+        if resultado.rowcount == 0:
+            connection.execute(tabla.insert().values(**fila))
+
+
+def registrar_cambios(connection, tablas):
+    """
+    Registra cambios hechos fuera del ORM (SQL directo sobre la conexión de db.session)
+    y los avisa a los workers. El contador se incrementa al confirmar la sesión.
+    """
+    if tablas:
+        from app.invalidacion import publicar_en_conexion
+        db.session.info.setdefault('tablas_modificadas', set()).update(tablas)
+        publicar_en_conexion(connection, set(tablas))
+
+
+@event.listens_for(db.session, 'after_flush')
+def _registrar_cambios_flush(session, flush_context):
+    """Anota las tablas escritas en el flush; el contador se incrementa al confirmar"""
+    tablas = {obj.__table__.name for obj in list(session.new) + list(session.deleted)}
+    # session.dirty incluye objetos sin cambios reales en sus columnas
+    tablas.update(
+        obj.__table__.name for obj in session.dirty
+        if session.is_modified(obj, include_collections=False)
+    )
+    tablas.discard(ContadorCambios.__tablename__)
+
+    if tablas:
+        session.info.setdefault('tablas_modificadas', set()).update(tablas)
+
+
+@event.listens_for(db.session, 'before_commit')
+def _incrementar_antes_commit(session):
+    """
+    Incrementa los contadores una sola vez por transacción, al final y en orden de tabla.
+    Va en la misma transacción que la escritura (si el commit falla, la versión no cambia),
+    pero el lock de las filas de contador_cambios solo se retiene hasta el commit, y todos
+    los escritores las bloquean en el mismo orden (sin deadlocks en PostgreSQL).
+    En SQLite la transacción de escritura ya empezó con BEGIN IMMEDIATE (app/motores.py).
+    """
+    session.info.pop('versiones_confirmadas', None)
+    # before_commit se dispara antes del flush final del commit
+    session.flush()
+    tablas = session.info.pop('tablas_modificadas', None)
+    if tablas:
+        # Para los listeners de after_commit (p. ej. el catálogo de items)
+        session.info['versiones_confirmadas'] = _incrementar_contadores(session.connection(), tablas)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _olvidar_versiones_solicitud(session):
+    """Tras un commit con cambios, el request vuelve a leer las versiones"""
+    if session.info.get('versiones_confirmadas') and has_request_context():
+        g.pop('_versiones_tablas', None)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _descartar_cambios_rollback(session):
+    session.info.pop('tablas_modificadas', None)
+    session.info.pop('versiones_confirmadas', None)
+
+
+def versiones_tablas(tablas):
+    """Devuelve {tabla: (version, actualizado)} en una sola consulta"""
+    tabla = ContadorCambios.__table__
+    filas = db.session.execute(
+        select(tabla.c.tabla, tabla.c.version, tabla.c.actualizado).where(tabla.c.tabla.in_(tablas))
+    ).all()
+    versiones = {nombre: (0, None) for nombre in tablas}
+    versiones.update({f.tabla: (f.version, f.actualizado) for f in filas})
+    return versiones
+
+
+def versiones_solicitud(tablas):
+    """Números de versión de las tablas, leídos una sola vez por request"""
+    if not tablas:
+        return ()
+
+    cache = g.setdefault('_versiones_tablas', {}) if has_request_context() else {}
+    faltantes = [t for t in tablas if t not in cache]
+    if faltantes:
+        cache.update({t: v[0] for t, v in versiones_tablas(faltantes).items()})
+
+    return tuple(cache[t] for t in tablas)
+
+
+# ====================================
+# RESPUESTAS CONDICIONALES (ETag / 304)
+# ====================================
+
+def respuesta_condicional(*tablas):
+    """
+    Agrega ETag y Last-Modified a una API JSON según el contador de cambios de sus tablas.
+    Si el cliente ya tiene la versión vigente responde 304 sin ejecutar la vista.
+    """
+    def decorador(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            # Sin sesión la vista responde 401; no se evalúa la caché
+            if 'user_id' not in session:
+                return f(*args, **kwargs)
+
+            versiones = versiones_tablas(tablas)
+            sello = '|'.join(f'{t}:{versiones[t][0]}' for t in sorted(tablas))
+            sello += '|' + request.full_path
+            etag = hashlib.sha1(sello.encode('utf-8')).hexdigest()[:20]
+
+            fechas = [v[1] for v in versiones.values() if v[1]]
+            ultima_modificacion = max(fechas).replace(microsecond=0) if fechas else None
+
+            if _sin_cambios(etag, ultima_modificacion):
+                respuesta = make_response('', 304)
+            else:
+                respuesta = make_response(f(*args, **kwargs))
+                if respuesta.status_code != 200:
+                    return respuesta
+
+            respuesta.set_etag(etag)
+            if ultima_modificacion:
+                respuesta.last_modified = ultima_modificacion
+            # El navegador guarda la respuesta y la revalida en cada uso
+            respuesta.headers['Cache-Control'] = 'private, no-cache'
+            return respuesta
+
+        return decorated_function
+    return decorador
+
+
+def _sin_cambios(etag, ultima_modificacion):
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+
+    desde = request.if_modified_since
+    if desde and ultima_modificacion:
+        return desde.replace(tzinfo=None) >= ultima_modificacion
+
+    return False
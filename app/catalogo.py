@@ -0,0 +1,152 @@
+"""
+Catálogo de items en memoria (solo lectura) para mostrar código, nombre y tipo
+sin consultar la base de datos por cada fila.
+
+- Se carga con una sola consulta (solo las columnas necesarias).
+- Los commits de Item hechos en este proceso se aplican de forma incremental.
+- Si otro worker modificó items, el bus de invalidación (app.invalidacion)
+  descarta el catálogo y se recarga en la siguiente consulta. Sin bus activo
+  se compara la versión 'item' de contador_cambios en cada solicitud.
+"""
+import threading
+
+from sqlalchemy import event, select
+
+from app import db
+from app.models import Item
+from app.cambios import versiones_solicitud
+from app.invalidacion import bus_activo, suscribir
+from app.codigos_service import clave_codigo
+
+COLUMNAS = ('id', 'codigo', 'nombre', 'tipo', 'categoria', 'estado', 'estado_operativo', 'reemplaza_a_id')
+
+
+class ItemCatalogo:
+    """Registro compacto de un item (mismos nombres de atributo que el modelo)"""
+    __slots__ = COLUMNAS
+
+    def __init__(self, *valores):
+        for nombre, valor in zip(COLUMNAS, valores):
+            setattr(self, nombre, valor)
+
+    @classmethod
+    def desde_modelo(cls, item):
+        return cls(*(getattr(item, nombre) for nombre in COLUMNAS))
+
+    def __repr__(self):
+        return f'<ItemCatalogo {self.codigo}>'
+
+
+_items = {}
+_estado = {'version': None, 'generacion': 0}
+_lock = threading.Lock()
+
+
+def _cargar():
+    """Carga completa del catálogo en una consulta"""
+    global _items
+    generacion = _estado['generacion']
+    version = versiones_solicitud(('item',))[0]
+    filas = db.session.execute(select(*(getattr(Item, c) for c in COLUMNAS))).all()
+
+    nuevos = {fila.id: ItemCatalogo(*fila) for fila in filas}
+
+    with _lock:
+        # Se reemplaza el diccionario entero: las lecturas sin lock nunca ven un catálogo a medias
+        _items = nuevos
+        # Un aviso recibido durante la carga obliga a recargar la próxima vez
+        _estado['version'] = version if generacion == _estado['generacion'] else None
+
+
+def _vigente():
+    if bus_activo():
+        if _estado['version'] is None:
+            _cargar()
+    elif _estado['version'] != versiones_solicitud(('item',))[0]:
+        _cargar()
+
+
+# ====================================
+# API DE CONSULTA
+# ====================================
+
+def obtener_item(item_id):
+    """Item del catálogo por id (None si no existe)"""
+    _vigente()
+    return _items.get(item_id)
+
+
+def obtener_items(ids):
+    """{id: ItemCatalogo} para los ids indicados (omite los que no existen)"""
+    _vigente()
+    items = _items
+    registros = ((i, items.get(i)) for i in ids)
+    return {i: registro for i, registro in registros if registro is not None}
+
+
+def items_activos(orden=('tipo', 'codigo')):
+    """Items aprobados, operativos y no reemplazados por otro item"""
+    _vigente()
+    with _lock:
+        registros = list(_items.values())
+
+    reemplazados = {r.reemplaza_a_id for r in registros if r.reemplaza_a_id}
+    activos = [
+        r for r in registros
+        if r.estado == 'aprobado' and r.estado_operativo == 'activo' and r.id not in reemplazados
+    ]
+    return sorted(activos, key=lambda r: tuple(
+        clave_codigo(r.codigo) if c == 'codigo' else getattr(r, c) or '' for c in orden
+    ))
+
+
+def invalidar_catalogo(claves=None):
+    with _lock:
+        _estado['version'] = None
+        _estado['generacion'] += 1
+
+
+# Los commits de este worker ya se aplican de forma incremental (abajo)
+suscribir(('item',), invalidar_catalogo, locales=False)
+
+
+# ====================================
+# ACTUALIZACIÓN INCREMENTAL
+# ====================================
+
+@event.listens_for(db.session, 'after_flush')
+def _registrar_items_flush(session, flush_context):
+    cambios = session.info.setdefault('catalogo_cambios', {})
+
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Item) and (obj in session.new or session.is_modified(obj, include_collections=False)):
+            cambios[obj.id] = ItemCatalogo.desde_modelo(obj)
+    for obj in session.deleted:
+        if isinstance(obj, Item):
+            cambios[obj.id] = None
+
+
+# La versión 'item' de esta transacción la deja app.cambios en before_commit
+@event.listens_for(db.session, 'after_commit')
+def _aplicar_items_commit(session):
+    cambios = session.info.pop('catalogo_cambios', None)
+    if not cambios:
+        return
+    version = (session.info.get('versiones_confirmadas') or {}).get('item')
+
+    with _lock:
+        # Solo es incremental si nadie más modificó items entre medio
+        if version is not None and _estado['version'] is not None and _estado['version'] == version - 1:
+            for item_id, registro in cambios.items():
+                if registro is None:
+                    _items.pop(item_id, None)
+                else:
+                    _items[item_id] = registro
+            _estado['version'] = version
+        else:
+            _estado['version'] = None
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _descartar_items_rollback(session):
+    session.info.pop('catalogo_cambios', None)
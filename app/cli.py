@@ -0,0 +1,224 @@
+"""
+Comandos de consola (flask --app run <grupo> <comando>).
+
+    flask --app run metricas backfill --desde 2023-01 --hasta 2024-12
+    flask --app run datos archivar --horizonte 365
+    flask --app run datos reconciliar-contadores
+    flask --app run datos refrescar-estado
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from app import db
+from app.models import Item
+from app.metricas_service import (
+    calcular_metricas_periodo, guardar_metricas, recalcular_resumen_periodos, meses_entre
+)
+from app.estado_items import filtro_vigente, refrescar_item_estado
+
+metricas_cli = AppGroup('metricas', help='Mantenimiento de métricas mensuales')
+datos_cli = AppGroup('datos', help='Ciclo de vida de los datos (archivo y particiones)')
+
+
+def registrar_comandos(app):
+    app.cli.add_command(metricas_cli)
+    app.cli.add_command(datos_cli)
+
+
+def _leer_mes(valor):
+    """'AAAA-MM' -> (anio, mes)"""
+    try:
+        fecha = datetime.strptime(valor, '%Y-%m')
+    except ValueError:
+        raise click.BadParameter(f'"{valor}" no tiene el formato AAAA-MM')
+    return fecha.year, fecha.month
+
+
+def _mes_anterior():
+    hoy = datetime.utcnow()
+    return (hoy.year, hoy.month - 1) if hoy.month > 1 else (hoy.year - 1, 12)
+
+
+def _items_a_procesar(ids, tipo, categoria, solo_vigentes):
+    query = db.session.query(Item.id).filter(Item.estado == 'aprobado')
+
+    if ids:
+        query = query.filter(Item.id.in_(ids))
+    if tipo:
+        query = query.filter(Item.tipo == tipo)
+    if categoria:
+        query = query.filter(Item.categoria == categoria)
+    if solo_vigentes:
+        query = filtro_vigente(query)
+
+    return [fila.id for fila in query.order_by(Item.id)]
+
+
+# ====================================
+# UNIDADES DE TRABAJO (mes × lote de items)
+# ====================================
+
+def _procesar_unidad(app, unidad, sobrescribir):
+    """Calcula y guarda las métricas de un lote de items en un mes (un commit por unidad)"""
+    anio, mes, item_ids = unidad
+    with app.app_context():
+        try:
+            filas = calcular_metricas_periodo(item_ids, anio, mes)
+            escritas = guardar_metricas(filas, sobrescribir=sobrescribir)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+    return anio, mes, len(item_ids), escritas
+
+
+_app_proceso = None
+
+
+def _iniciar_proceso():
+    """Cada proceso del pool crea su propia app (y su propio pool de conexiones)"""
+    global _app_proceso
+    from app import create_app
+    _app_proceso = create_app(crear_tablas=False, iniciar_tareas=False)
+
+
+def _procesar_unidad_proceso(unidad, sobrescribir):
+    return _procesar_unidad(_app_proceso, unidad, sobrescribir)
+
+
+@metricas_cli.command('backfill')
+@click.option('--desde', required=True, help='Primer mes a generar (AAAA-MM)')
+@click.option('--hasta', default=None, help='Último mes a generar (AAAA-MM, por defecto el mes anterior)')
+@click.option('--items', 'items_ids', default=None, help='IDs de items separados por coma')
+@click.option('--tipo', type=click.Choice(['producto', 'servicio']), default=None)
+@click.option('--categoria', default=None)
+@click.option('--solo-vigentes', is_flag=True, help='Solo items activos y no reemplazados')
+@click.option('--lote', default=100, show_default=True, help='Items por unidad de trabajo')
+@click.option('--workers', default=4, show_default=True, help='Unidades en paralelo')
+@click.option('--procesos', is_flag=True, help='Usar un pool de procesos en lugar de hilos')
+@click.option('--sobrescribir', is_flag=True, help='Recalcular también las métricas existentes')
+def backfill_metricas(desde, hasta, items_ids, tipo, categoria, solo_vigentes, lote, workers, procesos, sobrescribir):
+    """Genera métricas históricas a partir de las incidencias registradas"""
+    inicio_periodo = _leer_mes(desde)
+    fin_periodo = _leer_mes(hasta) if hasta else _mes_anterior()
+    if inicio_periodo > fin_periodo:
+        raise click.BadParameter('--desde es posterior a --hasta')
+
+    ids = [int(i) for i in items_ids.split(',') if i.strip()] if items_ids else None
+    items = _items_a_procesar(ids, tipo, categoria, solo_vigentes)
+    meses = meses_entre(inicio_periodo, fin_periodo)
+
+    unidades = [
+        (anio, mes, items[i:i + lote])
+        for anio, mes in meses
+        for i in range(0, len(items), lote)
+    ]
+
+    click.echo(f"🔄 Backfill de métricas: {len(items)} item(s) × {len(meses)} mes(es) "
+               f"= {len(items) * len(meses)} métrica(s) en {len(unidades)} unidad(es)")
+    if not unidades:
+        click.echo("ℹ️  Nada que procesar")
+        return
+
+    app = current_app._get_current_object()
+    inicio = time.perf_counter()
+    procesadas = escritas_total = items_total = 0
+    periodos_escritos = set()
+    errores = []
+
+    if procesos:
+        # Las conexiones abiertas no deben heredarse en los procesos hijos
+        db.engine.dispose()
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_proceso)
+        enviar = lambda unidad: pool.submit(_procesar_unidad_proceso, unidad, sobrescribir)
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers)
+        enviar = lambda unidad: pool.submit(_procesar_unidad, app, unidad, sobrescribir)
+
+    with pool:
+        futuros = {enviar(unidad): unidad for unidad in unidades}
+
+        for futuro in as_completed(futuros):
+            anio, mes, lote_items = futuros[futuro]
+            procesadas += 1
+            try:
+                _, _, cantidad, escritas = futuro.result()
+            except Exception as e:
+                errores.append((anio, mes, lote_items[0], lote_items[-1], str(e)))
+                click.echo(f"  ❌ {mes:02d}/{anio} items {lote_items[0]}-{lote_items[-1]}: {e}")
+                continue
+
+            items_total += cantidad
+            escritas_total += escritas
+            if escritas:
+                periodos_escritos.add((anio, mes))
+
+            transcurrido = time.perf_counter() - inicio
+            click.echo(f"  ✅ [{procesadas}/{len(unidades)}] {mes:02d}/{anio}: {cantidad} item(s), "
+                       f"{escritas} escrita(s) · {items_total / transcurrido:.0f} métricas/s")
+
+    # El resumen mensual se recalcula una vez por período al final
+    if periodos_escritos:
+        recalcular_resumen_periodos(db.session.connection(), periodos_escritos)
+        db.session.commit()
+
+    transcurrido = time.perf_counter() - inicio
+    click.echo(f"\n📊 RESUMEN:")
+    click.echo(f"   ✅ Escritas: {escritas_total} (omitidas por existir: {items_total - escritas_total})")
+    click.echo(f"   📅 Períodos con cambios: {len(periodos_escritos)}")
+    click.echo(f"   ⏱️  {transcurrido:.1f}s · {items_total / transcurrido:.0f} métricas/s "
+               f"({'procesos' if procesos else 'hilos'}: {workers})")
+
+    if errores:
+        click.echo(f"   ❌ Unidades con error: {len(errores)} (volver a ejecutar es seguro)")
+        raise SystemExit(1)
+
+
+# ====================================
+# ARCHIVO
+# ====================================
+
+@datos_cli.command('archivar')
+@click.option('--horizonte', type=int, default=None, help='Días desde la resolución (por defecto ARCHIVO_HORIZONTE_DIAS)')
+@click.option('--lote', type=int, default=None, help='Filas por lote (por defecto ARCHIVO_LOTE)')
+@click.option('--max-lotes', type=int, default=None, help='Lotes por ejecución (por defecto ARCHIVO_MAX_LOTES)')
+def archivar(horizonte, lote, max_lotes):
+    """Mueve incidencias y alertas resueltas antiguas a las tablas de archivo"""
+    from app.archivo_service import archivar_datos, asegurar_particiones
+
+    particiones = asegurar_particiones()
+    if particiones:
+        click.echo(f"✅ Particiones verificadas: {', '.join(particiones)}")
+    archivar_datos(horizonte_dias=horizonte, lote=lote, max_lotes=max_lotes)
+
+
+# ====================================
+# CONTADORES DENORMALIZADOS
+# ====================================
+
+@datos_cli.command('reconciliar-contadores')
+@click.option('--items', 'items_ids', default=None, help='IDs de items separados por coma (por defecto todos)')
+def reconciliar(items_ids):
+    """Recalcula los contadores de Item y Alerta desde las tablas"""
+    from app.contadores import reconciliar_contadores
+
+    ids = [int(i) for i in items_ids.split(',')] if items_ids else None
+    inicio = time.perf_counter()
+    corregidos = reconciliar_contadores(db.session.connection(), ids)
+    db.session.commit()
+    click.echo(f"✅ Contadores reconciliados en {time.perf_counter() - inicio:.2f}s "
+               f"({corregidos} item(s) con diferencias)")
+
+
+@datos_cli.command('refrescar-estado')
+def refrescar_estado():
+    """Recalcula item_estado completo"""
+    inicio = time.perf_counter()
+    refrescar_item_estado(db.session.connection())
+    db.session.commit()
+    click.echo(f"✅ item_estado recalculado en {time.perf_counter() - inicio:.2f}s")
@@ -0,0 +1,181 @@
+"""
+Asignación de códigos de item (P01, P02... / S01, S02...) con una secuencia por prefijo.
+
+- PostgreSQL: secuencias nativas (item_codigo_p_seq, item_codigo_s_seq),
+  creadas junto con las tablas (db.create_all) o con migrate_codigos.py.
+- Otros motores (SQLite): una fila por prefijo en secuencia_codigo que se
+  incrementa con un UPDATE dentro de la transacción del insert; la fila (o la
+  base en SQLite) queda bloqueada hasta el commit.
+
+El código se asigna al insertar el item. La vista previa solo lee el último
+valor (O(1)) y no reserva nada: si otro usuario crea un item antes, el código
+final puede ser distinto al mostrado.
+"""
+import re
+
+from sqlalchemy import event, func, select, text, update
+from sqlalchemy.orm.util import identity_key
+
+from app import db
+from app.models import Item, SecuenciaCodigo
+
+PREFIJOS = {'producto': 'P', 'servicio': 'S'}
+
+_NUMERO = re.compile(r'^\d+$')
+
+
+def prefijo_de(tipo):
+    return PREFIJOS.get(tipo, 'P')
+
+
+def formatear_codigo(prefijo, numero):
+    return f'{prefijo}{numero:02d}'
+
+
+def _nombre_secuencia(prefijo):
+    return f'item_codigo_{prefijo.lower()}_seq'
+
+
+def _es_postgres():
+    return db.session.connection().dialect.name == 'postgresql'
+
+
+def maximo_numero(prefijo, connection=None):
+    """Mayor número usado con el prefijo, comparando numéricamente (P100 > P99)"""
+    codigos = (connection or db.session).execute(
+        select(Item.codigo).where(Item.codigo.like(f'{prefijo}%'))
+    ).scalars()
+    numeros = [int(c[len(prefijo):]) for c in codigos if _NUMERO.match(c[len(prefijo):])]
+    return max(numeros, default=0)
+
+
+# ====================================
+# ORDEN NUMÉRICO
+# ====================================
+
+def orden_codigo(columna=None):
+    """Expresiones ORDER BY para ordenar códigos por prefijo y número (P2 < P10 < P100)"""
+    columna = Item.codigo if columna is None else columna
+    return func.substr(columna, 1, 1), func.length(columna), columna
+
+
+def clave_codigo(codigo):
+    """Misma clave de orden que orden_codigo, para ordenar en Python"""
+    codigo = codigo or ''
+    return codigo[:1], len(codigo), codigo
+
+
+# ====================================
+# SECUENCIAS
+# ====================================
+
+def _crear_secuencia(conexion, prefijo, maximo):
+    """Crea la secuencia de PostgreSQL si falta y la adelanta hasta maximo; devuelve el último valor"""
+    nombre = _nombre_secuencia(prefijo)
+    conexion.execute(text(f'CREATE SEQUENCE IF NOT EXISTS {nombre}'))
+    actual = conexion.execute(text(f'SELECT last_value, is_called FROM {nombre}')).one()
+    ultimo = actual.last_value if actual.is_called else actual.last_value - 1
+    if maximo > ultimo:
+        conexion.execute(text('SELECT setval(:nombre, :valor, true)'), {'nombre': nombre, 'valor': maximo})
+        ultimo = maximo
+    return ultimo
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _crear_secuencias_con_tablas(target, connection, **kw):
+    """db.create_all también crea las secuencias (en SQLite el contador se crea al primer uso)"""
+    if connection.dialect.name == 'postgresql':
+        for prefijo in PREFIJOS.values():
+            _crear_secuencia(connection, prefijo, maximo_numero(prefijo, connection))
+
+
+def inicializar_secuencias():
+    """
+    Crea las secuencias (o filas de contador) que falten y las sitúa en el mayor
+    número existente. No retrocede una secuencia que ya va por delante. No hace commit.
+    """
+    resultado = {}
+    postgres = _es_postgres()
+
+    for prefijo in PREFIJOS.values():
+        maximo = maximo_numero(prefijo)
+
+        if postgres:
+            ultimo = _crear_secuencia(db.session, prefijo, maximo)
+        else:
+            fila = db.session.get(SecuenciaCodigo, prefijo)
+            if fila is None:
+                fila = SecuenciaCodigo(prefijo=prefijo, ultimo=maximo)
+                db.session.add(fila)
+            elif maximo > fila.ultimo:
+                fila.ultimo = maximo
+            db.session.flush()
+            ultimo = fila.ultimo
+
+        resultado[prefijo] = ultimo
+
+    return resultado
+
+
+def _siguiente_contador(prefijo):
+    tabla = SecuenciaCodigo.__table__
+    stmt = update(tabla).where(tabla.c.prefijo == prefijo).values(ultimo=tabla.c.ultimo + 1)
+
+    if db.session.connection().dialect.update_returning:
+        numero = db.session.execute(stmt.returning(tabla.c.ultimo)).scalar()
+    else:
+        resultado = db.session.execute(stmt)
+        numero = None
+        if resultado.rowcount:
+            numero = db.session.execute(select(tabla.c.ultimo).where(tabla.c.prefijo == prefijo)).scalar()
+
+    if numero is None:
+        # Primera asignación con este prefijo: crear el contador desde los códigos existentes
+        inicializar_secuencias()
+        return _siguiente_contador(prefijo)
+
+    # El objeto cargado en la sesión (si lo hay) no debe pisar el valor con un flush posterior
+    fila = db.session.identity_map.get(identity_key(SecuenciaCodigo, prefijo))
+    if fila is not None:
+        db.session.expire(fila)
+
+    return numero
+
+
+def asignar_codigo(tipo):
+    """
+    Reserva el siguiente código del tipo en la transacción actual y lo devuelve.
+    En PostgreSQL nextval no se deshace con un rollback (puede dejar huecos).
+    """
+    prefijo = prefijo_de(tipo)
+
+    while True:
+        if _es_postgres():
+            numero = db.session.execute(text('SELECT nextval(:nombre)'),
+                                        {'nombre': _nombre_secuencia(prefijo)}).scalar()
+        else:
+            numero = _siguiente_contador(prefijo)
+
+        codigo = formatear_codigo(prefijo, numero)
+        # Códigos creados a mano por encima de la secuencia: se saltan
+        if not db.session.query(Item.id).filter_by(codigo=codigo).first():
+            return codigo
+
+
+def vista_previa_codigo(tipo):
+    """Próximo código que se asignaría (lectura O(1), sin reservar)"""
+    prefijo = prefijo_de(tipo)
+
+    if _es_postgres():
+        actual = db.session.execute(
+            text(f'SELECT last_value, is_called FROM {_nombre_secuencia(prefijo)}')
+        ).one()
+        siguiente = actual.last_value + 1 if actual.is_called else actual.last_value
+    else:
+        ultimo = db.session.execute(
+            select(SecuenciaCodigo.ultimo).where(SecuenciaCodigo.prefijo == prefijo)
+        ).scalar()
+        # Sin contador todavía: se calcula desde los códigos existentes
+        siguiente = (maximo_numero(prefijo) if ultimo is None else ultimo) + 1
+
+    return formatear_codigo(prefijo, siguiente)
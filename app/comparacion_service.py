@@ -0,0 +1,228 @@
+"""
+Comparación del estado completo de un item (campos + SLA) entre dos versiones.
+
+El estado en la versión N se obtiene partiendo del punto de control más
+cercano por encima de N (el estado actual del item o un estado ya
+reconstruido en caché) y deshaciendo las versiones posteriores a N con sus
+valores anteriores. Los resultados se guardan por (item, v1, v2) junto con
+las versiones de las tablas involucradas, así que un cambio nuevo los invalida.
+"""
+import ast
+import json
+import re
+import threading
+from collections import OrderedDict
+from difflib import SequenceMatcher
+
+from app.models import Item, SLA, Version
+from app.cambios import versiones_solicitud
+from app.versiones_service import valores_versiones, CAMPOS_ITEM, CAMPOS_SLA
+
+# Campos del estado reconstruido (además de 'sla')
+CAMPOS_ESTADO = dict(CAMPOS_ITEM, estado='Estado')
+NOMBRE_SLA = 'SLA/Especificaciones Técnicas'
+
+# Nombre en Version.campo_modificado -> clave del estado (versiones sin contenido completo)
+_CLAVE_POR_NOMBRE = {nombre: clave for clave, nombre in CAMPOS_ESTADO.items()}
+_CLAVE_POR_NOMBRE[NOMBRE_SLA] = 'sla'
+
+_TOKENS = re.compile(r'\s+|\w+|[^\w\s]', re.UNICODE)
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+MAX_CACHE = 256
+
+
+class ComparacionError(Exception):
+    """Versión inexistente o fuera de rango"""
+
+
+# ====================================
+# DIFERENCIAS POR PALABRA
+# ====================================
+
+def diff_palabras(anterior, nuevo):
+    """Segmentos [{'tipo': igual|eliminado|agregado, 'texto'}] a nivel de palabra"""
+    tokens_anterior = _TOKENS.findall(anterior or '')
+    tokens_nuevo = _TOKENS.findall(nuevo or '')
+
+    segmentos = []
+
+    def agregar(tipo, tokens):
+        if not tokens:
+            return
+        texto = ''.join(tokens)
+        if segmentos and segmentos[-1]['tipo'] == tipo:
+            segmentos[-1]['texto'] += texto
+        else:
+            segmentos.append({'tipo': tipo, 'texto': texto})
+
+    comparador = SequenceMatcher(None, tokens_anterior, tokens_nuevo, autojunk=False)
+    for etiqueta, i1, i2, j1, j2 in comparador.get_opcodes():
+        if etiqueta == 'equal':
+            agregar('igual', tokens_anterior[i1:i2])
+        else:
+            agregar('eliminado', tokens_anterior[i1:i2])
+            agregar('agregado', tokens_nuevo[j1:j2])
+
+    return segmentos
+
+
+# ====================================
+# RECONSTRUCCIÓN DE ESTADOS
+# ====================================
+
+def _estado_actual(item):
+    estado = {clave: getattr(item, clave) or '' for clave in CAMPOS_ESTADO}
+    sla = SLA.query.filter_by(item_id=item.id).first()
+    campos_sla = CAMPOS_SLA['servicio' if item.tipo == 'servicio' else 'producto']
+    estado['sla'] = {campo: getattr(sla, campo) for campo in campos_sla} if sla else {}
+    return estado
+
+
+def _copiar(estado):
+    return dict(estado, sla=dict(estado['sla']))
+
+
+def _leer_sla(texto):
+    """SLA guardado como JSON (actual) o como str(dict) (versiones antiguas)"""
+    try:
+        return json.loads(texto)
+    except ValueError:
+        pass
+    try:
+        valor = ast.literal_eval(texto)
+        return valor if isinstance(valor, dict) else None
+    except (ValueError, SyntaxError):
+        return None
+
+
+def _deshacer(estado, version, valores, parciales):
+    """Aplica el valor anterior de una versión sobre el estado"""
+    clave = valores['campo'] or _CLAVE_POR_NOMBRE.get(version.campo_modificado)
+
+    if clave == 'sla':
+        anterior = _leer_sla(valores['anterior'])
+        if anterior is None:
+            parciales.add('sla')
+        elif valores['completo']:
+            estado['sla'] = anterior
+        else:
+            estado['sla'].update(anterior)
+            parciales.add('sla')
+    elif clave in CAMPOS_ESTADO:
+        estado[clave] = valores['anterior']
+        # Las versiones antiguas guardaban solo 500 caracteres
+        if not valores['completo'] and len(valores['anterior']) >= 500:
+            parciales.add(clave)
+
+
+def _puntos_de_control(datos):
+    """Estados ya reconstruidos para este item y estado de datos {numero: (estado, parciales)}"""
+    with _lock:
+        return {
+            clave[2]: valor for clave, valor in _cache.items()
+            if clave[0] == 'estado' and clave[1] == datos
+        }
+
+
+def _guardar(clave, valor):
+    with _lock:
+        _cache[clave] = valor
+        _cache.move_to_end(clave)
+        while len(_cache) > MAX_CACHE:
+            _cache.popitem(last=False)
+
+
+def _reconstruir(item, versiones, numeros, datos):
+    """Estados en los números pedidos, deshaciendo desde el punto de control más cercano"""
+    ultimo = versiones[-1].numero_version if versiones else 0
+    puntos = _puntos_de_control(datos)
+    puntos.setdefault(ultimo, None)  # el estado actual siempre es un punto de control
+
+    desde = min(n for n in puntos if n >= max(numeros))
+
+    if puntos[desde] is None:
+        estado, parciales = _estado_actual(item), set()
+    else:
+        estado, parciales = _copiar(puntos[desde][0]), set(puntos[desde][1])
+
+    pendientes = [v for v in versiones if min(numeros) < v.numero_version <= desde]
+    valores = valores_versiones(pendientes)
+
+    # Deshacer de la más reciente a la más antigua, guardando el estado en cada número pedido
+    estados = {}
+    i = len(pendientes) - 1
+    for numero in sorted(numeros, reverse=True):
+        while i >= 0 and pendientes[i].numero_version > numero:
+            _deshacer(estado, pendientes[i], valores[pendientes[i].id], parciales)
+            i -= 1
+        estados[numero] = (_copiar(estado), set(parciales))
+        _guardar(('estado', datos, numero), estados[numero])
+
+    return estados
+
+
+# ====================================
+# API
+# ====================================
+
+def comparar_versiones(item_id, v1, v2):
+    """
+    Compara el estado completo del item en las versiones v1 y v2 (números de versión).
+    Devuelve los campos y claves del SLA que cambiaron con su diff por palabras.
+    """
+    v1, v2 = sorted((v1, v2))
+    datos = (item_id,) + versiones_solicitud(('item', 'sla', 'version'))
+    clave = ('comparacion', datos, v1, v2)
+
+    with _lock:
+        if clave in _cache:
+            _cache.move_to_end(clave)
+            return _cache[clave]
+
+    item = Item.query.get(item_id)
+    if item is None:
+        raise ComparacionError('Item no encontrado')
+
+    versiones = Version.query.filter_by(item_id=item_id).order_by(Version.numero_version, Version.id).all()
+    numeros = {v.numero_version for v in versiones}
+    for numero in (v1, v2):
+        if numero not in numeros:
+            raise ComparacionError(f'La versión v{numero} no existe para {item.codigo}')
+
+    estados = _reconstruir(item, versiones, {v1, v2}, datos)
+    estado1, parciales1 = estados[v1]
+    estado2, parciales2 = estados[v2]
+    parciales = parciales1 | parciales2
+
+    campos = []
+    for campo, nombre in CAMPOS_ESTADO.items():
+        if estado1[campo] != estado2[campo]:
+            campos.append({
+                'campo': campo,
+                'nombre': nombre,
+                'valor_v1': estado1[campo],
+                'valor_v2': estado2[campo],
+                'diff': diff_palabras(estado1[campo], estado2[campo]),
+                'parcial': campo in parciales
+            })
+
+    sla = []
+    for campo in sorted(set(estado1['sla']) | set(estado2['sla'])):
+        antes, despues = estado1['sla'].get(campo), estado2['sla'].get(campo)
+        if antes != despues:
+            sla.append({'campo': campo, 'valor_v1': antes, 'valor_v2': despues})
+
+    resultado = {
+        'item_id': item_id,
+        'v1': v1,
+        'v2': v2,
+        'campos': campos,
+        'sla': sla,
+        'sla_parcial': 'sla' in parciales,
+        'versiones_entre': len([v for v in versiones if v1 < v.numero_version <= v2]),
+        'sin_cambios': not campos and not sla
+    }
+    _guardar(clave, resultado)
+    return resultado
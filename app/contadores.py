@@ -0,0 +1,268 @@
+"""
+Contadores denormalizados de Item (y de Alerta) para las vistas de lista.
+
+Item:
+- incidencias_abiertas / incidencias_resueltas: incidencias de la tabla de trabajo
+- incidencias_mes: incidencias registradas en el período periodo_incidencias
+  (anio * 100 + mes); para el mes actual usar incidencias_mes_actual()
+- alertas_activas: alertas con estado 'activa'
+- ultimo_semaforo: semáforo de la métrica más reciente
+
+Alerta.incidencias_resueltas_count: relaciones alerta_incidencia (incluidas
+las archivadas).
+
+Los eventos del ORM (insert/update/delete de Incidencia, Alerta, Metrica y
+AlertaIncidencia) aplican la diferencia con un UPDATE atómico (col = col + n)
+en la misma transacción, así dos workers no pisan sus incrementos. Las
+escrituras con SQL directo (archivo, métricas masivas) llaman a
+reconciliar_contadores para los items afectados; el comando
+`flask --app run datos reconciliar-contadores` recalcula todo.
+
+Los contadores no cambian la versión 'item' de contador_cambios: las vistas
+que los muestran dependen de incidencia / alerta / metrica.
+"""
+from datetime import datetime
+
+from sqlalchemy import event, inspect, select, func, case, and_, update, true
+
+from app.models import Item, Incidencia, Alerta, Metrica, AlertaIncidencia, AlertaIncidenciaArchivo
+
+COLUMNAS = ('incidencias_abiertas', 'incidencias_resueltas', 'incidencias_mes', 'periodo_incidencias',
+            'alertas_activas', 'ultimo_semaforo')
+
+
+def periodo_de(fecha):
+    return fecha.year * 100 + fecha.month if fecha else None
+
+
+def periodo_actual():
+    return periodo_de(datetime.now())
+
+
+def incidencias_mes_actual():
+    """Expresión SQL: incidencias del mes actual (0 si el contador es de un mes anterior)"""
+    return case((Item.periodo_incidencias == periodo_actual(), Item.incidencias_mes), else_=0)
+
+
+# ====================================
+# APLICACIÓN DE DIFERENCIAS
+# ====================================
+
+def _anterior(obj, atributo):
+    """Valor del atributo antes del flush en curso"""
+    historia = inspect(obj).attrs[atributo].history
+    return historia.deleted[0] if historia.deleted else getattr(obj, atributo)
+
+
+def _cargar_anterior(target, value, oldvalue, initiator):
+    pass
+
+
+# Historia activa: al asignar el atributo de una instancia expirada (p. ej. después de un
+# commit) se carga el valor anterior; sin ella la historia queda vacía y se pierde la diferencia
+for _atributo in (Incidencia.item_id, Incidencia.estado, Incidencia.fecha_incidencia,
+                  Alerta.item_id, Alerta.estado, Metrica.item_id):
+    event.listen(_atributo, 'set', _cargar_anterior, active_history=True)
+
+
+def _sumar(connection, tabla, fila_id, deltas):
+    valores = {col: tabla.c[col] + n for col, n in deltas.items() if n}
+    if fila_id is not None and valores:
+        connection.execute(update(tabla).where(tabla.c.id == fila_id).values(**valores))
+
+
+def _aplicar(connection, anterior, actual):
+    """anterior / actual: (item_id, {columna: aporte}) de la fila antes y después"""
+    tabla = Item.__table__
+    if anterior and actual and anterior[0] == actual[0]:
+        _sumar(connection, tabla, actual[0], {c: actual[1][c] - anterior[1][c] for c in actual[1]})
+        return
+    if anterior:
+        _sumar(connection, tabla, anterior[0], {c: -n for c, n in anterior[1].items()})
+    if actual:
+        _sumar(connection, tabla, actual[0], actual[1])
+
+
+def _sumar_mes(connection, item_id, periodo, delta):
+    if item_id is None or periodo is None or not delta:
+        return
+    tabla = Item.__table__
+    if delta < 0:
+        connection.execute(update(tabla).where(
+            tabla.c.id == item_id, tabla.c.periodo_incidencias == periodo
+        ).values(incidencias_mes=tabla.c.incidencias_mes + delta))
+        return
+    # Una incidencia de un período posterior reinicia el contador
+    nuevo = tabla.c.periodo_incidencias.is_(None) | (tabla.c.periodo_incidencias < periodo)
+    connection.execute(update(tabla).where(tabla.c.id == item_id).values(
+        incidencias_mes=case(
+            (tabla.c.periodo_incidencias == periodo, tabla.c.incidencias_mes + delta),
+            (nuevo, delta),
+            else_=tabla.c.incidencias_mes
+        ),
+        periodo_incidencias=case((nuevo, periodo), else_=tabla.c.periodo_incidencias)
+    ))
+
+
+# ====================================
+# INCIDENCIA
+# ====================================
+
+def _aporte_incidencia(item_id, estado):
+    resuelta = estado == 'resuelta'
+    return item_id, {'incidencias_abiertas': int(not resuelta), 'incidencias_resueltas': int(resuelta)}
+
+
+@event.listens_for(Incidencia, 'after_insert')
+def _incidencia_insertada(mapper, connection, target):
+    _aplicar(connection, None, _aporte_incidencia(target.item_id, target.estado))
+    _sumar_mes(connection, target.item_id, periodo_de(target.fecha_incidencia), 1)
+
+
+@event.listens_for(Incidencia, 'after_update')
+def _incidencia_actualizada(mapper, connection, target):
+    item_anterior = _anterior(target, 'item_id')
+    _aplicar(connection,
+             _aporte_incidencia(item_anterior, _anterior(target, 'estado')),
+             _aporte_incidencia(target.item_id, target.estado))
+
+    periodo_anterior = periodo_de(_anterior(target, 'fecha_incidencia'))
+    periodo = periodo_de(target.fecha_incidencia)
+    if (item_anterior, periodo_anterior) != (target.item_id, periodo):
+        _sumar_mes(connection, item_anterior, periodo_anterior, -1)
+        _sumar_mes(connection, target.item_id, periodo, 1)
+
+
+@event.listens_for(Incidencia, 'after_delete')
+def _incidencia_eliminada(mapper, connection, target):
+    _aplicar(connection, _aporte_incidencia(target.item_id, target.estado), None)
+    _sumar_mes(connection, target.item_id, periodo_de(target.fecha_incidencia), -1)
+
+
+# ====================================
+# ALERTA
+# ====================================
+
+def _aporte_alerta(item_id, estado):
+    return item_id, {'alertas_activas': int(estado == 'activa')}
+
+
+@event.listens_for(Alerta, 'after_insert')
+def _alerta_insertada(mapper, connection, target):
+    _aplicar(connection, None, _aporte_alerta(target.item_id, target.estado))
+
+
+@event.listens_for(Alerta, 'after_update')
+def _alerta_actualizada(mapper, connection, target):
+    _aplicar(connection,
+             _aporte_alerta(_anterior(target, 'item_id'), _anterior(target, 'estado')),
+             _aporte_alerta(target.item_id, target.estado))
+
+
+@event.listens_for(Alerta, 'after_delete')
+def _alerta_eliminada(mapper, connection, target):
+    _aplicar(connection, _aporte_alerta(target.item_id, target.estado), None)
+
+
+@event.listens_for(AlertaIncidencia, 'after_insert')
+def _relacion_insertada(mapper, connection, target):
+    _sumar(connection, Alerta.__table__, target.alerta_id, {'incidencias_resueltas_count': 1})
+
+
+@event.listens_for(AlertaIncidencia, 'after_delete')
+def _relacion_eliminada(mapper, connection, target):
+    _sumar(connection, Alerta.__table__, target.alerta_id, {'incidencias_resueltas_count': -1})
+
+
+# ====================================
+# MÉTRICA
+# ====================================
+
+def _ultimo_semaforo(item_id):
+    return select(Metrica.semaforo).where(Metrica.item_id == item_id).order_by(
+        Metrica.anio.desc(), Metrica.mes.desc()
+    ).limit(1).scalar_subquery()
+
+
+def actualizar_ultimo_semaforo(connection, item_ids):
+    """Un UPDATE con subconsulta correlacionada para todos los items indicados"""
+    tabla = Item.__table__
+    item_ids = set(item_ids) - {None}
+    if item_ids:
+        connection.execute(update(tabla).where(tabla.c.id.in_(item_ids)).values(
+            ultimo_semaforo=_ultimo_semaforo(tabla.c.id)
+        ))
+
+
+@event.listens_for(Metrica, 'after_insert')
+@event.listens_for(Metrica, 'after_delete')
+def _metrica_insertada_o_eliminada(mapper, connection, target):
+    actualizar_ultimo_semaforo(connection, [target.item_id])
+
+
+@event.listens_for(Metrica, 'after_update')
+def _metrica_actualizada(mapper, connection, target):
+    estado = inspect(target)
+    if any(estado.attrs[a].history.has_changes() for a in ('item_id', 'mes', 'anio', 'semaforo')):
+        actualizar_ultimo_semaforo(connection, [_anterior(target, 'item_id'), target.item_id])
+
+
+# ====================================
+# RECONCILIACIÓN
+# ====================================
+
+def reconciliar_contadores(connection, item_ids=None, alertas=True):
+    """
+    Recalcula los contadores desde las tablas (todos los items o los indicados).
+    Devuelve el número de items cuyos contadores estaban desactualizados.
+    """
+    if item_ids is not None and not item_ids:
+        return 0
+    tabla = Item.__table__
+    filtro = tabla.c.id.in_(item_ids) if item_ids is not None else true()
+
+    def leer():
+        return set(connection.execute(select(tabla.c.id, *(tabla.c[c] for c in COLUMNAS)).where(filtro)).all())
+
+    antes = leer()
+
+    periodo = periodo_actual()
+    inicio_mes = datetime(periodo // 100, periodo % 100, 1)
+    inicio_siguiente = datetime(inicio_mes.year + inicio_mes.month // 12, inicio_mes.month % 12 + 1, 1)
+    incidencias = Incidencia.__table__
+
+    def contar_incidencias(*condiciones):
+        return select(func.count()).select_from(incidencias).where(
+            incidencias.c.item_id == tabla.c.id, *condiciones
+        ).scalar_subquery()
+
+    resuelta = func.coalesce(incidencias.c.estado, 'abierta') == 'resuelta'
+    connection.execute(update(tabla).where(filtro).values(
+        incidencias_abiertas=contar_incidencias(~resuelta),
+        incidencias_resueltas=contar_incidencias(resuelta),
+        incidencias_mes=contar_incidencias(and_(
+            incidencias.c.fecha_incidencia >= inicio_mes, incidencias.c.fecha_incidencia < inicio_siguiente
+        )),
+        periodo_incidencias=periodo,
+        alertas_activas=select(func.count()).select_from(Alerta.__table__).where(
+            Alerta.__table__.c.item_id == tabla.c.id, Alerta.__table__.c.estado == 'activa'
+        ).scalar_subquery(),
+        ultimo_semaforo=_ultimo_semaforo(tabla.c.id),
+    ))
+
+    if alertas:
+        alerta = Alerta.__table__
+        total = (
+            select(func.count()).select_from(AlertaIncidencia.__table__)
+            .where(AlertaIncidencia.__table__.c.alerta_id == alerta.c.id).scalar_subquery()
+            + select(func.count()).select_from(AlertaIncidenciaArchivo.__table__)
+            .where(AlertaIncidenciaArchivo.__table__.c.alerta_id == alerta.c.id).scalar_subquery()
+        )
+        condicion = alerta.c.item_id.in_(item_ids) if item_ids is not None else true()
+        connection.execute(update(alerta).where(condicion).values(incidencias_resueltas_count=total))
+
+    # El período del mes actual también "cambia" los items sin incidencias: no cuenta como desfase
+    def normalizar(filas):
+        return {(f[0], *f[1:3], f[3] if f[4] == periodo else 0, *f[5:]) for f in filas}
+
+    return len({f[0] for f in normalizar(leer()) - normalizar(antes)})
@@ -1,18 +1,136 @@
 # -*- coding: utf-8 -*-
+"""
+Correos de notificación.
+
+Los cuerpos son plantillas Jinja (templates/email/) compiladas una vez por
+proceso. Cada correo lleva la versión HTML y una de texto plano generada a
+partir de ella. Las alertas y los resúmenes se renderizan una sola vez para
+todos los destinatarios: MAIL_ALERTAS_ENVIO='bcc' (por defecto) envía un
+único mensaje con los destinatarios en copia oculta; 'individual' envía un
+mensaje por destinatario con el mismo cuerpo, por una sola conexión SMTP.
+"""
+import re
+import threading
+from html.parser import HTMLParser
+
 from flask_mail import Message
-from flask import current_app
 from app import mail
-import threading
+from app.monitoreo import CORREOS_EN_CURSO, registrar_notificacion
+
+_plantillas = {}
+
 
-def enviar_email_async(app, msg):
+def enviar_email_async(app, msg, tipo='general'):
     """Envía email de forma asíncrona"""
-    with app.app_context():
+    with app.app_context(), CORREOS_EN_CURSO.track_inprogress():
         try:
             mail.send(msg)
+            registrar_notificacion('email', tipo, True)
             print("✅ Email enviado correctamente")
         except Exception as e:
+            registrar_notificacion('email', tipo, False)
             print(f"❌ Error al enviar email: {str(e)}")
 
+
+def enviar_emails(app, mensajes, tipo='general'):
+    """Envía varios emails por una sola conexión SMTP; devuelve cuántos se enviaron (los primeros)"""
+    with app.app_context(), CORREOS_EN_CURSO.track_inprogress():
+        enviados = 0
+        try:
+            with mail.connect() as conexion:
+                for msg in mensajes:
+                    conexion.send(msg)
+                    registrar_notificacion('email', tipo, True)
+                    enviados += 1
+            print(f"✅ {enviados} email(s) enviados correctamente")
+        except Exception as e:
+            for _ in mensajes[enviados:]:
+                registrar_notificacion('email', tipo, False)
+            print(f"❌ Error al enviar emails ({enviados}/{len(mensajes)} enviados): {str(e)}")
+        return enviados
+
+
+def enviar_emails_async(app, mensajes, tipo='general'):
+    """Envía varios emails en segundo plano"""
+    enviar_emails(app, mensajes, tipo)
+
+
+# ====================================
+# PLANTILLAS
+# ====================================
+
+class _TextoPlano(HTMLParser):
+    """Convierte el HTML de un correo en texto: bloques en líneas, enlaces con su URL"""
+    BLOQUES = {'p', 'div', 'tr', 'h1', 'h2', 'h3', 'ul', 'table', 'br'}
+    OMITIR = {'head', 'style', 'script', 'title'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.partes = []
+        self._omitir = 0
+        self._enlace = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.OMITIR:
+            self._omitir += 1
+        elif tag in self.BLOQUES:
+            self.partes.append('\n')
+        elif tag == 'li':
+            self.partes.append('\n- ')
+        elif tag == 'td':
+            self.partes.append(' ')
+        elif tag == 'a':
+            self._enlace = dict(attrs).get('href')
+
+    def handle_endtag(self, tag):
+        if tag in self.OMITIR:
+            self._omitir -= 1
+        elif tag in self.BLOQUES:
+            self.partes.append('\n')
+        elif tag == 'a' and self._enlace:
+            self.partes.append(f' ({self._enlace})')
+            self._enlace = None
+
+    def handle_data(self, data):
+        # Los saltos de línea del código fuente no cuentan: solo los de las etiquetas
+        if not self._omitir:
+            self.partes.append(re.sub(r'\s+', ' ', data))
+
+
+def texto_plano(html):
+    """Parte text/plain de un correo a partir de su HTML"""
+    conversor = _TextoPlano()
+    conversor.feed(html)
+    conversor.close()
+    lineas = (re.sub(r' +', ' ', linea).strip() for linea in ''.join(conversor.partes).split('\n'))
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lineas)).strip() + '\n'
+
+
+def _plantilla(app, nombre):
+    """Plantilla templates/email/<nombre>.html, compilada una vez por proceso"""
+    plantilla = _plantillas.get(nombre)
+    if plantilla is None:
+        plantilla = _plantillas.setdefault(nombre, app.jinja_env.get_template(f'email/{nombre}.html'))
+    return plantilla
+
+
+def renderizar_correo(app, nombre, **contexto):
+    """Devuelve (html, texto) del correo"""
+    html = _plantilla(app, nombre).render(url_sistema=app.config.get('URL_SISTEMA', 'http://127.0.0.1:5000'),
+                                          **contexto)
+    return html, texto_plano(html)
+
+
+def _mensajes_compartidos(app, asunto, destinatarios, html, texto):
+    """Mensajes con un mismo cuerpo para varios destinatarios (sin volver a renderizar)"""
+    destinatarios = list(dict.fromkeys(destinatarios))
+    if app.config.get('MAIL_ALERTAS_ENVIO', 'bcc') == 'individual':
+        return [Message(subject=asunto, recipients=[d], html=html, body=texto) for d in destinatarios]
+    # Copia oculta: el remitente figura como destinatario visible
+    remitente = app.config.get('MAIL_DEFAULT_SENDER')
+    return [Message(subject=asunto, recipients=[remitente], bcc=destinatarios, html=html, body=texto)]
+
+
 def enviar_notificacion_incidencia(app, tecnico, incidencia, item):
     """
     Envía notificación por email cuando se asigna una incidencia a un técnico
@@ -22,164 +140,16 @@ def enviar_notificacion_incidencia(app, tecnico, incidencia, item):
         return False
     
     try:
+        html, texto = renderizar_correo(app, 'incidencia', tecnico=tecnico, incidencia=incidencia, item=item)
         msg = Message(
             subject=f'INVENTECH - Nueva Incidencia Asignada: {incidencia.titulo}',
-            recipients=[tecnico.persona.correo]
+            recipients=[tecnico.persona.correo],
+            html=html,
+            body=texto
         )
         
-        # Determinar color según severidad
-        color_severidad = {
-            'critica': '#dc3545',
-            'alta': '#ffc107',
-            'media': '#17a2b8',
-            'baja': '#28a745'
-        }.get(incidencia.severidad, '#6c757d')
-        
-        # Construir HTML sin emojis directos en f-string
-        servicios_row = ''
-        if incidencia.servicios_afectados:
-            servicios_row = f'''<tr>
-                <td style="color: #666;"><strong>&#x1F527; Servicios Afectados:</strong></td>
-                <td style="color: #2c3e50;">{incidencia.servicios_afectados}</td>
-            </tr>'''
-        
-        descripcion_html = ''
-        if incidencia.descripcion:
-            descripcion_html = f'<p style="color: #555; font-size: 14px; line-height: 1.6; margin: 0 0 15px 0; padding: 15px; background-color: white; border-radius: 4px;">{incidencia.descripcion}</p>'
-        
-        msg.html = f'''
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        </head>
-        <body style="margin: 0; padding: 0; font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; background-color: #f4f4f4;">
-            <table width="100%" cellpadding="0" cellspacing="0" style="background-color: #f4f4f4; padding: 20px;">
-                <tr>
-                    <td align="center">
-                        <table width="600" cellpadding="0" cellspacing="0" style="background-color: white; border-radius: 8px; overflow: hidden; box-shadow: 0 2px 8px rgba(0,0,0,0.1);">
-                            
-                            <!-- ENCABEZADO -->
-                            <tr>
-                                <td style="background: linear-gradient(135deg, #2c3e50 0%, #34495e 100%); padding: 30px; text-align: center;">
-                                    <h1 style="color: white; margin: 0; font-size: 24px; font-weight: bold;">
-                                        &#x1F514; Nueva Incidencia Asignada
-                                    </h1>
-                                    <p style="color: #ecf0f1; margin: 10px 0 0 0; font-size: 14px;">
-                                        Sistema INVENTECH - Fiscalía de La Libertad
-                                    </p>
-                                </td>
-                            </tr>
-                            
-                            <!-- CONTENIDO -->
-                            <tr>
-                                <td style="padding: 30px;">
-                                    
-                                    <!-- SALUDO -->
-                                    <p style="color: #2c3e50; font-size: 16px; margin: 0 0 20px 0;">
-                                        Hola <strong>{tecnico.persona.nombres}</strong>,
-                                    </p>
-                                    
-                                    <p style="color: #555; font-size: 14px; line-height: 1.6; margin: 0 0 25px 0;">
-                                        Se le ha asignado una nueva incidencia que requiere su atención inmediata.
-                                    </p>
-                                    
-                                    <!-- TARJETA DE INCIDENCIA -->
-                                    <table width="100%" cellpadding="0" cellspacing="0" style="background-color: #f8f9fa; border-left: 4px solid {color_severidad}; border-radius: 6px; margin-bottom: 25px;">
-                                        <tr>
-                                            <td style="padding: 20px;">
-                                                
-                                                <!-- TÍTULO -->
-                                                <h2 style="color: #2c3e50; font-size: 18px; margin: 0 0 15px 0; font-weight: bold;">
-                                                    {incidencia.titulo}
-                                                </h2>
-                                                
-                                                <!-- BADGES -->
-                                                <div style="margin-bottom: 15px;">
-                                                    <span style="display: inline-block; background-color: {color_severidad}; color: white; padding: 4px 12px; border-radius: 12px; font-size: 11px; font-weight: bold; margin-right: 8px;">
-                                                        SEVERIDAD: {incidencia.severidad.upper()}
-                                                    </span>
-                                                    <span style="display: inline-block; background-color: #6c757d; color: white; padding: 4px 12px; border-radius: 12px; font-size: 11px; font-weight: bold;">
-                                                        TIPO: {incidencia.tipo.upper() if incidencia.tipo else 'NO ESPECIFICADO'}
-                                                    </span>
-                                                </div>
-                                                
-                                                <!-- DESCRIPCIÓN -->
-                                                {descripcion_html}
-                                                
-                                                <!-- DETALLES -->
-                                                <table width="100%" cellpadding="8" cellspacing="0" style="font-size: 13px;">
-                                                    <tr>
-                                                        <td style="color: #666; width: 40%;"><strong>&#x1F4E6; Item Afectado:</strong></td>
-                                                        <td style="color: #2c3e50;"><strong>{item.codigo}</strong> - {item.nombre}</td>
-                                                    </tr>
-                                                    <tr>
-                                                        <td style="color: #666;"><strong>&#x1F4C5; Fecha de Incidencia:</strong></td>
-                                                        <td style="color: #2c3e50;">{incidencia.fecha_incidencia.strftime('%d/%m/%Y %H:%M')}</td>
-                                                    </tr>
-                                                    <tr>
-                                                        <td style="color: #666;"><strong>&#x1F465; Usuarios Afectados:</strong></td>
-                                                        <td style="color: #2c3e50;">{incidencia.usuarios_afectados or 'No especificado'}</td>
-                                                    </tr>
-                                                    {servicios_row}
-                                                </table>
-                                                
-                                            </td>
-                                        </tr>
-                                    </table>
-                                    
-                                    <!-- BOTÓN DE ACCIÓN -->
-                                    <table width="100%" cellpadding="0" cellspacing="0">
-                                        <tr>
-                                            <td align="center" style="padding: 20px 0;">
-                                                <a href="http://127.0.0.1:5000/incidencias" 
-                                                   style="display: inline-block; background: linear-gradient(135deg, #28a745 0%, #20c997 100%); color: white; text-decoration: none; padding: 14px 35px; border-radius: 6px; font-weight: bold; font-size: 14px; box-shadow: 0 2px 8px rgba(40, 167, 69, 0.3);">
-                                                    Ver Incidencia en el Sistema &rarr;
-                                                </a>
-                                            </td>
-                                        </tr>
-                                    </table>
-                                    
-                                    <!-- NOTA IMPORTANTE -->
-                                    <table width="100%" cellpadding="0" cellspacing="0" style="background-color: #fff3cd; border-left: 4px solid #ffc107; border-radius: 6px; margin-top: 20px;">
-                                        <tr>
-                                            <td style="padding: 15px;">
-                                                <p style="color: #856404; font-size: 13px; margin: 0; line-height: 1.6;">
-                                                    <strong>&#x26A0; Importante:</strong> Por favor, atienda esta incidencia lo antes posible. El sistema calculará automáticamente las métricas de cumplimiento de SLA.
-                                                </p>
-                                            </td>
-                                        </tr>
-                                    </table>
-                                    
-                                </td>
-                            </tr>
-                            
-                            <!-- FOOTER -->
-                            <tr>
-                                <td style="background-color: #f8f9fa; padding: 20px; text-align: center; border-top: 1px solid #dee2e6;">
-                                    <p style="color: #6c757d; font-size: 12px; margin: 0 0 8px 0;">
-                                        Este es un mensaje automático del Sistema INVENTECH
-                                    </p>
-                                    <p style="color: #6c757d; font-size: 12px; margin: 0;">
-                                        <strong>Fiscalía de La Libertad</strong> &bull; Distrito Fiscal de La Libertad
-                                    </p>
-                                    <p style="color: #6c757d; font-size: 11px; margin: 8px 0 0 0;">
-                                        Av. América Oeste 2470, Trujillo &bull; (044) 608-600
-                                    </p>
-                                </td>
-                            </tr>
-                            
-                        </table>
-                    </td>
-                </tr>
-            </table>
-        </body>
-        </html>
-        '''
-        
         # Enviar en segundo plano
-        thread = threading.Thread(target=enviar_email_async, args=(app, msg))
+        thread = threading.Thread(target=enviar_email_async, args=(app, msg, 'incidencia'))
         thread.start()
         
         return True
@@ -189,6 +159,24 @@ def enviar_notificacion_incidencia(app, tecnico, incidencia, item):
         return False
 
 
+def mensajes_alerta_critica(app, alerta, item, destinatarios):
+    """Mensajes de la notificación de una alerta (un solo render para todos los destinatarios)"""
+    html, texto = renderizar_correo(app, 'alerta_critica', alerta=alerta, item=item)
+    return _mensajes_compartidos(app, f'ALERTA CRITICA - {item.codigo}: {item.nombre}',
+                                 destinatarios, html, texto)
+
+
+def mensajes_resumen_alertas(app, alertas, items, destinatarios):
+    """Mensajes del resumen de varias alertas (alertas ordenadas por urgencia, items {item_id: item})"""
+    criticas = sum(1 for alerta in alertas if alerta.nivel_urgencia == 'critica')
+    html, texto = renderizar_correo(app, 'resumen_alertas', alertas=alertas, items=items, criticas=criticas)
+    return _mensajes_compartidos(
+        app,
+        f'INVENTECH - Resumen de {len(alertas)} alertas' + (f' ({criticas} críticas)' if criticas else ''),
+        destinatarios, html, texto
+    )
+
+
 def enviar_notificacion_alerta_critica(app, alerta, item, destinatarios):
     """
     Envía notificación por email cuando se genera una alerta crítica
@@ -204,202 +192,10 @@ def enviar_notificacion_alerta_critica(app, alerta, item, destinatarios):
         return False
     
     try:
-        msg = Message(
-            subject=f'ALERTA CRITICA - {item.codigo}: {item.nombre}',
-            recipients=destinatarios
-        )
-        
-        # Determinar color según urgencia
-        color_urgencia = {
-            'critica': '#dc3545',
-            'alta': '#ff6b6b',
-            'media': '#ffc107',
-            'baja': '#28a745'
-        }.get(alerta.nivel_urgencia, '#6c757d')
-        
-        # Icono según urgencia (código HTML)
-        icono_urgencia = {
-            'critica': '&#x1F6A8;',
-            'alta': '&#x26A0;',
-            'media': '&#x26A1;',
-            'baja': '&#x2139;'
-        }.get(alerta.nivel_urgencia, '&#x1F514;')
-        
-        # Construir row de incidencias pendientes
-        incidencias_row = ''
-        if alerta.incidencias_pendientes > 0:
-            incidencias_row = f'''<tr>
-                <td style="color: #666;"><strong>Incidencias Pendientes:</strong></td>
-                <td style="color: #dc3545; font-weight: bold;">{alerta.incidencias_pendientes}</td>
-            </tr>'''
-        
-        # Construir item de lista para incidencias pendientes
-        incidencias_li = ''
-        if alerta.incidencias_pendientes > 0:
-            incidencias_li = f'<li style="font-weight: bold; color: #d32f2f;">Resolver las {alerta.incidencias_pendientes} incidencias pendientes</li>'
-        
-        msg.html = f'''
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        </head>
-        <body style="margin: 0; padding: 0; font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; background-color: #f4f4f4;">
-            <table width="100%" cellpadding="0" cellspacing="0" style="background-color: #f4f4f4; padding: 20px;">
-                <tr>
-                    <td align="center">
-                        <table width="600" cellpadding="0" cellspacing="0" style="background-color: white; border-radius: 8px; overflow: hidden; box-shadow: 0 4px 16px rgba(0,0,0,0.15);">
-                            
-                            <!-- ENCABEZADO CRÍTICO -->
-                            <tr>
-                                <td style="background: linear-gradient(135deg, {color_urgencia} 0%, #a71d2a 100%); padding: 35px; text-align: center;">
-                                    <div style="font-size: 48px; margin-bottom: 10px;">{icono_urgencia}</div>
-                                    <h1 style="color: white; margin: 0; font-size: 26px; font-weight: bold; text-transform: uppercase;">
-                                        ALERTA {alerta.nivel_urgencia.upper()}
-                                    </h1>
-                                    <p style="color: #fff; margin: 10px 0 0 0; font-size: 14px; opacity: 0.95;">
-                                        Sistema INVENTECH - Requiere Atención Inmediata
-                                    </p>
-                                </td>
-                            </tr>
-                            
-                            <!-- CONTENIDO -->
-                            <tr>
-                                <td style="padding: 30px;">
-                                    
-                                    <!-- MENSAJE DE URGENCIA -->
-                                    <table width="100%" cellpadding="0" cellspacing="0" style="background-color: #fff3cd; border-left: 4px solid #ffc107; border-radius: 6px; margin-bottom: 25px;">
-                                        <tr>
-                                            <td style="padding: 15px;">
-                                                <p style="color: #856404; font-size: 14px; margin: 0; line-height: 1.6; font-weight: 600;">
-                                                    &#x26A0; Se ha generado una alerta automática que requiere su atención inmediata
-                                                </p>
-                                            </td>
-                                        </tr>
-                                    </table>
-                                    
-                                    <!-- INFORMACIÓN DEL ITEM -->
-                                    <h2 style="color: #2c3e50; font-size: 18px; margin: 0 0 15px 0; font-weight: bold; border-bottom: 2px solid #dee2e6; padding-bottom: 10px;">
-                                        &#x1F4E6; Item Afectado
-                                    </h2>
-                                    
-                                    <table width="100%" cellpadding="8" cellspacing="0" style="font-size: 14px; margin-bottom: 25px;">
-                                        <tr>
-                                            <td style="color: #666; width: 35%;"><strong>Código:</strong></td>
-                                            <td style="color: #2c3e50; font-weight: bold;">{item.codigo}</td>
-                                        </tr>
-                                        <tr>
-                                            <td style="color: #666;"><strong>Nombre:</strong></td>
-                                            <td style="color: #2c3e50;">{item.nombre}</td>
-                                        </tr>
-                                        <tr>
-                                            <td style="color: #666;"><strong>Tipo:</strong></td>
-                                            <td style="color: #2c3e50; text-transform: capitalize;">{item.tipo}</td>
-                                        </tr>
-                                        <tr>
-                                            <td style="color: #666;"><strong>Categoría:</strong></td>
-                                            <td style="color: #2c3e50;">{item.categoria or 'No especificada'}</td>
-                                        </tr>
-                                    </table>
-                                    
-                                    <!-- DETALLES DE LA ALERTA -->
-                                    <h2 style="color: #2c3e50; font-size: 18px; margin: 0 0 15px 0; font-weight: bold; border-bottom: 2px solid #dee2e6; padding-bottom: 10px;">
-                                        &#x1F514; Detalles de la Alerta
-                                    </h2>
-                                    
-                                    <table width="100%" cellpadding="0" cellspacing="0" style="background-color: #f8f9fa; border-left: 4px solid {color_urgencia}; border-radius: 6px; margin-bottom: 25px;">
-                                        <tr>
-                                            <td style="padding: 20px;">
-                                                <p style="color: #2c3e50; font-size: 14px; line-height: 1.8; margin: 0;">
-                                                    {alerta.mensaje}
-                                                </p>
-                                            </td>
-                                        </tr>
-                                    </table>
-                                    
-                                    <table width="100%" cellpadding="8" cellspacing="0" style="font-size: 13px; margin-bottom: 25px;">
-                                        <tr>
-                                            <td style="color: #666; width: 35%;"><strong>Nivel de Urgencia:</strong></td>
-                                            <td>
-                                                <span style="display: inline-block; background-color: {color_urgencia}; color: white; padding: 4px 12px; border-radius: 12px; font-size: 11px; font-weight: bold;">
-                                                    {alerta.nivel_urgencia.upper()}
-                                                </span>
-                                            </td>
-                                        </tr>
-                                        <tr>
-                                            <td style="color: #666;"><strong>Tipo de Alerta:</strong></td>
-                                            <td style="color: #2c3e50; text-transform: capitalize;">{alerta.tipo.replace('_', ' ')}</td>
-                                        </tr>
-                                        <tr>
-                                            <td style="color: #666;"><strong>Fecha de Creación:</strong></td>
-                                            <td style="color: #2c3e50;">{alerta.fecha_creacion.strftime('%d/%m/%Y %H:%M:%S')}</td>
-                                        </tr>
-                                        {incidencias_row}
-                                    </table>
-                                    
-                                    <!-- BOTONES DE ACCIÓN -->
-                                    <table width="100%" cellpadding="0" cellspacing="0">
-                                        <tr>
-                                            <td align="center" style="padding: 20px 0;">
-                                                <a href="http://127.0.0.1:5000/alertas" 
-                                                   style="display: inline-block; background: linear-gradient(135deg, {color_urgencia} 0%, #a71d2a 100%); color: white; text-decoration: none; padding: 14px 35px; border-radius: 6px; font-weight: bold; font-size: 14px; box-shadow: 0 4px 12px rgba(220, 53, 69, 0.4); margin-right: 10px;">
-                                                    &#x1F6A8; Ver Alerta Ahora
-                                                </a>
-                                                <a href="http://127.0.0.1:5000/incidencias" 
-                                                   style="display: inline-block; background: linear-gradient(135deg, #2c3e50 0%, #34495e 100%); color: white; text-decoration: none; padding: 14px 35px; border-radius: 6px; font-weight: bold; font-size: 14px; box-shadow: 0 4px 12px rgba(44, 62, 80, 0.4);">
-                                                    &#x1F4CB; Ver Incidencias
-                                                </a>
-                                            </td>
-                                        </tr>
-                                    </table>
-                                    
-                                    <!-- ACCIONES RECOMENDADAS -->
-                                    <table width="100%" cellpadding="0" cellspacing="0" style="background-color: #e3f2fd; border-left: 4px solid #2196f3; border-radius: 6px; margin-top: 20px;">
-                                        <tr>
-                                            <td style="padding: 15px;">
-                                                <p style="color: #1565c0; font-size: 13px; margin: 0 0 10px 0; font-weight: bold;">
-                                                    &#x1F4A1; Acciones Recomendadas:
-                                                </p>
-                                                <ul style="color: #1976d2; font-size: 12px; margin: 0; padding-left: 20px; line-height: 1.8;">
-                                                    <li>Revisar el estado actual del item en el sistema</li>
-                                                    <li>Verificar las incidencias asociadas</li>
-                                                    <li>Implementar medidas correctivas inmediatas</li>
-                                                    <li>Documentar las acciones realizadas</li>
-                                                    {incidencias_li}
-                                                </ul>
-                                            </td>
-                                        </tr>
-                                    </table>
-                                    
-                                </td>
-                            </tr>
-                            
-                            <!-- FOOTER -->
-                            <tr>
-                                <td style="background-color: #2c3e50; padding: 20px; text-align: center;">
-                                    <p style="color: #ecf0f1; font-size: 12px; margin: 0 0 8px 0;">
-                                        Este es un mensaje automático generado por el Sistema INVENTECH
-                                    </p>
-                                    <p style="color: #bdc3c7; font-size: 12px; margin: 0;">
-                                        <strong>Fiscalía de La Libertad</strong> &bull; Distrito Fiscal de La Libertad
-                                    </p>
-                                    <p style="color: #95a5a6; font-size: 11px; margin: 8px 0 0 0;">
-                                        Av. América Oeste 2470, Trujillo &bull; (044) 608-600
-                                    </p>
-                                </td>
-                            </tr>
-                            
-                        </table>
-                    </td>
-                </tr>
-            </table>
-        </body>
-        </html>
-        '''
+        mensajes = mensajes_alerta_critica(app, alerta, item, destinatarios)
         
         # Enviar en segundo plano
-        thread = threading.Thread(target=enviar_email_async, args=(app, msg))
+        thread = threading.Thread(target=enviar_emails_async, args=(app, mensajes, 'alerta_critica'))
         thread.start()
         
         print(f"✅ Notificación de alerta enviada a {len(destinatarios)} destinatario(s)")
@@ -407,4 +203,4 @@ def enviar_notificacion_alerta_critica(app, alerta, item, destinatarios):
         
     except Exception as e:
         print(f"❌ Error al preparar notificación de alerta: {str(e)}")
-        return False
\ No newline at end of file
+        return False
@@ -0,0 +1,163 @@
+"""
+Estado vigente de los items (relación item_estado).
+
+Una fila por item con lo que reportes, métricas automáticas y listados
+recalculaban en cada consulta:
+- vigente: aprobado, operativo y no reemplazado por otro item
+- reemplazado_por_id: item que lo reemplaza
+- limite_incidencias (métricas) y limite_sla (alertas)
+- última métrica (id, mes, anio, semaforo, porcentaje_cumplimiento)
+
+Es una tabla en PostgreSQL y en SQLite: en cada flush que modifica item, sla
+o metrica se recalculan (upsert) solo las filas de los items afectados, en la
+misma transacción, así que item_estado siempre es consistente con lo
+confirmado y nunca se recalcula entera por un commit.
+
+Se crea junto con las tablas (db.create_all) o con migrate_item_estado.py.
+"""
+from sqlalchemy import event, select, func, case, and_, delete, insert, inspect, true
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import aliased
+
+from app import db
+from app.models import Item, SLA, Metrica, ItemEstado
+
+TABLA = ItemEstado.__table__
+
+
+def consulta_item_estado(item_ids=None):
+    """SELECT que define item_estado (todas las filas o las de item_ids)"""
+    sucesor = aliased(Item)
+    reemplazado_por = select(func.min(sucesor.id)).where(sucesor.reemplaza_a_id == Item.id).correlate(Item).scalar_subquery()
+
+    # Primer SLA del item (como SLA.query.filter_by(item_id=...).first())
+    primer_sla = aliased(SLA)
+    sla_id = select(func.min(primer_sla.id)).where(primer_sla.item_id == Item.id).correlate(Item).scalar_subquery()
+    fallas = func.coalesce(SLA.fallas_criticas_permitidas, 0) + func.coalesce(SLA.fallas_menores_permitidas, 0)
+
+    reciente = aliased(Metrica)
+    ultima_metrica = select(reciente.id).where(reciente.item_id == Item.id).order_by(
+        reciente.anio.desc(), reciente.mes.desc()
+    ).limit(1).correlate(Item).scalar_subquery()
+
+    es_producto = Item.tipo == 'producto'
+    consulta = select(
+        Item.id.label('item_id'),
+        case((and_(Item.estado == 'aprobado', Item.estado_operativo == 'activo', reemplazado_por.is_(None)), True),
+             else_=False).label('vigente'),
+        reemplazado_por.label('reemplazado_por_id'),
+        # metricas_service.limite_incidencias
+        case((and_(es_producto, SLA.id.isnot(None)), fallas), else_=3).label('limite_incidencias'),
+        # Item.limite_sla
+        case((and_(es_producto, SLA.id.isnot(None), fallas > 0), fallas), else_=2).label('limite_sla'),
+        Metrica.id.label('metrica_id'),
+        Metrica.mes.label('metrica_mes'),
+        Metrica.anio.label('metrica_anio'),
+        Metrica.semaforo,
+        Metrica.porcentaje_cumplimiento,
+    ).select_from(Item).outerjoin(SLA, SLA.id == sla_id).outerjoin(Metrica, Metrica.id == ultima_metrica)
+
+    if item_ids is not None:
+        consulta = consulta.where(Item.id.in_(item_ids))
+    return consulta
+
+
+def filtro_vigente(query):
+    """Restringe una consulta de Item a los items vigentes"""
+    return query.join(ItemEstado, ItemEstado.item_id == Item.id).filter(ItemEstado.vigente)
+
+
+# ====================================
+# CREACIÓN
+# ====================================
+
+def _sql(connection, consulta):
+    return str(consulta.compile(dialect=connection.dialect, compile_kwargs={'literal_binds': True}))
+
+
+def crear_item_estado(connection):
+    """Crea la tabla (si no existe) y la llena"""
+    if inspect(connection).has_table('item_estado'):
+        return
+    TABLA.create(connection)
+    refrescar_item_estado(connection)
+
+
+def eliminar_item_estado(connection):
+    TABLA.drop(connection, checkfirst=True)
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _crear_con_tablas(target, connection, **kw):
+    crear_item_estado(connection)
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def _eliminar_con_tablas(target, connection, **kw):
+    eliminar_item_estado(connection)
+
+
+# ====================================
+# ACTUALIZACIÓN
+# ====================================
+
+def refrescar_item_estado(connection, item_ids=None):
+    """Recalcula las filas de los items indicados (o todas)"""
+    # En orden de item_id: dos transacciones que tocan los mismos items los bloquean en el mismo orden
+    consulta = consulta_item_estado(item_ids).order_by(Item.id)
+    columnas = [c.name for c in consulta.selected_columns]
+
+    # Filas de items que ya no existen
+    borrar = delete(TABLA).where(TABLA.c.item_id.not_in(select(Item.id)))
+    if item_ids is not None:
+        borrar = borrar.where(TABLA.c.item_id.in_(item_ids))
+    connection.execute(borrar)
+
+    if connection.dialect.name in ('postgresql', 'sqlite'):
+        insert_dialecto = pg_insert if connection.dialect.name == 'postgresql' else sqlite_insert
+        # SQLite exige un WHERE en el SELECT de un INSERT ... ON CONFLICT
+        stmt = insert_dialecto(TABLA).from_select(columnas, consulta.where(true()))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['item_id'],
+            set_={c: stmt.excluded[c] for c in columnas if c != 'item_id'}
+        )
+        connection.execute(stmt)
+        return
+
+    borrar = delete(TABLA)
+    if item_ids is not None:
+        borrar = borrar.where(TABLA.c.item_id.in_(item_ids))
+    connection.execute(borrar)
+    connection.execute(insert(TABLA).from_select(columnas, consulta))
+
+
+def actualizar_item_estado(connection, item_ids):
+    """Para escrituras con SQL directo: actualiza item_estado para esos items"""
+    item_ids = set(item_ids) - {None}
+    if item_ids:
+        refrescar_item_estado(connection, item_ids)
+
+
+def _anterior(obj, atributo):
+    historia = db.inspect(obj).attrs[atributo].history
+    return (historia.deleted or [None])[0]
+
+
+def _items_afectados(session):
+    ids = set()
+    modificados = [obj for obj in session.dirty if session.is_modified(obj, include_collections=False)]
+    for obj in list(session.new) + list(session.deleted) + modificados:
+        if isinstance(obj, Item):
+            # El item reemplazado cambia de sucesor y de vigencia
+            ids.update((obj.id, obj.reemplaza_a_id, _anterior(obj, 'reemplaza_a_id')))
+        elif isinstance(obj, (SLA, Metrica)):
+            ids.update((obj.item_id, _anterior(obj, 'item_id')))
+    return ids - {None}
+
+
+@event.listens_for(db.session, 'after_flush')
+def _actualizar_flush(session, flush_context):
+    ids = _items_afectados(session)
+    if ids:
+        refrescar_item_estado(session.connection(), ids)
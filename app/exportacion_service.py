@@ -0,0 +1,227 @@
+"""
+Exportación de datos en CSV y XLSX como flujo (memoria constante).
+
+Las filas se leen con yield_per (cursor del servidor en PostgreSQL) y se
+escriben a medida que llegan: la descarga empieza con la primera fila y la
+memoria no depende del número de filas.
+
+El XLSX se arma a mano sobre zipfile (sin dependencias): una sola hoja con
+cadenas en línea (sin tabla de cadenas compartidas) comprimida a medida que
+se escribe.
+"""
+import csv
+import io
+import re
+import zipfile
+from datetime import datetime, date
+from xml.sax.saxutils import escape
+
+from flask import Response, stream_with_context
+
+LOTE_LECTURA = 1000
+FILAS_POR_ENVIO = 200
+
+_TIPOS_MIME = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def leer_en_lotes(*consultas, lote=LOTE_LECTURA):
+    """Recorre una o más consultas ORM sin cargarlas completas en memoria"""
+    for consulta in consultas:
+        yield from consulta.yield_per(lote)
+
+
+def _valor_celda(valor):
+    if isinstance(valor, datetime):
+        return valor.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(valor, date):
+        return valor.strftime('%Y-%m-%d')
+    return '' if valor is None else valor
+
+
+# ====================================
+# CSV
+# ====================================
+
+def generar_csv(columnas, filas):
+    """Genera el CSV por bloques: BOM (para Excel), encabezado y filas"""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+
+    buffer.write('\ufeff')
+    escritor.writerow([titulo for titulo, _ in columnas])
+
+    for i, fila in enumerate(filas, start=1):
+        escritor.writerow([_valor_celda(valor(fila)) for _, valor in columnas])
+        if i % FILAS_POR_ENVIO == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue().encode('utf-8')
+
+
+# ====================================
+# XLSX
+# ====================================
+
+class _SalidaZip(io.RawIOBase):
+    """Destino no posicionable para zipfile: acumula bytes hasta que se retiran"""
+
+    def __init__(self):
+        self._partes = []
+        self._posicion = 0
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._posicion
+
+    def retirar(self):
+        datos = b''.join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+
+_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+# Estilos: 0 = normal, 1 = fecha y hora, 2 = encabezado en negrita
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="1"><numFmt numFmtId="164" formatCode="dd/mm/yyyy hh:mm"/></numFmts>'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="3"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+    '</styleSheet>'
+)
+
+_EPOCA_EXCEL = datetime(1899, 12, 30)
+
+# Caracteres de control que XML no admite
+_CONTROL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _workbook(nombre_hoja):
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{escape(nombre_hoja[:31])}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+
+
+def _celda(valor, estilo=0):
+    if valor is None or valor == '':
+        return '<c/>'
+    if isinstance(valor, bool):
+        return f'<c t="b"><v>{int(valor)}</v></c>'
+    if isinstance(valor, (int, float)):
+        return f'<c><v>{valor}</v></c>'
+    if isinstance(valor, datetime):
+        serial = (valor - _EPOCA_EXCEL).total_seconds() / 86400
+        return f'<c s="1"><v>{serial:.6f}</v></c>'
+    if isinstance(valor, date):
+        return _celda(datetime(valor.year, valor.month, valor.day))
+    texto = escape(_CONTROL.sub('', str(valor)))
+    estilo_attr = f' s="{estilo}"' if estilo else ''
+    return f'<c t="inlineStr"{estilo_attr}><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _fila_xml(celdas):
+    return '<row>' + ''.join(celdas) + '</row>'
+
+
+def generar_xlsx(columnas, filas, nombre_hoja='Datos'):
+    """Genera un XLSX de una hoja por bloques (ZIP comprimido en flujo)"""
+    salida = _SalidaZip()
+
+    with zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_DEFLATED) as archivo:
+        archivo.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        archivo.writestr('_rels/.rels', _RELS)
+        archivo.writestr('xl/workbook.xml', _workbook(nombre_hoja))
+        archivo.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+        archivo.writestr('xl/styles.xml', _STYLES)
+        yield salida.retirar()
+
+        with archivo.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as hoja:
+            hoja.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                + _fila_xml(_celda(titulo, estilo=2) for titulo, _ in columnas)
+            ).encode('utf-8'))
+
+            bloque = []
+            for fila in filas:
+                bloque.append(_fila_xml(_celda(valor(fila)) for _, valor in columnas))
+                if len(bloque) >= FILAS_POR_ENVIO:
+                    hoja.write(''.join(bloque).encode('utf-8'))
+                    bloque.clear()
+                    datos = salida.retirar()
+                    if datos:
+                        yield datos
+
+            hoja.write((''.join(bloque) + '</sheetData></worksheet>').encode('utf-8'))
+
+    yield salida.retirar()
+
+
+# ====================================
+# RESPUESTA HTTP
+# ====================================
+
+def respuesta_exportacion(formato, nombre, columnas, filas, nombre_hoja='Datos'):
+    """Response en flujo con el archivo CSV o XLSX"""
+    if formato == 'xlsx':
+        contenido = generar_xlsx(columnas, filas, nombre_hoja)
+    else:
+        formato = 'csv'
+        contenido = generar_csv(columnas, filas)
+
+    nombre_archivo = f'{nombre}_{datetime.now().strftime("%Y%m%d_%H%M")}.{formato}'
+    return Response(
+        stream_with_context(contenido),
+        mimetype=_TIPOS_MIME[formato],
+        headers={
+            'Content-Disposition': f'attachment; filename="{nombre_archivo}"',
+            'X-Accel-Buffering': 'no'
+        }
+    )
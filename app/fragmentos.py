@@ -0,0 +1,113 @@
+"""
+Caché de plantillas Jinja.
+
+- Bytecode: las plantillas compiladas se guardan en disco (JINJA_CACHE_DIR)
+  y todos los workers las reutilizan al arrancar.
+- Fragmentos: la etiqueta {% cache %} guarda el HTML de un bloque en memoria
+  del worker, identificado por un nombre, claves adicionales (rol, filtros...)
+  y la versión de las tablas de las que depende (contador_cambios).
+
+    {% cache 'navegacion', ['alerta'], session.rol, session.username %}
+        ...
+    {% endcache %}
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from flask import current_app
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+
+from app.cambios import versiones_solicitud
+
+_fragmentos = OrderedDict()
+_lock = threading.Lock()
+_estadisticas = {'aciertos': 0, 'fallos': 0}
+
+
+class FragmentoCache(Extension):
+    """Etiqueta {% cache nombre, tablas, *claves %} ... {% endcache %}"""
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+
+        argumentos = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            argumentos.append(parser.parse_expression())
+
+        cuerpo = parser.parse_statements(['name:endcache'], drop_needle=True)
+
+        return nodes.CallBlock(
+            self.call_method('_renderizar', [nodes.List(argumentos)]), [], [], cuerpo
+        ).set_lineno(lineno)
+
+    def _renderizar(self, argumentos, caller):
+        if not current_app.config.get('FRAGMENTOS_CACHE_ACTIVO', True):
+            return caller()
+
+        nombre, tablas, *claves = argumentos
+        versiones = versiones_solicitud(tuple(tablas))
+        clave = (nombre, tuple(str(c) for c in claves), versiones)
+
+        with _lock:
+            html = _fragmentos.get(clave)
+            if html is not None:
+                _fragmentos.move_to_end(clave)
+                _estadisticas['aciertos'] += 1
+                return html
+
+        html = caller()
+        _guardar(clave, html)
+        return html
+
+
+def valor_versionado(nombre, tablas, calcular):
+    """Memoriza un valor (p. ej. un conteo del menú) hasta que cambie alguna de sus tablas"""
+    if not current_app.config.get('FRAGMENTOS_CACHE_ACTIVO', True):
+        return calcular()
+
+    clave = ('valor', nombre, versiones_solicitud(tuple(tablas)))
+
+    with _lock:
+        if clave in _fragmentos:
+            _fragmentos.move_to_end(clave)
+            _estadisticas['aciertos'] += 1
+            return _fragmentos[clave]
+
+    valor = calcular()
+    _guardar(clave, valor)
+    return valor
+
+
+def _guardar(clave, valor):
+    maximo = current_app.config.get('FRAGMENTOS_CACHE_MAX', 500)
+    with _lock:
+        _estadisticas['fallos'] += 1
+        _fragmentos[clave] = valor
+        while len(_fragmentos) > maximo:
+            _fragmentos.popitem(last=False)
+
+
+def init_plantillas(app):
+    """Activa la caché de bytecode compartida y la etiqueta {% cache %}"""
+    directorio = app.config.get('JINJA_CACHE_DIR')
+    if directorio:
+        try:
+            os.makedirs(directorio, exist_ok=True)
+            app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directorio, '__inventech_%s.cache')
+        except OSError as e:
+            print(f"⚠️  Caché de bytecode Jinja no disponible: {e}")
+
+    app.jinja_env.add_extension(FragmentoCache)
+
+
+def limpiar_fragmentos():
+    with _lock:
+        _fragmentos.clear()
+
+
+def estadisticas_fragmentos():
+    with _lock:
+        return {'fragmentos': len(_fragmentos), **_estadisticas}
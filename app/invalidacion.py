@@ -0,0 +1,322 @@
+"""
+Bus de invalidación de cachés entre workers.
+
+Cada commit publica las claves que cambió: el nombre de la tabla ('item') y
+la entidad ('item:12'). Las cachés en memoria del worker se suscriben por
+tabla y descartan sus entradas al recibir el aviso.
+
+- PostgreSQL: NOTIFY en el canal INVALIDACION_CANAL. Se emite dentro de la
+  misma transacción (after_flush), así que PostgreSQL lo entrega solo si el
+  commit se confirma. Cada worker mantiene una conexión con LISTEN en un
+  hilo; el aviso llega en milisegundos.
+- SQLite: un hilo por worker consulta contador_cambios cada
+  INVALIDACION_INTERVALO segundos y avisa de las tablas cuya versión cambió
+  (solo claves de tabla; también los commits del propio worker).
+- En el propio worker el aviso se despacha en after_commit, sin esperar.
+
+Si la escucha se cae se avisa '*' (descartar todo) y se reintenta; mientras
+tanto bus_activo() es False y las cachés vuelven a comparar la versión de
+contador_cambios en cada solicitud.
+"""
+import json
+import os
+import select
+import socket
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from flask import current_app, request
+from sqlalchemy import event, inspect, text
+
+from app import db
+from app.models import ContadorCambios
+
+TODO = '*'
+# Límite de NOTIFY: 8000 bytes por payload
+_MAX_PAYLOAD = 7500
+
+_suscriptores = []
+_estado = {'pid': None, 'activo': False, 'ultimo_error': None}
+_estadisticas = {'publicados': 0, 'recibidos': 0, 'despachados': 0, 'reconexiones': 0}
+_lock = threading.Lock()
+
+
+def _contar(clave):
+    # El hilo de escucha y los hilos de las solicitudes actualizan las estadísticas
+    with _lock:
+        _estadisticas[clave] += 1
+
+
+def _origen():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+# ====================================
+# SUSCRIPCIÓN
+# ====================================
+
+def suscribir(tablas, callback, locales=True):
+    """
+    Llama a callback(claves) cuando cambian las tablas indicadas.
+    locales=False: ignora los commits hechos por la sesión de este worker
+    (para cachés que ya se actualizan solas con esos commits).
+    """
+    _suscriptores.append((tuple(tablas), callback, locales))
+
+
+def _despachar(claves, local):
+    if TODO in claves:
+        por_tabla = None
+    else:
+        por_tabla = defaultdict(set)
+        for clave in claves:
+            por_tabla[clave.split(':', 1)[0]].add(clave)
+
+    for tablas, callback, locales in list(_suscriptores):
+        if local and not locales:
+            continue
+        afectadas = {TODO} if por_tabla is None else set().union(*(por_tabla.get(t, ()) for t in tablas))
+        if not afectadas:
+            continue
+        try:
+            callback(afectadas)
+            _contar('despachados')
+        except Exception as e:
+            print(f"⚠️ Error al invalidar caché ({tablas}): {e}")
+
+
+def bus_activo():
+    """True si este worker está recibiendo los avisos de los demás"""
+    return _estado['activo'] and _estado['pid'] == os.getpid()
+
+
+# ====================================
+# PUBLICACIÓN
+# ====================================
+
+def _payload(claves, origen):
+    payload = json.dumps({'o': origen, 'k': sorted(claves)}, separators=(',', ':'))
+    if len(payload) > _MAX_PAYLOAD:
+        # Demasiadas entidades: basta con avisar las tablas
+        payload = json.dumps({'o': origen, 'k': sorted({c.split(':', 1)[0] for c in claves})},
+                             separators=(',', ':'))
+    return payload
+
+
+def publicar_en_conexion(connection, claves, origen=''):
+    """Publica claves en la transacción de `connection` (NOTIFY en PostgreSQL; en SQLite basta el contador)"""
+    if not claves or connection.dialect.name != 'postgresql':
+        return
+    canal = current_app.config.get('INVALIDACION_CANAL', 'inventech_cache')
+    connection.execute(text('SELECT pg_notify(:canal, :payload)'),
+                       {'canal': canal, 'payload': _payload(claves, origen)})
+    _contar('publicados')
+
+
+@event.listens_for(db.session, 'after_flush')
+def _claves_flush(session, flush_context):
+    claves = set()
+    modificados = [obj for obj in session.dirty if session.is_modified(obj, include_collections=False)]
+    for obj in list(session.new) + list(session.deleted) + modificados:
+        tabla = obj.__table__.name
+        if tabla == ContadorCambios.__tablename__:
+            continue
+        claves.add(tabla)
+        identidad = inspect(obj).identity
+        if identidad and len(identidad) == 1:
+            claves.add(f'{tabla}:{identidad[0]}')
+
+    if not claves:
+        return
+    session.info.setdefault('invalidacion', set()).update(claves)
+    # Los commits de esta sesión ya se despachan localmente: el listener los ignora
+    publicar_en_conexion(session.connection(), claves, _origen())
+
+
+@event.listens_for(db.session, 'after_commit')
+def _despachar_commit(session):
+    claves = session.info.pop('invalidacion', None)
+    if claves:
+        _despachar(claves, local=True)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _descartar_rollback(session):
+    session.info.pop('invalidacion', None)
+
+
+# ====================================
+# ESCUCHA (un hilo por worker)
+# ====================================
+
+def _recibir(claves):
+    _contar('recibidos')
+    _despachar(set(claves), local=False)
+
+
+def _escuchar_postgres(engine, canal, intervalo):
+    conexion = engine.raw_connection()
+    dbapi = conexion.driver_connection
+    # Conexión propia del hilo, fuera del pool
+    conexion.detach()
+    try:
+        dbapi.autocommit = True
+        dbapi.cursor().execute(f'LISTEN "{canal}"')
+        _conectado()
+        propio = _origen()
+        while True:
+            if select.select([dbapi], [], [], intervalo) == ([], [], []):
+                continue
+            dbapi.poll()
+            while dbapi.notifies:
+                aviso = dbapi.notifies.pop(0)
+                try:
+                    datos = json.loads(aviso.payload)
+                except ValueError:
+                    continue
+                if datos.get('o') != propio:
+                    _recibir(datos.get('k', ()))
+    finally:
+        dbapi.close()
+
+
+def _sondear_sqlite(engine, intervalo):
+    conexion = engine.raw_connection()
+    dbapi = conexion.driver_connection
+    conexion.detach()
+    try:
+        anteriores = None
+        while True:
+            # Sin BEGIN explícito: la lectura no deja una transacción abierta
+            actuales = dict(dbapi.execute(
+                f'SELECT tabla, version FROM {ContadorCambios.__tablename__}'
+            ).fetchall())
+            if anteriores is None:
+                _conectado()
+            else:
+                cambiadas = {t for t, v in actuales.items() if anteriores.get(t) != v}
+                if cambiadas:
+                    _recibir(cambiadas)
+            anteriores = actuales
+            time.sleep(intervalo)
+    finally:
+        dbapi.close()
+
+
+def _conectado():
+    _estado['activo'] = True
+    _estado['ultimo_error'] = None
+
+
+def _escuchar(app):
+    config = app.config
+    intervalo = config.get('INVALIDACION_INTERVALO', 1.0)
+    espera = intervalo
+
+    with app.app_context():
+        engine = db.engine
+
+    while True:
+        try:
+            if engine.dialect.name == 'postgresql':
+                _escuchar_postgres(engine, config.get('INVALIDACION_CANAL', 'inventech_cache'), intervalo)
+            else:
+                _sondear_sqlite(engine, intervalo)
+        except Exception as e:
+            _estado['ultimo_error'] = (str(e).splitlines() or [type(e).__name__])[0][:200]
+            if _estado['activo']:
+                print(f"⚠️ Bus de invalidación desconectado: {_estado['ultimo_error']}")
+
+        # Se pudieron perder avisos: descartar todo y reconectar
+        espera = intervalo if _estado['activo'] else min(30.0, espera * 2)
+        _estado['activo'] = False
+        _contar('reconexiones')
+        _despachar({TODO}, local=False)
+        time.sleep(espera)
+
+
+def _asegurar_escucha(app):
+    """Inicia el hilo de escucha en este proceso (después del fork de gunicorn)"""
+    pid = os.getpid()
+    if _estado['pid'] == pid:
+        return
+    with _lock:
+        if _estado['pid'] == pid:
+            return
+        _estado.update(pid=pid, activo=False, ultimo_error=None)
+        threading.Thread(target=_escuchar, args=(app,), name='invalidacion', daemon=True).start()
+
+
+def init_invalidacion(app):
+    """Arranca la escucha en la primera solicitud de cada worker"""
+    if not app.config.get('INVALIDACION_ACTIVA', True):
+        return
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite' and db.engine.url.database in (None, '', ':memory:'):
+            return  # un solo proceso: no hay otros workers que avisar
+
+    @app.before_request
+    def _iniciar_bus():
+        if request.endpoint != 'static':
+            _asegurar_escucha(app)
+
+
+def estadisticas_invalidacion():
+    with _lock:
+        estadisticas = dict(_estadisticas)
+    return {
+        'activo': bus_activo(),
+        'ultimo_error': _estado['ultimo_error'],
+        'suscriptores': len(_suscriptores),
+        **estadisticas,
+    }
+
+
+# ====================================
+# CACHÉ EN MEMORIA DEL WORKER
+# ====================================
+
+class CacheLocal:
+    """
+    Valores calculados en memoria del worker que dependen de unas tablas.
+    Con el bus activo se descartan al recibir el aviso; sin bus, la clave
+    incluye la versión de las tablas en contador_cambios.
+    """
+
+    def __init__(self, tablas, maximo=128):
+        self.tablas = tuple(tablas)
+        self._maximo = maximo
+        self._valores = OrderedDict()
+        self._generacion = 0
+        self._lock = threading.Lock()
+        suscribir(self.tablas, self._invalidar)
+
+    def _invalidar(self, claves=None):
+        with self._lock:
+            self._generacion += 1
+            self._valores.clear()
+
+    def obtener(self, clave, calcular):
+        if not bus_activo():
+            from app.cambios import versiones_solicitud
+            clave = (clave, versiones_solicitud(self.tablas))
+
+        with self._lock:
+            if clave in self._valores:
+                self._valores.move_to_end(clave)
+                return self._valores[clave]
+            generacion = self._generacion
+
+        valor = calcular()
+
+        with self._lock:
+            # Si llegó un aviso mientras se calculaba, el valor puede estar desactualizado
+            if generacion == self._generacion:
+                self._valores[clave] = valor
+                while len(self._valores) > self._maximo:
+                    self._valores.popitem(last=False)
+        return valor
+
+    def limpiar(self):
+        self._invalidar()
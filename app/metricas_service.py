@@ -0,0 +1,321 @@
+from app import db
+from app.models import Item, Metrica, MetricaResumen, Incidencia, SLA
+from app.cambios import registrar_cambios
+from app.contadores import actualizar_ultimo_semaforo
+from app.estado_items import actualizar_item_estado
+from sqlalchemy import event, select, insert, update, delete, func, case, cast, literal, inspect, tuple_, String
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from calendar import monthrange
+from datetime import datetime
+
+# Dimensiones del resumen y la expresión que agrupa cada una
+DIMENSIONES = {
+    'item': cast(Metrica.item_id, String),
+    'categoria': func.coalesce(Item.categoria, 'Sin categoría'),
+    'tipo': Item.tipo,
+}
+
+
+# ====================================
+# CÁLCULO DE LA MÉTRICA MENSUAL
+# ====================================
+
+def limite_incidencias(tipo, sla):
+    """Incidencias permitidas por mes: fallas del SLA en productos, 3 en servicios"""
+    if tipo == 'producto' and sla is not None:
+        return (sla.fallas_criticas_permitidas or 0) + (sla.fallas_menores_permitidas or 0)
+    return 3
+
+
+def calcular_semaforo(incidencias, limite):
+    """Devuelve (semaforo, porcentaje_cumplimiento) según incidencias del mes y el límite"""
+    if incidencias == 0:
+        return 'verde', 100
+    if incidencias <= limite:
+        return 'amarillo', round(100 - ((incidencias / limite) * 15), 1)
+    exceso = incidencias - limite
+    return 'rojo', round(max(0, 85 - (exceso * 15)), 1)
+
+
+def rango_mes(anio, mes):
+    """Primer y último instante del mes"""
+    return datetime(anio, mes, 1), datetime(anio, mes, monthrange(anio, mes)[1], 23, 59, 59)
+
+
+def meses_entre(desde, hasta):
+    """[(anio, mes), ...] desde y hasta inclusive, con períodos (anio, mes)"""
+    anio, mes = desde
+    meses = []
+    while (anio, mes) <= hasta:
+        meses.append((anio, mes))
+        mes += 1
+        if mes > 12:
+            anio, mes = anio + 1, 1
+    return meses
+
+
+def calcular_metricas_periodo(item_ids, anio, mes, registrado_por=1):
+    """
+    Filas de métrica del período para varios items con dos consultas
+    (incidencias agrupadas por item y límites de SLA)
+    """
+    primer_dia, ultimo_dia = rango_mes(anio, mes)
+
+    conteos = dict(db.session.execute(
+        select(Incidencia.item_id, func.count(Incidencia.id)).where(
+            Incidencia.item_id.in_(item_ids),
+            Incidencia.fecha_incidencia >= primer_dia,
+            Incidencia.fecha_incidencia <= ultimo_dia
+        ).group_by(Incidencia.item_id)
+    ).all())
+
+    tipos = dict(db.session.execute(select(Item.id, Item.tipo).where(Item.id.in_(item_ids))).all())
+    slas = {sla.item_id: sla for sla in SLA.query.filter(SLA.item_id.in_(item_ids))}
+
+    filas = []
+    for item_id in item_ids:
+        incidencias = conteos.get(item_id, 0)
+        semaforo, porcentaje = calcular_semaforo(
+            incidencias, limite_incidencias(tipos.get(item_id), slas.get(item_id))
+        )
+        filas.append({
+            'item_id': item_id,
+            'mes': mes,
+            'anio': anio,
+            'incidencias': incidencias,
+            'semaforo': semaforo,
+            'porcentaje_cumplimiento': porcentaje,
+            'registrado_por': registrado_por,
+            'fecha_registro': datetime.utcnow()
+        })
+    return filas
+
+
+def guardar_metricas(filas, sobrescribir=False):
+    """
+    Upsert de métricas por (item_id, mes, anio) usando la conexión de la sesión.
+    Sin `sobrescribir` las métricas existentes (p. ej. registradas a mano) se conservan.
+    Devuelve el número de filas insertadas o actualizadas. No hace commit ni
+    recalcula metrica_resumen (ver recalcular_resumen_periodos).
+    """
+    if not filas:
+        return 0
+
+    tabla = Metrica.__table__
+    connection = db.session.connection()
+    dialecto = connection.dialect.name
+
+    if dialecto in ('postgresql', 'sqlite'):
+        insert_dialecto = pg_insert if dialecto == 'postgresql' else sqlite_insert
+        stmt = insert_dialecto(tabla).values(filas)
+        if sobrescribir:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['item_id', 'mes', 'anio'],
+                set_={
+                    'incidencias': stmt.excluded.incidencias,
+                    'semaforo': stmt.excluded.semaforo,
+                    'porcentaje_cumplimiento': stmt.excluded.porcentaje_cumplimiento,
+                }
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=['item_id', 'mes', 'anio'])
+        escritas = connection.execute(stmt).rowcount
+    else:
+        existentes = set(connection.execute(
+            select(tabla.c.item_id, tabla.c.mes, tabla.c.anio).where(
+                tuple_(tabla.c.item_id, tabla.c.mes, tabla.c.anio).in_(
+                    [(f['item_id'], f['mes'], f['anio']) for f in filas]
+                )
+            )
+        ).all())
+        nuevas = [f for f in filas if (f['item_id'], f['mes'], f['anio']) not in existentes]
+        escritas = len(nuevas)
+        if nuevas:
+            connection.execute(insert(tabla), nuevas)
+        if sobrescribir:
+            for f in filas:
+                if (f['item_id'], f['mes'], f['anio']) in existentes:
+                    connection.execute(update(tabla).where(
+                        tabla.c.item_id == f['item_id'], tabla.c.mes == f['mes'], tabla.c.anio == f['anio']
+                    ).values(incidencias=f['incidencias'], semaforo=f['semaforo'],
+                             porcentaje_cumplimiento=f['porcentaje_cumplimiento']))
+                    escritas += 1
+
+    registrar_cambios(connection, ['metrica'])
+    actualizar_ultimo_semaforo(connection, {f['item_id'] for f in filas})
+    actualizar_item_estado(connection, {f['item_id'] for f in filas})
+    return escritas
+
+
+# ====================================
+# RESUMEN MENSUAL
+# ====================================
+
+def _select_resumen(dimension, anio, mes, ahora):
+    """Consulta agregada de las métricas de un período para una dimensión"""
+    clave = DIMENSIONES[dimension]
+
+    return select(
+        Metrica.anio,
+        Metrica.mes,
+        (Metrica.anio * 100 + Metrica.mes),
+        literal(dimension),
+        clave,
+        func.count(Metrica.id),
+        func.avg(Metrica.porcentaje_cumplimiento),
+        func.sum(case((Metrica.semaforo == 'verde', 1), else_=0)),
+        func.sum(case((Metrica.semaforo == 'amarillo', 1), else_=0)),
+        func.sum(case((Metrica.semaforo == 'rojo', 1), else_=0)),
+        func.coalesce(func.sum(Metrica.incidencias), 0),
+        literal(ahora, db.DateTime),
+    ).join(
+        Item, Item.id == Metrica.item_id
+    ).where(
+        Metrica.anio == anio,
+        Metrica.mes == mes
+    ).group_by(Metrica.anio, Metrica.mes, clave)
+
+
+def recalcular_resumen_periodos(connection, periodos):
+    """
+    Recalcula el resumen de los períodos indicados [(anio, mes), ...]
+    usando la conexión recibida (misma transacción que la escritura de métricas)
+    """
+    tabla = MetricaResumen.__table__
+    columnas = [
+        'anio', 'mes', 'periodo', 'dimension', 'clave', 'total_items',
+        'cumplimiento_promedio', 'verdes', 'amarillos', 'rojos',
+        'incidencias_total', 'fecha_actualizacion'
+    ]
+    ahora = datetime.utcnow()
+
+    for anio, mes in sorted(periodos):
+        connection.execute(delete(tabla).where(tabla.c.periodo == anio * 100 + mes))
+
+        for dimension in DIMENSIONES:
+            connection.execute(
+                insert(tabla).from_select(columnas, _select_resumen(dimension, anio, mes, ahora))
+            )
+
+
+def reconstruir_resumen_metricas():
+    """Reconstruye el resumen completo a partir de la tabla de métricas"""
+    periodos = db.session.query(Metrica.anio, Metrica.mes).distinct().all()
+
+    db.session.execute(delete(MetricaResumen.__table__))
+    recalcular_resumen_periodos(db.session.connection(), [(p.anio, p.mes) for p in periodos])
+    db.session.commit()
+
+    print(f"✅ Resumen de métricas reconstruido: {len(periodos)} período(s)")
+    return len(periodos)
+
+
+def obtener_series(dimension, claves, periodo_desde, periodo_hasta):
+    """
+    Devuelve series mensuales en formato columnar:
+    una lista de períodos y, por clave, una lista alineada por cada indicador
+    """
+    query = MetricaResumen.query.filter(
+        MetricaResumen.dimension == dimension,
+        MetricaResumen.periodo >= periodo_desde,
+        MetricaResumen.periodo <= periodo_hasta
+    )
+
+    if claves:
+        query = query.filter(MetricaResumen.clave.in_(claves))
+
+    filas = query.order_by(MetricaResumen.clave, MetricaResumen.periodo).all()
+
+    # Eje de períodos continuo (incluye meses sin datos)
+    periodos = []
+    anio, mes = divmod(periodo_desde, 100)
+    while anio * 100 + mes <= periodo_hasta:
+        periodos.append(anio * 100 + mes)
+        mes += 1
+        if mes > 12:
+            anio, mes = anio + 1, 1
+
+    posicion = {p: i for i, p in enumerate(periodos)}
+    indicadores = ['cumplimiento', 'verde', 'amarillo', 'rojo', 'incidencias', 'items']
+    series = {}
+
+    for fila in filas:
+        serie = series.get(fila.clave)
+        if serie is None:
+            serie = {'clave': fila.clave}
+            for indicador in indicadores:
+                serie[indicador] = [None] * len(periodos)
+            series[fila.clave] = serie
+
+        i = posicion[fila.periodo]
+        serie['cumplimiento'][i] = round(fila.cumplimiento_promedio, 1) if fila.cumplimiento_promedio is not None else None
+        serie['verde'][i] = fila.verdes
+        serie['amarillo'][i] = fila.amarillos
+        serie['rojo'][i] = fila.rojos
+        serie['incidencias'][i] = fila.incidencias_total
+        serie['items'][i] = fila.total_items
+
+    # Etiquetas legibles para la dimensión item
+    if dimension == 'item' and series:
+        codigos = dict(db.session.query(Item.id, Item.codigo).filter(
+            Item.id.in_([int(c) for c in series])
+        ).all())
+        for clave, serie in series.items():
+            serie['etiqueta'] = codigos.get(int(clave), clave)
+
+    return {
+        'periodos': [f'{p // 100}-{p % 100:02d}' for p in periodos],
+        'series': list(series.values())
+    }
+
+
+# ====================================
+# MANTENIMIENTO AUTOMÁTICO DEL RESUMEN
+# ====================================
+
+def _periodos_afectados(session):
+    """Detecta los períodos cuyas métricas cambiaron en el flush actual"""
+    periodos = set()
+    items_modificados = set()
+
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Metrica):
+            if obj.anio and obj.mes:
+                periodos.add((obj.anio, obj.mes))
+
+            # Si cambió el período de la métrica, también recalcular el anterior
+            estado = inspect(obj)
+            anio_hist = estado.attrs.anio.history
+            mes_hist = estado.attrs.mes.history
+            if anio_hist.deleted or mes_hist.deleted:
+                anio_ant = anio_hist.deleted[0] if anio_hist.deleted else obj.anio
+                mes_ant = mes_hist.deleted[0] if mes_hist.deleted else obj.mes
+                periodos.add((anio_ant, mes_ant))
+
+        elif isinstance(obj, Item) and obj in session.dirty:
+            # Cambios de categoría o tipo mueven las métricas entre grupos
+            estado = inspect(obj)
+            if estado.attrs.categoria.history.has_changes() or estado.attrs.tipo.history.has_changes():
+                items_modificados.add(obj.id)
+
+    return periodos, items_modificados
+
+
+@event.listens_for(db.session, 'after_flush')
+def _actualizar_resumen_metricas(session, flush_context):
+    """Mantiene metrica_resumen en la misma transacción que las escrituras de Metrica"""
+    periodos, items_modificados = _periodos_afectados(session)
+
+    if not periodos and not items_modificados:
+        return
+
+    connection = session.connection()
+
+    if items_modificados:
+        filas = connection.execute(
+            select(Metrica.anio, Metrica.mes).where(Metrica.item_id.in_(items_modificados)).distinct()
+        ).all()
+        periodos.update((f.anio, f.mes) for f in filas)
+
+    recalcular_resumen_periodos(connection, periodos)
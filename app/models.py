@@ -1,5 +1,6 @@
 from app import db
 from datetime import datetime
+from sqlalchemy import MetaData
 from werkzeug.security import generate_password_hash, check_password_hash
 
 class Usuario(db.Model):
@@ -53,11 +54,21 @@ class Item(db.Model):
     
     fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
     creado_por = db.Column(db.Integer, db.ForeignKey('usuario.id'))
+    # Último número de versión asignado (se incrementa de forma atómica al versionar)
+    ultima_version = db.Column(db.Integer, default=0, server_default='0', nullable=False)
     
     reemplaza_a_id = db.Column(db.Integer, db.ForeignKey('item.id'), nullable=True)
     motivo_reemplazo = db.Column(db.Text, nullable=True)
     fecha_reemplazo = db.Column(db.DateTime, nullable=True)
     
+    # Contadores denormalizados, mantenidos por app/contadores.py
+    incidencias_abiertas = db.Column(db.Integer, default=0, server_default='0', nullable=False, index=True)
+    incidencias_resueltas = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    incidencias_mes = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    periodo_incidencias = db.Column(db.Integer)  # anio * 100 + mes al que corresponde incidencias_mes
+    alertas_activas = db.Column(db.Integer, default=0, server_default='0', nullable=False, index=True)
+    ultimo_semaforo = db.Column(db.String(10), index=True)
+    
     # Item que este item reemplaza
     reemplaza_a = db.relationship(
         'Item',
@@ -67,6 +78,7 @@ class Item(db.Model):
     )
     
     # Relaciones existentes
+    creador = db.relationship('Usuario', foreign_keys=[creado_por])
     versiones = db.relationship('Version', backref='item', lazy=True)
     sla = db.relationship('SLA', backref='item', uselist=False)
     metricas = db.relationship('Metrica', backref='item', lazy=True)
@@ -124,6 +136,34 @@ class Version(db.Model):
     razon_cambio = db.Column(db.Text)
     fecha = db.Column(db.DateTime, default=datetime.utcnow)
     usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'))
+    
+    __table_args__ = (
+        db.UniqueConstraint('item_id', 'numero_version', name='uq_version_item_numero'),
+    )
+
+class VersionContenido(db.Model):
+    """
+    Valor completo de un campo versionado, guardado como cadena por (item, campo):
+    cada fila es un snapshot comprimido o un delta comprimido contra la fila anterior.
+    """
+    __tablename__ = 'version_contenido'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    version_id = db.Column(db.Integer, db.ForeignKey('version.id'), nullable=False, index=True)
+    item_id = db.Column(db.Integer, db.ForeignKey('item.id'), nullable=False)
+    campo = db.Column(db.String(50), nullable=False)
+    rol = db.Column(db.String(10), nullable=False)  # 'anterior' (inicio de cadena), 'nuevo'
+    es_snapshot = db.Column(db.Boolean, default=False, nullable=False)
+    profundidad = db.Column(db.Integer, default=0, nullable=False)  # deltas desde el último snapshot
+    contenido = db.Column(db.LargeBinary, nullable=False)  # zlib
+    huella = db.Column(db.String(40), nullable=False)  # sha1 del valor
+    longitud = db.Column(db.Integer, default=0)
+    
+    version = db.relationship('Version', backref='contenidos')
+    
+    __table_args__ = (
+        db.Index('ix_version_contenido_cadena', 'item_id', 'campo', 'id'),
+    )
 
 class Aprobacion(db.Model):
     __tablename__ = 'aprobacion'
@@ -135,10 +175,17 @@ class Aprobacion(db.Model):
     comentarios = db.Column(db.Text)
     fecha_solicitud = db.Column(db.DateTime, default=datetime.utcnow)
     fecha_respuesta = db.Column(db.DateTime)
+    
+    # Relaciones
+    item = db.relationship('Item', backref='aprobaciones', foreign_keys=[item_id])
+    aprobador = db.relationship('Usuario', foreign_keys=[aprobador_id])
 
 # TABLA: Métricas (Mediciones mensuales)
 class Metrica(db.Model):
     __tablename__ = 'metrica'
+    __table_args__ = (
+        db.UniqueConstraint('item_id', 'mes', 'anio', name='uq_metrica_item_periodo'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     item_id = db.Column(db.Integer, db.ForeignKey('item.id'), nullable=False)
@@ -160,6 +207,31 @@ class Metrica(db.Model):
     fecha_registro = db.Column(db.DateTime, default=datetime.utcnow)
     registrado_por = db.Column(db.Integer, db.ForeignKey('usuario.id'))
 
+# TABLA: Resumen mensual de métricas (rollup por item, categoría y tipo)
+class MetricaResumen(db.Model):
+    __tablename__ = 'metrica_resumen'
+    __table_args__ = (
+        db.UniqueConstraint('periodo', 'dimension', 'clave', name='uq_metrica_resumen_periodo'),
+        db.Index('ix_metrica_resumen_serie', 'dimension', 'clave', 'periodo'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    anio = db.Column(db.Integer, nullable=False)
+    mes = db.Column(db.Integer, nullable=False)
+    periodo = db.Column(db.Integer, nullable=False)  # anio * 100 + mes (ej: 202501)
+    dimension = db.Column(db.String(20), nullable=False)  # 'item', 'categoria', 'tipo'
+    clave = db.Column(db.String(100), nullable=False)  # id del item, nombre de categoría o tipo
+    
+    # Agregados del período
+    total_items = db.Column(db.Integer, default=0)
+    cumplimiento_promedio = db.Column(db.Float)
+    verdes = db.Column(db.Integer, default=0)
+    amarillos = db.Column(db.Integer, default=0)
+    rojos = db.Column(db.Integer, default=0)
+    incidencias_total = db.Column(db.Integer, default=0)
+    
+    fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow)
+
 class Alerta(db.Model):
     __tablename__ = 'alerta'
     
@@ -180,8 +252,7 @@ class Alerta(db.Model):
     usuario_resolucion = db.relationship('Usuario', foreign_keys=[resuelto_por])
 
     def actualizar_estado_incidencias(self):
-        self.incidencias_resueltas_count = self.incidencias_resueltas.count()
-        
+        # incidencias_resueltas_count se mantiene al vincular incidencias (app/contadores.py)
         # Si todas las incidencias fueron resueltas, resolver la alerta automáticamente
         if self.incidencias_resueltas_count >= self.incidencias_pendientes and self.incidencias_pendientes > 0:
             if self.estado == 'activa':
@@ -251,4 +322,112 @@ class AlertaIncidencia(db.Model):
     
     # Relaciones
     alerta = db.relationship('Alerta', backref=db.backref('incidencias_resueltas', lazy='dynamic'))
-    incidencia = db.relationship('Incidencia', backref=db.backref('alertas_relacionadas', lazy='dynamic'))
\ No newline at end of file
+    incidencia = db.relationship('Incidencia', backref=db.backref('alertas_relacionadas', lazy='dynamic'))
+
+class SecuenciaCodigo(db.Model):
+    """Último número asignado por prefijo de código (P, S). En PostgreSQL se usan secuencias nativas"""
+    __tablename__ = 'secuencia_codigo'
+    
+    prefijo = db.Column(db.String(5), primary_key=True)
+    ultimo = db.Column(db.Integer, nullable=False, default=0)
+
+
+class NotificacionPendiente(db.Model):
+    """Alerta por notificar a un destinatario en el próximo correo de resumen"""
+    __tablename__ = 'notificacion_pendiente'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    alerta_id = db.Column(db.Integer, db.ForeignKey('alerta.id'), nullable=False, index=True)
+    destinatario = db.Column(db.String(100), nullable=False)
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    alerta = db.relationship('Alerta')
+
+
+class Suscripcion(db.Model):
+    """Suscripción de un usuario a las alertas de un item, categoría, tipo de item o nivel de urgencia"""
+    __tablename__ = 'suscripcion'
+    __table_args__ = (
+        # Búsqueda de destinatarios: (ambito, valor) -> usuarios
+        db.Index('ix_suscripcion_ambito_valor', 'ambito', 'valor', 'usuario_id'),
+        db.UniqueConstraint('usuario_id', 'ambito', 'valor', name='uq_suscripcion_usuario'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), nullable=False)
+    ambito = db.Column(db.String(20), nullable=False)  # 'item', 'categoria', 'tipo', 'urgencia'
+    valor = db.Column(db.String(100), nullable=False)  # id del item, nombre de categoría, tipo o nivel
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    usuario = db.relationship('Usuario', backref=db.backref('suscripciones', lazy='dynamic'))
+
+
+# Estado vigente de cada item (app/estado_items.py). Va en su propio MetaData: db.create_all
+# la crea y la llena al final, cuando ya existen item, sla y metrica.
+metadata_estado = MetaData()
+
+
+class ItemEstado(db.Model):
+    """Item vigente, sucesor, límite SLA y última métrica precalculados (solo lectura)"""
+    __table__ = db.Table(
+        'item_estado', metadata_estado,
+        db.Column('item_id', db.Integer, primary_key=True, autoincrement=False),
+        db.Column('vigente', db.Boolean, nullable=False),
+        db.Column('reemplazado_por_id', db.Integer),
+        db.Column('limite_incidencias', db.Integer, nullable=False),
+        db.Column('limite_sla', db.Integer, nullable=False),
+        db.Column('metrica_id', db.Integer),
+        db.Column('metrica_mes', db.Integer),
+        db.Column('metrica_anio', db.Integer),
+        db.Column('semaforo', db.String(10)),
+        db.Column('porcentaje_cumplimiento', db.Float),
+        db.Index('ix_item_estado_vigente', 'vigente'),
+    )
+
+
+class ContadorCambios(db.Model):
+    """Contador de cambios por tabla (sello de versión para caché y ETag)"""
+    __tablename__ = 'contador_cambios'
+    
+    tabla = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    actualizado = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+# ====================================
+# ARCHIVO (datos históricos fuera de las tablas de trabajo)
+# ====================================
+
+def _tabla_archivo(tabla, nombre):
+    """Copia de las columnas de `tabla` sin claves foráneas ni restricciones, más fecha_archivo"""
+    columnas = [
+        db.Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable, autoincrement=False)
+        for c in tabla.columns
+    ]
+    return db.Table(
+        nombre, db.metadata, *columnas,
+        db.Column('fecha_archivo', db.DateTime, default=datetime.utcnow, index=True)
+    )
+
+
+class IncidenciaArchivo(db.Model):
+    """Incidencias resueltas archivadas (solo lectura)"""
+    __table__ = _tabla_archivo(Incidencia.__table__, 'incidencia_archivo')
+    archivada = True
+    
+    item = db.relationship('Item', primaryjoin='foreign(IncidenciaArchivo.item_id) == Item.id', viewonly=True)
+    registrador = db.relationship('Usuario', primaryjoin='foreign(IncidenciaArchivo.registrado_por) == Usuario.id', viewonly=True)
+    solucionador = db.relationship('Usuario', primaryjoin='foreign(IncidenciaArchivo.resuelto_por) == Usuario.id', viewonly=True)
+
+
+class AlertaArchivo(db.Model):
+    """Alertas resueltas archivadas (solo lectura)"""
+    __table__ = _tabla_archivo(Alerta.__table__, 'alerta_archivo')
+    archivada = True
+    
+    item = db.relationship('Item', primaryjoin='foreign(AlertaArchivo.item_id) == Item.id', viewonly=True)
+
+
+class AlertaIncidenciaArchivo(db.Model):
+    """Relaciones alerta-incidencia de alertas o incidencias archivadas"""
+    __table__ = _tabla_archivo(AlertaIncidencia.__table__, 'alerta_incidencia_archivo')
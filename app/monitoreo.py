@@ -0,0 +1,186 @@
+"""
+Métricas de operación en formato Prometheus (GET /metrics).
+
+- Solicitudes HTTP: duración y total por endpoint, método y código de estado
+- Pool de conexiones: conexiones en uso, overflow y tamaño por bind
+- Tareas programadas: duración, resultado y hora de la última ejecución
+- Notificaciones: envíos por canal/tipo/resultado y correos en curso
+- Reportes PDF: tiempo de generación por reporte
+
+Con gunicorn cada worker escribe sus valores en PROMETHEUS_MULTIPROC_DIR
+(gunicorn.conf.py crea y limpia el directorio al arrancar) y /metrics suma
+los de todos los workers. Sin esa variable (flask run, scripts) se exporta
+el registro del propio proceso.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from flask import request, g
+from sqlalchemy import event
+from prometheus_client import (
+    Counter, Gauge, Histogram, CollectorRegistry, REGISTRY,
+    generate_latest, CONTENT_TYPE_LATEST, multiprocess
+)
+
+SOLICITUD_SEGUNDOS = Histogram(
+    'inventech_http_solicitud_segundos', 'Duración de las solicitudes HTTP',
+    ['endpoint', 'metodo'],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+SOLICITUDES = Counter(
+    'inventech_http_solicitudes_total', 'Solicitudes HTTP atendidas',
+    ['endpoint', 'metodo', 'estado']
+)
+
+POOL_EN_USO = Gauge(
+    'inventech_db_pool_conexiones_en_uso', 'Conexiones del pool prestadas (checked out)',
+    ['bind'], multiprocess_mode='livesum'
+)
+POOL_OVERFLOW = Gauge(
+    'inventech_db_pool_overflow', 'Conexiones abiertas por encima de pool_size',
+    ['bind'], multiprocess_mode='livesum'
+)
+POOL_TAMANO = Gauge(
+    'inventech_db_pool_tamano', 'pool_size configurado (suma de los workers)',
+    ['bind'], multiprocess_mode='livesum'
+)
+
+TAREA_SEGUNDOS = Histogram(
+    'inventech_tarea_segundos', 'Duración de las tareas programadas',
+    ['tarea'],
+    buckets=(0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600, 1800)
+)
+TAREA_EJECUCIONES = Counter(
+    'inventech_tarea_ejecuciones_total', 'Ejecuciones de tareas programadas por resultado',
+    ['tarea', 'resultado']
+)
+TAREA_ULTIMA_EJECUCION = Gauge(
+    'inventech_tarea_ultima_ejecucion_timestamp', 'Fin de la última ejecución (epoch)',
+    ['tarea'], multiprocess_mode='max'
+)
+
+NOTIFICACIONES = Counter(
+    'inventech_notificaciones_total', 'Notificaciones enviadas por canal, tipo y resultado',
+    ['canal', 'tipo', 'resultado']
+)
+CORREOS_EN_CURSO = Gauge(
+    'inventech_correos_en_curso', 'Hilos de envío de correo en ejecución',
+    multiprocess_mode='livesum'
+)
+
+PDF_SEGUNDOS = Histogram(
+    'inventech_pdf_segundos', 'Tiempo de generación de reportes PDF',
+    ['reporte'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+
+
+def multiproceso():
+    return bool(os.getenv('PROMETHEUS_MULTIPROC_DIR'))
+
+
+def exposicion():
+    """(cuerpo, content_type) con todas las métricas en formato de texto"""
+    if multiproceso():
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+    else:
+        registro = REGISTRY
+    return generate_latest(registro), CONTENT_TYPE_LATEST
+
+
+# ====================================
+# SOLICITUDES HTTP
+# ====================================
+
+def _registrar_solicitud(estado):
+    inicio = g.pop('_inicio_solicitud', None)
+    if inicio is None:
+        return
+    endpoint = request.endpoint or 'sin_ruta'
+    SOLICITUD_SEGUNDOS.labels(endpoint, request.method).observe(time.perf_counter() - inicio)
+    SOLICITUDES.labels(endpoint, request.method, str(estado)).inc()
+
+
+# ====================================
+# POOL DE CONEXIONES
+# ====================================
+
+def _actualizar_pool(nombre, pool):
+    for gauge, metodo in ((POOL_EN_USO, 'checkedout'), (POOL_OVERFLOW, 'overflow'), (POOL_TAMANO, 'size')):
+        funcion = getattr(pool, metodo, None)
+        if callable(funcion):
+            # overflow() es negativo mientras no se supere pool_size
+            gauge.labels(nombre).set(max(funcion(), 0))
+
+
+def _observar_pool(nombre, engine):
+    @event.listens_for(engine, 'checkout')
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        _actualizar_pool(nombre, engine.pool)
+
+    @event.listens_for(engine, 'checkin')
+    def _checkin(dbapi_connection, connection_record):
+        _actualizar_pool(nombre, engine.pool)
+
+
+def init_monitoreo(app, db):
+    """Registra la medición de solicitudes y del pool (llamar después de db.init_app)"""
+
+    @app.before_request
+    def _iniciar_medicion():
+        g._inicio_solicitud = time.perf_counter()
+
+    @app.after_request
+    def _medir_solicitud(respuesta):
+        _registrar_solicitud(respuesta.status_code)
+        return respuesta
+
+    @app.teardown_request
+    def _medir_error(error):
+        # Solo queda pendiente si la vista lanzó una excepción no manejada
+        if error is not None:
+            _registrar_solicitud(500)
+
+    with app.app_context():
+        for nombre, engine in db.engines.items():
+            _observar_pool('principal' if nombre is None else nombre, engine)
+
+
+# ====================================
+# TAREAS, NOTIFICACIONES Y PDF
+# ====================================
+
+@contextmanager
+def medir_tarea(tarea):
+    """
+    Mide una tarea programada. El bloque puede marcar el resultado:
+        with medir_tarea('archivar_datos') as ejecucion:
+            ejecucion['resultado'] = 'error'
+    Una excepción se registra como 'error' y se propaga.
+    """
+    ejecucion = {'resultado': 'ok'}
+    inicio = time.perf_counter()
+    try:
+        yield ejecucion
+    except Exception:
+        ejecucion['resultado'] = 'error'
+        raise
+    finally:
+        TAREA_SEGUNDOS.labels(tarea).observe(time.perf_counter() - inicio)
+        TAREA_EJECUCIONES.labels(tarea, ejecucion['resultado']).inc()
+        TAREA_ULTIMA_EJECUCION.labels(tarea).set(time.time())
+
+
+def registrar_notificacion(canal, tipo, exito):
+    NOTIFICACIONES.labels(canal, tipo, 'ok' if exito else 'error').inc()
+
+
+@contextmanager
+def medir_pdf(reporte):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        PDF_SEGUNDOS.labels(reporte).observe(time.perf_counter() - inicio)
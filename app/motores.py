@@ -0,0 +1,67 @@
+"""
+Perfiles de engine por dialecto (las opciones de create_engine salen de
+perfil_engine en config.py; aquí se registran los eventos de conexión).
+
+SQLite, pensado para despliegues de un solo nodo:
+- PRAGMAs al conectar: journal_mode=WAL (lectores y escritor no se bloquean),
+  busy_timeout, synchronous, mmap_size y cache_size.
+- Escrituras serializadas: las transacciones que pueden escribir empiezan con
+  BEGIN IMMEDIATE y toman el lock de escritura al inicio (esperando su turno
+  hasta busy_timeout). Con el BEGIN diferido del driver, dos transacciones
+  que leen y luego escriben fallan con "database is locked" al intentar
+  pasar de lectura a escritura. Las solicitudes GET/HEAD/OPTIONS usan BEGIN
+  diferido; el scheduler, la consola y el resto de solicitudes, IMMEDIATE.
+  Consecuencia: no abrir una segunda conexión (db.engine.begin()) mientras
+  la sesión tiene una transacción de escritura abierta; esperaría su lock.
+
+PostgreSQL: statement_timeout, lock_timeout e
+idle_in_transaction_session_timeout por conexión (opciones de connect_args).
+"""
+from flask import has_request_context, request
+from sqlalchemy import event
+
+METODOS_LECTURA = ('GET', 'HEAD', 'OPTIONS')
+
+
+def transaccion_de_escritura():
+    """True si la transacción que empieza puede escribir"""
+    return not (has_request_context() and request.method in METODOS_LECTURA)
+
+
+def aplicar_perfil_sqlite(engine, busy_timeout_ms=15000, synchronous='NORMAL',
+                          mmap_bytes=256 * 1024 * 1024, cache_kb=64 * 1024,
+                          escritura=transaccion_de_escritura):
+    """Registra PRAGMAs y BEGIN IMMEDIATE en un engine SQLite (también lo usa el benchmark)"""
+    memoria = engine.url.database in (None, '', ':memory:')
+
+    @event.listens_for(engine, 'connect')
+    def _pragmas(dbapi_connection, connection_record):
+        # El driver no abre transacciones por su cuenta: el BEGIN lo emite _begin
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        if not memoria:
+            cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute(f'PRAGMA busy_timeout={int(busy_timeout_ms)}')
+        cursor.execute(f'PRAGMA synchronous={synchronous}')
+        cursor.execute(f'PRAGMA mmap_size={int(mmap_bytes)}')
+        cursor.execute(f'PRAGMA cache_size=-{int(cache_kb)}')
+        cursor.close()
+
+    @event.listens_for(engine, 'begin')
+    def _begin(connection):
+        connection.exec_driver_sql('BEGIN IMMEDIATE' if escritura() else 'BEGIN')
+
+
+def init_motores(app, db):
+    """Aplica el perfil de cada engine según su dialecto (llamar después de db.init_app)"""
+    config = app.config
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite':
+                aplicar_perfil_sqlite(
+                    engine,
+                    busy_timeout_ms=config.get('SQLITE_BUSY_TIMEOUT_MS', 15000),
+                    synchronous=config.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+                    mmap_bytes=config.get('SQLITE_MMAP_BYTES', 256 * 1024 * 1024),
+                    cache_kb=config.get('SQLITE_CACHE_KB', 64 * 1024),
+                )
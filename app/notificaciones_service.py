@@ -0,0 +1,121 @@
+"""
+Modo resumen de las notificaciones de alertas.
+
+Con NOTIFICACIONES_MODO='resumen' las alertas no se envían al crearse: se
+guarda una fila en notificacion_pendiente por destinatario y el scheduler,
+cada NOTIFICACIONES_VENTANA_MINUTOS, envía un solo correo por destinatario
+con todas sus alertas. Los destinatarios con las mismas alertas comparten
+el mismo correo (el HTML se arma una vez). Las alertas que se resolvieron
+antes del envío se omiten.
+
+Las alertas 'critica' se envían de inmediato salvo NOTIFICACIONES_CRITICAS_INMEDIATAS=false.
+Sin scheduler activo (desarrollo) el envío es siempre inmediato. El resumen se
+envía de forma síncrona desde el job: las filas de un destinatario solo se
+borran cuando su correo salió por SMTP.
+"""
+from collections import defaultdict
+from datetime import datetime
+
+from flask import current_app
+
+from app import db
+from app.models import Alerta, NotificacionPendiente
+from app.catalogo import obtener_items
+
+ORDEN_URGENCIA = {'critica': 0, 'alta': 1, 'media': 2, 'baja': 3}
+
+
+def modo_resumen():
+    config = current_app.config
+    return config.get('NOTIFICACIONES_MODO') == 'resumen' and config.get('SCHEDULER_ACTIVO', False)
+
+
+def envio_inmediato(alerta):
+    """True si la alerta se notifica al crearse (sin esperar el resumen)"""
+    if not modo_resumen():
+        return True
+    return alerta.nivel_urgencia == 'critica' and current_app.config.get('NOTIFICACIONES_CRITICAS_INMEDIATAS', True)
+
+
+def encolar_notificacion(alerta, destinatarios):
+    """Deja la alerta pendiente para el próximo resumen de cada destinatario"""
+    db.session.add_all([
+        NotificacionPendiente(alerta_id=alerta.id, destinatario=correo)
+        for correo in dict.fromkeys(destinatarios)
+    ])
+    db.session.commit()
+    print(f"📬 Alerta {alerta.id} en espera del resumen para {len(destinatarios)} destinatario(s)")
+
+
+def enviar_resumenes(hasta=None):
+    """
+    Envía los resúmenes pendientes (hasta la fecha indicada, por defecto ahora).
+    Devuelve {'destinatarios', 'correos', 'alertas'}.
+    """
+    from app.email_service import enviar_emails, mensajes_alerta_critica, mensajes_resumen_alertas
+
+    hasta = hasta or datetime.utcnow()
+    pendientes = db.session.query(
+        NotificacionPendiente.id, NotificacionPendiente.alerta_id, NotificacionPendiente.destinatario
+    ).filter(NotificacionPendiente.fecha_creacion <= hasta).all()
+
+    if not pendientes:
+        return {'destinatarios': 0, 'correos': 0, 'alertas': 0}
+
+    alertas_por_destinatario = defaultdict(set)
+    for fila in pendientes:
+        alertas_por_destinatario[fila.destinatario].add(fila.alerta_id)
+
+    # Destinatarios con el mismo conjunto de alertas reciben el mismo correo
+    grupos = defaultdict(list)
+    for correo, alertas_ids in alertas_por_destinatario.items():
+        grupos[frozenset(alertas_ids)].append(correo)
+
+    ids = {fila.alerta_id for fila in pendientes}
+    alertas = {a.id: a for a in Alerta.query.filter(Alerta.id.in_(ids), Alerta.estado == 'activa')}
+    items = obtener_items({a.item_id for a in alertas.values()})
+    app = current_app._get_current_object()
+
+    # Alertas que ya no se notifican (resueltas o sin item): sus filas se descartan
+    notificables = {i for i, a in alertas.items() if a.item_id in items}
+    enviados = set()
+
+    correos = 0
+    for alertas_ids, destinatarios in grupos.items():
+        lista = sorted(
+            (alertas[i] for i in alertas_ids if i in notificables),
+            key=lambda a: (ORDEN_URGENCIA.get(a.nivel_urgencia, 9), a.fecha_creacion or datetime.min)
+        )
+        if not lista:
+            continue
+        try:
+            if len(lista) == 1:
+                tipo = 'alerta_critica'
+                mensajes = mensajes_alerta_critica(app, lista[0], items[lista[0].item_id], destinatarios)
+            else:
+                tipo = 'resumen_alertas'
+                mensajes = mensajes_resumen_alertas(app, lista, items, destinatarios)
+        except Exception as e:
+            print(f"❌ Error al preparar resumen de alertas: {str(e)}")
+            continue
+
+        # Envío síncrono (el job del scheduler no atiende solicitudes): solo se
+        # descartan las filas de los destinatarios cuyo mensaje salió por SMTP
+        salieron = enviar_emails(app, mensajes, tipo)
+        for msg in mensajes[:salieron]:
+            enviados.update(msg.bcc or msg.recipients)
+        if salieron:
+            correos += 1
+
+    # Los grupos cuyo envío falló quedan pendientes para la próxima ventana
+    eliminar = [fila.id for fila in pendientes
+                if fila.alerta_id not in notificables or fila.destinatario in enviados]
+    if eliminar:
+        db.session.query(NotificacionPendiente).filter(
+            NotificacionPendiente.id.in_(eliminar)
+        ).delete(synchronize_session=False)
+        db.session.commit()
+
+    print(f"📬 Resumen de alertas: {len(ids)} alerta(s), {len(alertas_por_destinatario)} destinatario(s), "
+          f"{correos} correo(s)")
+    return {'destinatarios': len(alertas_por_destinatario), 'correos': correos, 'alertas': len(ids)}
@@ -0,0 +1,204 @@
+"""
+Enrutamiento de lecturas hacia una réplica de base de datos (opcional).
+
+Las vistas marcadas con @solo_lectura ejecutan sus consultas en el bind
+'replica' (SQLALCHEMY_BINDS) mientras la réplica responda y su retraso
+no supere REPLICA_MAX_LAG_SEGUNDOS. Cualquier escritura (flush) se envía
+siempre a la base principal.
+"""
+import threading
+import time
+from functools import wraps
+
+from flask import g, has_app_context, current_app
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError
+
+BIND_REPLICA = 'replica'
+
+# Estado de salud de la réplica (por proceso/worker)
+_estado = {
+    'disponible': True,
+    'verificado_en': 0.0,
+    'lag_segundos': None,
+    'ultimo_error': None,
+}
+_estadisticas = {
+    'solicitudes_replica': 0,
+    'solicitudes_principal': 0,
+    'fallbacks': 0,
+}
+_lock = threading.Lock()
+
+
+class SesionEnrutada(Session):
+    """Sesión que envía las lecturas de vistas de solo lectura a la réplica"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and _usar_replica():
+            return self._db.engines[BIND_REPLICA]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _usar_replica():
+    return has_app_context() and g.get('usar_replica', False) and not g.get('hubo_escritura', False)
+
+
+def replica_configurada(app=None):
+    app = app or current_app
+    return BIND_REPLICA in (app.config.get('SQLALCHEMY_BINDS') or {})
+
+
+def init_replica(app, db):
+    """Registra los eventos de la réplica (llamar después de db.init_app)"""
+    if not replica_configurada(app):
+        return
+
+    with app.app_context():
+        engine = db.engines[BIND_REPLICA]
+
+        @event.listens_for(engine, 'handle_error')
+        def _error_en_replica(contexto):
+            # Cualquier error de conexión u operación deja la réplica fuera de servicio
+            if has_app_context():
+                g.replica_fallo = True
+            _marcar_no_disponible(str(contexto.original_exception))
+
+    @event.listens_for(db.session, 'before_flush')
+    def _registrar_escritura(session, flush_context, instances):
+        # Después de escribir, las lecturas del request vuelven a la principal
+        if has_app_context():
+            g.hubo_escritura = True
+
+
+def _marcar_no_disponible(error):
+    with _lock:
+        _estado['disponible'] = False
+        _estado['verificado_en'] = time.monotonic()
+        _estado['ultimo_error'] = error
+    print(f"⚠️  Réplica no disponible, usando base principal: {error}")
+
+
+def _medir_lag(connection):
+    """Retraso de replicación en segundos (0 si no aplica)"""
+    if connection.dialect.name == 'postgresql':
+        return connection.execute(text(
+            "SELECT CASE "
+            "WHEN NOT pg_is_in_recovery() THEN 0 "
+            "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+            "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+        )).scalar() or 0
+
+    connection.execute(text('SELECT 1'))
+    return 0
+
+
+def replica_disponible():
+    """Verifica (con caché de REPLICA_VERIFICACION_SEGUNDOS) si la réplica puede atender lecturas"""
+    intervalo = current_app.config.get('REPLICA_VERIFICACION_SEGUNDOS', 15)
+    ahora = time.monotonic()
+
+    with _lock:
+        if ahora - _estado['verificado_en'] < intervalo:
+            return _estado['disponible']
+        # Evita que varios hilos verifiquen a la vez
+        _estado['verificado_en'] = ahora
+
+    engine = current_app.extensions['sqlalchemy'].engines[BIND_REPLICA]
+    max_lag = current_app.config.get('REPLICA_MAX_LAG_SEGUNDOS', 10)
+
+    try:
+        with engine.connect() as connection:
+            lag = float(_medir_lag(connection))
+    except DBAPIError as e:
+        _marcar_no_disponible(str(e))
+        return False
+
+    with _lock:
+        _estado['lag_segundos'] = lag
+        _estado['disponible'] = lag <= max_lag
+        _estado['ultimo_error'] = None if lag <= max_lag else f'Retraso de {lag:.1f}s (máximo {max_lag}s)'
+        return _estado['disponible']
+
+
+def _contar(*claves):
+    # Varios hilos atienden solicitudes a la vez: `+= 1` sin lock pierde incrementos
+    with _lock:
+        for clave in claves:
+            _estadisticas[clave] += 1
+
+
+def solo_lectura(f):
+    """
+    Marca una vista como de solo lectura: sus consultas van a la réplica si está disponible.
+    Si la réplica falla durante el request, se repite la vista contra la base principal.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not replica_configurada():
+            return f(*args, **kwargs)
+
+        g.usar_replica = replica_disponible()
+
+        if not g.usar_replica:
+            _contar('solicitudes_principal')
+            return f(*args, **kwargs)
+
+        from app import db
+
+        try:
+            respuesta = f(*args, **kwargs)
+        except DBAPIError:
+            respuesta = None
+            g.replica_fallo = True
+
+        if not g.get('replica_fallo'):
+            _contar('solicitudes_replica')
+            return respuesta
+
+        # Fallback: repetir contra la base principal
+        db.session.rollback()
+        g.usar_replica = False
+        g.replica_fallo = False
+        _contar('fallbacks', 'solicitudes_principal')
+        return f(*args, **kwargs)
+
+    return decorated_function
+
+
+def _estadisticas_engine(engine):
+    pool = engine.pool
+    datos = {
+        'url': engine.url.render_as_string(hide_password=True),
+        'pool': type(pool).__name__,
+    }
+    for nombre in ('size', 'checkedin', 'checkedout', 'overflow'):
+        metodo = getattr(pool, nombre, None)
+        if callable(metodo):
+            datos[nombre] = metodo()
+    datos['status'] = pool.status()
+    return datos
+
+
+def estadisticas_pool():
+    """Estadísticas del pool de conexiones de cada bind y del enrutamiento"""
+    engines = current_app.extensions['sqlalchemy'].engines
+    binds = {
+        ('principal' if nombre is None else nombre): _estadisticas_engine(engine)
+        for nombre, engine in engines.items()
+    }
+
+    with _lock:
+        enrutamiento = dict(_estadisticas)
+    resultado = {'binds': binds, 'enrutamiento': enrutamiento}
+
+    if replica_configurada():
+        with _lock:
+            resultado['replica'] = {
+                'disponible': _estado['disponible'],
+                'lag_segundos': _estado['lag_segundos'],
+                'ultimo_error': _estado['ultimo_error'],
+            }
+
+    return resultado
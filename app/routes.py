@@ -1,28 +1,53 @@
 # Imports de Flask
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, send_file, jsonify
-from flask import current_app
+from flask import current_app, Response
 from app.email_service import enviar_notificacion_incidencia, enviar_notificacion_alerta_critica 
 
 # Imports de modelos
 from app.models import (
     Usuario, Item, SLA, Metrica, Alerta, 
-    Aprobacion, Persona, Version, Incidencia, AlertaIncidencia
+    Aprobacion, Persona, Version, Incidencia, AlertaIncidencia,
+    IncidenciaArchivo, AlertaArchivo, ItemEstado, Suscripcion
 )
 
 # Imports de la app
 from app import db
+from app.replica import solo_lectura, estadisticas_pool
+from app.cambios import respuesta_condicional
+from app.fragmentos import valor_versionado
+from app.catalogo import obtener_item, obtener_items, items_activos as catalogo_items_activos
+from app.versiones_service import (
+    registrar_version, reservar_numeros_version, valores_version, CAMPOS_ITEM, CAMPOS_SLA
+)
+from app.comparacion_service import comparar_versiones, ComparacionError
+from app.alertas_service import evaluar_alertas_periodo, enviar_notificaciones_alerta_critica
+from app.archivo_service import con_archivo
+from app.codigos_service import asignar_codigo, vista_previa_codigo, orden_codigo
+from app.exportacion_service import leer_en_lotes, respuesta_exportacion
+from app.monitoreo import medir_pdf, exposicion as exposicion_metricas
+from app.whatsapp_service import enviar_alerta_whatsapp
+from app.suscripciones_service import (
+    destinatarios_alerta, suscribir_usuario, serializar_suscripcion
+)
+from app.invalidacion import CacheLocal, estadisticas_invalidacion
+from app.contadores import incidencias_mes_actual
 
 # Imports de SQLAlchemy
 from sqlalchemy import func
+from sqlalchemy.orm import contains_eager
 
 # Imports estándar de Python
 import os
-from datetime import datetime
+import json
+from datetime import datetime, timedelta
 from functools import wraps
 
 # ✅ Import del servicio de scheduler
 from app.scheduler_service import generar_metricas_automaticas_mes_anterior
 
+# ✅ Resumen mensual de métricas (series de tendencia)
+from app.metricas_service import obtener_series
+
 
 
 # ← AGREGAR ESTA FUNCIÓN
@@ -43,18 +68,42 @@ def jefe_o_gerente_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def filtrar_rango_fechas(query, columna):
+    """Filtro opcional ?desde=AAAA-MM-DD&hasta=AAAA-MM-DD (ambos inclusive) sobre una columna de fecha"""
+    for parametro in ('desde', 'hasta'):
+        valor = request.args.get(parametro, '')
+        if not valor:
+            continue
+        try:
+            fecha = datetime.strptime(valor, '%Y-%m-%d')
+        except ValueError:
+            continue
+        if parametro == 'desde':
+            query = query.filter(columna >= fecha)
+        else:
+            query = query.filter(columna < fecha + timedelta(days=1))
+    return query
+
 bp = Blueprint('main', __name__)
 
+# Conteos del dashboard en memoria del worker (se descartan con el bus de invalidación)
+_cache_dashboard = CacheLocal(['item', 'sla', 'aprobacion', 'metrica'])
+
 
 @bp.context_processor
 def inject_alertas_activas():
     """Inyecta el número de alertas activas en todos los templates"""
     if 'user_id' in session:
-        alertas_activas = Alerta.query.filter_by(estado='activa').count()
+        alertas_activas = valor_versionado(
+            'alertas_activas', ['alerta'],
+            lambda: Alerta.query.filter_by(estado='activa').count()
+        )
         return {'alertas_activas': alertas_activas}
     return {'alertas_activas': 0}
 
 
+# Sin respuesta_condicional: la secuencia de PostgreSQL avanza (nextval, también en rollbacks)
+# sin pasar por contador_cambios, así que un ETag por 'item' devolvería 304 con un código viejo
 @bp.route('/api/siguiente-codigo')
 def siguiente_codigo():
     """API para obtener el siguiente código disponible (P01, P02... o S01, S02...)"""
@@ -63,23 +112,8 @@ def siguiente_codigo():
     
     tipo = request.args.get('tipo', 'producto')  # 'producto' o 'servicio'
     
-    # Obtener el último código usado de ese tipo
-    prefijo = 'P' if tipo == 'producto' else 'S'
-    
-    ultimo_item = Item.query.filter(
-        Item.codigo.like(f'{prefijo}%')
-    ).order_by(Item.codigo.desc()).first()
-    
-    if ultimo_item:
-        # Extraer el número del código (ej: P05 -> 05)
-        ultimo_numero = int(ultimo_item.codigo[1:])
-        siguiente_numero = ultimo_numero + 1
-    else:
-        # Primer código
-        siguiente_numero = 1
-    
-    # Formatear código (ej: P01, S03)
-    codigo_generado = f'{prefijo}{siguiente_numero:02d}'
+    # Vista previa O(1) desde la secuencia del prefijo; el código real se asigna al guardar
+    codigo_generado = vista_previa_codigo(tipo)
     
     return {
         'success': True,
@@ -270,19 +304,8 @@ def dashboard():
     if 'user_id' not in session:
         return redirect(url_for('main.login'))
     
-    # Estadísticas generales
-    total_productos = Item.query.filter_by(tipo='producto', estado='aprobado').count()
-    total_servicios = Item.query.filter_by(tipo='servicio', estado='aprobado').count()
-    total_slas = SLA.query.count()
-    
-    # ✅ CORRECCIÓN: Items activos = aprobados + operativos
-    items_activos = Item.query.filter_by(
-        estado='aprobado',
-        estado_operativo='activo'
-    ).count()
-    
-    # Items pendientes de aprobación (solo para Gerente)
-    items_pendientes = Aprobacion.query.filter_by(estado='pendiente').count()
+    # Estadísticas generales (conteos cacheados hasta que cambien sus tablas)
+    conteos = _cache_dashboard.obtener('conteos', _conteos_dashboard)
     
     # Alertas activas
     alertas_lista = Alerta.query.filter_by(estado='activa').order_by(Alerta.fecha_creacion.desc()).limit(5).all()
@@ -300,20 +323,30 @@ def dashboard():
         Item.estado == 'aprobado'
     ).order_by(Metrica.fecha_registro.desc()).limit(6).all()
     
+    return render_template('dashboard.html',
+                         **conteos,
+                         alertas_lista=alertas_lista,
+                         metricas_recientes=metricas_recientes)
+
+
+def _conteos_dashboard():
     # Cumplimiento promedio de SLAs
     cumplimiento_promedio = db.session.query(
         func.avg(Metrica.porcentaje_cumplimiento)
     ).filter(Metrica.porcentaje_cumplimiento.isnot(None)).scalar() or 0
     
-    return render_template('dashboard.html',
-                         total_productos=total_productos,
-                         total_servicios=total_servicios,
-                         total_slas=total_slas,
-                         items_activos=items_activos,
-                         items_pendientes=items_pendientes,
-                         alertas_lista=alertas_lista,
-                         metricas_recientes=metricas_recientes,
-                         cumplimiento_promedio=round(cumplimiento_promedio, 1))
+    return {
+        'total_productos': Item.query.filter_by(tipo='producto', estado='aprobado').count(),
+        'total_servicios': Item.query.filter_by(tipo='servicio', estado='aprobado').count(),
+        'total_slas': SLA.query.count(),
+        # ✅ CORRECCIÓN: Items activos = aprobados + operativos
+        'items_activos': Item.query.filter_by(estado='aprobado', estado_operativo='activo').count(),
+        # Items pendientes de aprobación (solo para Gerente)
+        'items_pendientes': Aprobacion.query.filter_by(estado='pendiente').count(),
+        'cumplimiento_promedio': round(cumplimiento_promedio, 1),
+    }
+
+
 @bp.route('/productos')
 def productos():
     if 'user_id' not in session:
@@ -479,7 +512,6 @@ def item_crear():
     if request.method == 'POST':
         # Datos básicos
         tipo = request.form.get('tipo')
-        codigo = request.form.get('codigo')
         nombre = request.form.get('nombre')
         categoria = request.form.get('categoria')
         definicion = request.form.get('definicion')
@@ -503,11 +535,8 @@ def item_crear():
             reemplaza_a_id = None
             print("ℹ️ No se seleccionó item para reemplazar")
         
-        # Validar código único
-        existe = Item.query.filter_by(codigo=codigo).first()
-        if existe:
-            flash(f'⚠️ El código {codigo} ya existe. Recarga la página.', 'warning')
-            return redirect(url_for('main.item_crear'))
+        # Asignar código desde la secuencia (el del formulario es solo una vista previa)
+        codigo = asignar_codigo(tipo)
         
         # Crear nuevo item
         nuevo_item = Item(
@@ -526,6 +555,7 @@ def item_crear():
             estado='propuesto',           # ← Estado de aprobación
             estado_operativo='activo',     # ✅ NUEVO: Estado operativo activo por defecto
             creado_por=session.get('user_id'),
+            ultima_version=1,              # La versión inicial se registra abajo
             # ⚠️ CRÍTICO: Asignar campos de reemplazo
             reemplaza_a_id=reemplaza_a_id,
             motivo_reemplazo=motivo_reemplazo if reemplaza_a_id else None,
@@ -580,14 +610,14 @@ def item_crear():
                 )
                 db.session.add(aprobacion)
                 
-                mensaje = f'✅ {tipo.capitalize()} "{nombre}" creado exitosamente.'
+                mensaje = f'✅ {tipo.capitalize()} {codigo} "{nombre}" creado exitosamente.'
                 if reemplaza_a_id:
                     mensaje += f' Reemplaza a {item_anterior.codigo}.'
                 mensaje += ' Pendiente de aprobación del Gerente.'
                 flash(mensaje, 'success')
         else:
             nuevo_item.estado = 'aprobado'
-            mensaje = f'✅ {tipo.capitalize()} "{nombre}" creado y aprobado.'
+            mensaje = f'✅ {tipo.capitalize()} {codigo} "{nombre}" creado y aprobado.'
             if reemplaza_a_id:
                 mensaje += f' Reemplaza a {item_anterior.codigo}.'
             flash(mensaje, 'success')
@@ -600,7 +630,7 @@ def item_crear():
             return redirect(url_for('main.servicio_detalle', id=nuevo_item.id))
     
     # GET - Obtener items disponibles para reemplazar
-    items_disponibles = Item.query.filter_by(estado='activo').order_by(Item.tipo, Item.codigo).all()
+    items_disponibles = Item.query.filter_by(estado='activo').order_by(Item.tipo, *orden_codigo()).all()
     
     return render_template('item_crear.html', items_disponibles=items_disponibles)
 
@@ -631,22 +661,17 @@ def item_reemplazos(id):
 
 # En routes.py
 @bp.route('/api/items-activos')
+@respuesta_condicional('item')
 def items_activos():
     """API para obtener SOLO items APROBADOS y NO REEMPLAZADOS disponibles para reemplazo"""
     if 'user_id' not in session:
         return {'error': 'No autenticado'}, 401
     
-    # ✅ CORRECCIÓN: Solo items APROBADOS que NO han sido reemplazados
-    # Subconsulta: obtener IDs de items que ya fueron reemplazados
-    items_reemplazados = db.session.query(Item.reemplaza_a_id).filter(
-        Item.reemplaza_a_id.isnot(None)
-    ).subquery()
-    
-    # Query principal: items aprobados que NO están en la lista de reemplazados
-    items = Item.query.filter(
+    # ✅ CORRECCIÓN: Solo items APROBADOS que NO han sido reemplazados (sucesor precalculado en item_estado)
+    items = Item.query.join(ItemEstado, ItemEstado.item_id == Item.id).filter(
         Item.estado == 'aprobado',
-        ~Item.id.in_(items_reemplazados)
-    ).order_by(Item.tipo, Item.codigo).all()
+        ItemEstado.reemplazado_por_id.is_(None)
+    ).order_by(Item.tipo, *orden_codigo()).all()
     
     # Serializar
     items_json = []
@@ -742,40 +767,27 @@ def producto_editar(id):
             producto.dependencias = nuevos_valores['dependencias']
             producto.estado_operativo = nuevos_valores['estado_operativo']  # ✅ NUEVO
             
-            # Obtener número de versión
-            ultima_version = Version.query.filter_by(item_id=id).order_by(Version.numero_version.desc()).first()
-            numero_version_base = (ultima_version.numero_version + 1) if ultima_version else 1
+            # Reservar números de versión (atómico, en la misma transacción)
+            numero_version_base = reservar_numeros_version(id, len(campos_modificados))
             
             # Crear una versión por cada campo modificado
             razon_general = request.form.get('razon_cambio', 'Actualización de información')
             
             for i, cambio in enumerate(campos_modificados):
                 # Traducir nombre del campo a español
-                nombres_campos = {
-                    'nombre': 'Nombre',
-                    'categoria': 'Categoría',
-                    'definicion': 'Definición',
-                    'proposito': 'Propósito',
-                    'estado_actual': 'Estado Actual',
-                    'estado_objetivo': 'Estado Objetivo',
-                    'beneficio': 'Beneficio Esperado',
-                    'caso_uso': 'Caso de Uso',
-                    'dependencias': 'Dependencias',
-                    'estado_operativo': 'Estado Operativo'  # ✅ NUEVO
-                }
-                
-                campo_nombre = nombres_campos.get(cambio['campo'], cambio['campo'])
+                campo_nombre = CAMPOS_ITEM.get(cambio['campo'], cambio['campo'])
                 
-                version = Version(
+                # Valor completo en version_contenido (delta contra el valor anterior)
+                registrar_version(
                     item_id=id,
                     numero_version=numero_version_base + i,
                     campo_modificado=campo_nombre,
-                    valor_anterior=cambio['anterior'][:500],
-                    valor_nuevo=cambio['nuevo'][:500],
+                    anterior=cambio['anterior'],
+                    nuevo=cambio['nuevo'],
                     razon_cambio=razon_general,
-                    usuario_id=session.get('user_id')
+                    usuario_id=session.get('user_id'),
+                    campo=cambio['campo']
                 )
-                db.session.add(version)
             
             db.session.commit()
             flash(f'Producto actualizado exitosamente. {len(campos_modificados)} campo(s) modificado(s).', 'success')
@@ -856,40 +868,27 @@ def servicio_editar(id):
             servicio.dependencias = nuevos_valores['dependencias']
             servicio.estado_operativo = nuevos_valores['estado_operativo']  # ✅ NUEVO
             
-            # Obtener número de versión
-            ultima_version = Version.query.filter_by(item_id=id).order_by(Version.numero_version.desc()).first()
-            numero_version_base = (ultima_version.numero_version + 1) if ultima_version else 1
+            # Reservar números de versión (atómico, en la misma transacción)
+            numero_version_base = reservar_numeros_version(id, len(campos_modificados))
             
             # Crear una versión por cada campo modificado
             razon_general = request.form.get('razon_cambio', 'Actualización de información')
             
             for i, cambio in enumerate(campos_modificados):
                 # Traducir nombre del campo a español
-                nombres_campos = {
-                    'nombre': 'Nombre',
-                    'categoria': 'Categoría',
-                    'definicion': 'Definición',
-                    'proposito': 'Propósito',
-                    'estado_actual': 'Estado Actual',
-                    'estado_objetivo': 'Estado Objetivo',
-                    'beneficio': 'Beneficio Esperado',
-                    'caso_uso': 'Caso de Uso',
-                    'dependencias': 'Dependencias',
-                    'estado_operativo': 'Estado Operativo'  # ✅ NUEVO
-                }
-                
-                campo_nombre = nombres_campos.get(cambio['campo'], cambio['campo'])
+                campo_nombre = CAMPOS_ITEM.get(cambio['campo'], cambio['campo'])
                 
-                version = Version(
+                # Valor completo en version_contenido (delta contra el valor anterior)
+                registrar_version(
                     item_id=id,
                     numero_version=numero_version_base + i,
                     campo_modificado=campo_nombre,
-                    valor_anterior=cambio['anterior'][:500],
-                    valor_nuevo=cambio['nuevo'][:500],
+                    anterior=cambio['anterior'],
+                    nuevo=cambio['nuevo'],
                     razon_cambio=razon_general,
-                    usuario_id=session.get('user_id')
+                    usuario_id=session.get('user_id'),
+                    campo=cambio['campo']
                 )
-                db.session.add(version)
             
             db.session.commit()
             flash(f'Servicio actualizado exitosamente. {len(campos_modificados)} campo(s) modificado(s).', 'success')
@@ -904,129 +903,9 @@ def servicio_editar(id):
 def generar_alerta_automatica(item_id, metrica_actual):
     """
     Sistema de alertas multinivel basado en historial de métricas
-    ✅ MODIFICADO: Envía notificaciones cuando se generan alertas
+    (reglas en app.alertas_service, evaluadas solo para este item)
     """
-    from datetime import datetime, timedelta
-    from sqlalchemy import and_
-    
-    item = Item.query.get(item_id)
-    if not item:
-        return
-    
-    # Obtener métricas de los últimos 3 meses
-    fecha_limite = datetime.utcnow() - timedelta(days=90)
-    metricas_historicas = Metrica.query.filter(
-        and_(
-            Metrica.item_id == item_id,
-            Metrica.fecha_registro >= fecha_limite
-        )
-    ).order_by(Metrica.fecha_registro.desc()).limit(3).all()
-    
-    if not metricas_historicas:
-        return
-    
-    alerta_generada = None
-    
-    # NIVEL 1: ALERTA INMEDIATA - ROJO PRIMERA VEZ
-    if metrica_actual.semaforo == 'rojo':
-        es_primer_rojo = True
-        for m in metricas_historicas[1:]:
-            if m.semaforo == 'rojo':
-                es_primer_rojo = False
-                break
-        
-        if es_primer_rojo:
-            alerta = Alerta(
-                item_id=item_id,
-                tipo='rojo_inmediato',
-                nivel_urgencia='critica',
-                mensaje=f'🔴 CRÍTICO: {item.codigo} - {item.nombre} ha caído en estado ROJO. '
-                        f'Incidencias: {metrica_actual.incidencias}. Cumplimiento: {metrica_actual.porcentaje_cumplimiento}%. '
-                        f'Se requiere revisión inmediata y plan de acción correctiva.',
-                estado='activa'
-            )
-            db.session.add(alerta)
-            alerta_generada = alerta
-    
-    # NIVEL 2: AMARILLO PERSISTENTE
-    if metrica_actual.semaforo == 'amarillo':
-        if len(metricas_historicas) >= 2:
-            metrica_anterior = metricas_historicas[1]
-            if metrica_anterior.semaforo == 'amarillo':
-                alerta = Alerta(
-                    item_id=item_id,
-                    tipo='amarillo_recurrente',
-                    nivel_urgencia='media',
-                    mensaje=f'⚠️ PREVENTIVO: {item.codigo} - {item.nombre} permanece en estado AMARILLO. '
-                            f'Incidencias acumuladas: {metrica_actual.incidencias}. '
-                            f'Se recomienda mantenimiento preventivo antes de que escale a crítico.',
-                    estado='activa'
-                )
-                db.session.add(alerta)
-                if not alerta_generada:
-                    alerta_generada = alerta
-    
-    # NIVEL 3: ROJO SEGUNDO MES CONSECUTIVO
-    if len(metricas_historicas) >= 2:
-        if metrica_actual.semaforo == 'rojo' and metricas_historicas[1].semaforo == 'rojo':
-            alerta = Alerta(
-                item_id=item_id,
-                tipo='rojo_mes2',
-                nivel_urgencia='alta',
-                mensaje=f'🔴 ESCALAMIENTO: {item.codigo} - {item.nombre} lleva 2 meses consecutivos en ROJO. '
-                        f'Las acciones correctivas no han sido efectivas. '
-                        f'Se requiere aprobación de reemplazo inmediato. '
-                        f'Cumplimiento promedio: {(metrica_actual.porcentaje_cumplimiento + metricas_historicas[1].porcentaje_cumplimiento) // 2}%.',
-                estado='activa'
-            )
-            db.session.add(alerta)
-            if not alerta_generada:
-                alerta_generada = alerta
-    
-    # NIVEL 4: ROJO TERCER MES CONSECUTIVO
-    if len(metricas_historicas) >= 3:
-        if (metrica_actual.semaforo == 'rojo' and 
-            metricas_historicas[1].semaforo == 'rojo' and 
-            metricas_historicas[2].semaforo == 'rojo'):
-            alerta = Alerta(
-                item_id=item_id,
-                tipo='rojo_mes3',
-                nivel_urgencia='critica',
-                mensaje=f'🔴🔴🔴 CRÍTICO MÁXIMO: {item.codigo} - {item.nombre} lleva 3 meses en ROJO. '
-                        f'El equipo/servicio es INACEPTABLE para operación. '
-                        f'REEMPLAZO OBLIGATORIO INMEDIATO. '
-                        f'Este item está comprometiendo seriamente la operación del área.',
-                estado='activa'
-            )
-            db.session.add(alerta)
-            if not alerta_generada:
-                alerta_generada = alerta
-    
-    # NIVEL 5: INCIDENCIAS MASIVAS EN UN MES
-    if metrica_actual.incidencias >= 5:
-        alerta = Alerta(
-            item_id=item_id,
-            tipo='incidencias_masivas',
-            nivel_urgencia='critica',
-            mensaje=f'🔴 CRÍTICO: {item.codigo} - {item.nombre} registró {metrica_actual.incidencias} incidencias en el mes. '
-                    f'Volumen anormal de fallas indica deterioro acelerado. '
-                    f'Requiere diagnóstico técnico urgente y evaluación de reemplazo.',
-            estado='activa'
-        )
-        db.session.add(alerta)
-        if not alerta_generada:
-            alerta_generada = alerta
-    
-    try:
-        db.session.commit()
-        
-        # ✅ ENVIAR NOTIFICACIONES SI SE GENERÓ ALERTA
-        if alerta_generada:
-            enviar_notificaciones_alerta_critica(alerta_generada)
-        
-    except Exception as e:
-        db.session.rollback()
-        print(f"Error al generar alertas: {e}")
+    evaluar_alertas_periodo(metrica_actual.anio, metrica_actual.mes, item_ids=[item_id])
 
 @bp.route('/sla/editar/<int:item_id>', methods=['GET', 'POST'])
 def sla_editar(item_id):
@@ -1060,14 +939,11 @@ def sla_editar(item_id):
             db.session.add(sla)
         
         # Guardar valores anteriores para versión
-        valores_anteriores = {}
+        campos_sla = CAMPOS_SLA['servicio' if item.tipo == 'servicio' else 'producto']
+        valores_anteriores = {campo: getattr(sla, campo) for campo in campos_sla}
         
         if item.tipo == 'servicio':
             # SLA para servicios
-            valores_anteriores['disponibilidad'] = sla.disponibilidad
-            valores_anteriores['velocidad_min'] = sla.velocidad_min
-            valores_anteriores['latencia_max'] = sla.latencia_max
-            
             sla.disponibilidad = float(request.form.get('disponibilidad', 0))
             sla.velocidad_min = int(request.form.get('velocidad_min', 0)) if request.form.get('velocidad_min') else None
             sla.latencia_max = int(request.form.get('latencia_max', 0)) if request.form.get('latencia_max') else None
@@ -1078,9 +954,6 @@ def sla_editar(item_id):
             
         else:  # producto
             # Especificaciones técnicas para productos
-            valores_anteriores['fallas_criticas_permitidas'] = sla.fallas_criticas_permitidas if sla else None
-            valores_anteriores['fallas_menores_permitidas'] = sla.fallas_menores_permitidas if sla else None
-            
             sla.fallas_criticas_permitidas = int(request.form.get('fallas_criticas_permitidas', 0))
             sla.fallas_menores_permitidas = int(request.form.get('fallas_menores_permitidas', 0))
             sla.disponibilidad_esperada = float(request.form.get('disponibilidad_esperada', 99.5)) if request.form.get('disponibilidad_esperada') else None
@@ -1089,22 +962,21 @@ def sla_editar(item_id):
             sla.mantenimiento_preventivo = request.form.get('mantenimiento_preventivo')
             sla.caracteristicas = request.form.get('caracteristicas')
         
-        db.session.commit()
+        # Crear versión del cambio (mismo commit que el SLA)
+        numero_version = reservar_numeros_version(item_id)
         
-        # Crear versión del cambio
-        ultima_version = Version.query.filter_by(item_id=item_id).order_by(Version.numero_version.desc()).first()
-        numero_version = (ultima_version.numero_version + 1) if ultima_version else 1
-        
-        version = Version(
+        # Antes/después como JSON (reconstruible desde /api/version/<id>/valor)
+        valores_nuevos = {campo: getattr(sla, campo) for campo in campos_sla}
+        registrar_version(
             item_id=item_id,
             numero_version=numero_version,
             campo_modificado='SLA/Especificaciones Técnicas',
-            valor_anterior=str(valores_anteriores),
-            valor_nuevo='Actualizado',
+            anterior=json.dumps(valores_anteriores, ensure_ascii=False, sort_keys=True),
+            nuevo=json.dumps(valores_nuevos, ensure_ascii=False, sort_keys=True),
             razon_cambio=request.form.get('razon_cambio', 'Actualización de SLA'),
-            usuario_id=session.get('user_id')
+            usuario_id=session.get('user_id'),
+            campo='sla'
         )
-        db.session.add(version)
         db.session.commit()
         
         flash('SLA actualizado exitosamente', 'success')
@@ -1134,46 +1006,36 @@ def aprobaciones_pendientes():
     estado_filtro = request.args.get('estado', 'pendiente')
     tipo_filtro = request.args.get('tipo', '')
     
-    # Query base - aprobaciones del gerente actual
-    query = Aprobacion.query.filter_by(aprobador_id=session.get('user_id'))
+    # ✅ Una sola consulta: aprobaciones + item + solicitante (JOIN con eager loading)
+    query = Aprobacion.query.join(Item, Aprobacion.item_id == Item.id).options(
+        contains_eager(Aprobacion.item).joinedload(Item.creador)
+    ).filter(Aprobacion.aprobador_id == session.get('user_id'))
     
     # Aplicar filtros
     if estado_filtro:
-        query = query.filter_by(estado=estado_filtro)
+        query = query.filter(Aprobacion.estado == estado_filtro)
+    if tipo_filtro:
+        query = query.filter(Item.tipo == tipo_filtro)
     
     aprobaciones_raw = query.order_by(Aprobacion.fecha_solicitud.desc()).all()
     
-    # CREAR LISTA CON ITEMS Y SOLICITANTES
-    aprobaciones = []
-    for apr in aprobaciones_raw:
-        item = Item.query.get(apr.item_id)
-        if item:
-            # Aplicar filtro de tipo si existe
-            if tipo_filtro and item.tipo != tipo_filtro:
-                continue
-                
-            solicitante = Usuario.query.get(item.creado_por)
-            aprobaciones.append({
-                'aprobacion': apr,
-                'item': item,
-                'solicitante': solicitante
-            })
-    
-    # Estadísticas
-    total_pendientes = Aprobacion.query.filter_by(
-        aprobador_id=session.get('user_id'),
-        estado='pendiente'
-    ).count()
+    aprobaciones = [{
+        'aprobacion': apr,
+        'item': apr.item,
+        'solicitante': apr.item.creador
+    } for apr in aprobaciones_raw]
     
-    total_aprobadas = Aprobacion.query.filter_by(
-        aprobador_id=session.get('user_id'),
-        estado='aprobado'
-    ).count()
+    # Estadísticas (una consulta agrupada por estado)
+    conteos = dict(db.session.query(
+        Aprobacion.estado,
+        func.count(Aprobacion.id)
+    ).filter(
+        Aprobacion.aprobador_id == session.get('user_id')
+    ).group_by(Aprobacion.estado).all())
     
-    total_rechazadas = Aprobacion.query.filter_by(
-        aprobador_id=session.get('user_id'),
-        estado='rechazado'
-    ).count()
+    total_pendientes = conteos.get('pendiente', 0)
+    total_aprobadas = conteos.get('aprobado', 0)
+    total_rechazadas = conteos.get('rechazado', 0)
     
     return render_template('aprobaciones_pendientes.html',
                          aprobaciones=aprobaciones,
@@ -1243,37 +1105,98 @@ def aprobacion_decidir(id):
     if decision not in ['aprobar', 'rechazar']:
         return {'success': False, 'error': 'Decisión inválida'}, 400
     
-    # Actualizar aprobación
-    from datetime import datetime
-    aprobacion.estado = 'aprobado' if decision == 'aprobar' else 'rechazado'
-    aprobacion.comentarios = comentarios
-    aprobacion.fecha_respuesta = datetime.utcnow()
-    
-    # Si se aprueba, cambiar estado del item
-    if decision == 'aprobar':
-        item = Item.query.get(aprobacion.item_id)
-        item.estado = 'aprobado'
-        
-        # Crear versión del cambio
-        ultima_version = Version.query.filter_by(item_id=item.id).order_by(Version.numero_version.desc()).first()
-        numero_version = (ultima_version.numero_version + 1) if ultima_version else 1
-        
-        version = Version(
-            item_id=item.id,
-            numero_version=numero_version,
-            campo_modificado='Estado',
-            valor_anterior='propuesto',
-            valor_nuevo='aprobado',
-            razon_cambio=f'Aprobado por Gerente: {comentarios}',
-            usuario_id=session.get('user_id')
-        )
-        db.session.add(version)
-    
+    aplicar_decision_aprobaciones([aprobacion], decision, comentarios, session.get('user_id'))
     db.session.commit()
     
     return {'success': True, 'estado': aprobacion.estado}
 
 
+@bp.route('/aprobaciones/decidir-lote', methods=['POST'])
+def aprobaciones_decidir_lote():
+    """Aprueba o rechaza varias solicitudes en una sola transacción"""
+    if 'user_id' not in session:
+        return {'success': False, 'error': 'No autenticado'}, 401
+    
+    # Solo Gerente puede decidir
+    if session.get('rol') != 'gerente':
+        return {'success': False, 'error': 'No autorizado'}, 403
+    
+    data = request.get_json(silent=True) or {}
+    ids = data.get('ids', [])
+    decision = data.get('decision')  # 'aprobar' o 'rechazar'
+    comentarios = data.get('comentarios', '')
+    
+    if decision not in ['aprobar', 'rechazar']:
+        return {'success': False, 'error': 'Decisión inválida'}, 400
+    
+    try:
+        ids = [int(i) for i in ids]
+    except (TypeError, ValueError):
+        return {'success': False, 'error': 'Lista de aprobaciones inválida'}, 400
+    
+    if not ids:
+        return {'success': False, 'error': 'No se seleccionaron aprobaciones'}, 400
+    
+    # Solo aprobaciones pendientes del gerente actual (items cargados en el mismo JOIN)
+    aprobaciones = Aprobacion.query.join(Item, Aprobacion.item_id == Item.id).options(
+        contains_eager(Aprobacion.item)
+    ).filter(
+        Aprobacion.id.in_(ids),
+        Aprobacion.aprobador_id == session.get('user_id'),
+        Aprobacion.estado == 'pendiente'
+    ).all()
+    
+    procesadas_ids = {apr.id for apr in aprobaciones}
+    omitidas = [i for i in ids if i not in procesadas_ids]
+    
+    try:
+        aplicar_decision_aprobaciones(aprobaciones, decision, comentarios, session.get('user_id'))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Error en decisión por lote: {str(e)}")
+        return {'success': False, 'error': str(e)}, 500
+    
+    return {
+        'success': True,
+        'estado': 'aprobado' if decision == 'aprobar' else 'rechazado',
+        'procesadas': len(aprobaciones),
+        'omitidas': omitidas
+    }
+
+
+def aplicar_decision_aprobaciones(aprobaciones, decision, comentarios, usuario_id):
+    """
+    Aplica una decisión a varias aprobaciones dentro de la sesión actual (sin commit).
+    Los números de versión se reservan en Item.ultima_version (sin consultar el máximo).
+    """
+    if not aprobaciones:
+        return
+    
+    ahora = datetime.utcnow()
+    
+    for aprobacion in aprobaciones:
+        aprobacion.estado = 'aprobado' if decision == 'aprobar' else 'rechazado'
+        aprobacion.comentarios = comentarios
+        aprobacion.fecha_respuesta = ahora
+        
+        # Si se aprueba, cambiar estado del item y registrar versión
+        if decision == 'aprobar':
+            item = aprobacion.item
+            item.estado = 'aprobado'
+            
+            registrar_version(
+                item_id=item.id,
+                numero_version=reservar_numeros_version(item.id),
+                campo_modificado='Estado',
+                anterior='propuesto',
+                nuevo='aprobado',
+                razon_cambio=f'Aprobado por Gerente: {comentarios}',
+                usuario_id=usuario_id,
+                campo='estado'
+            )
+
+
 @bp.route('/metricas/generar-automatico/<int:item_id>/<int:mes>/<int:anio>', methods=['POST'])
 @login_required
 def metrica_generar_automatico(item_id, mes, anio):
@@ -1436,11 +1359,7 @@ def resolver_alerta_con_incidencias(alerta_id):
         print(f"📊 Contador ANTES de actualizar: {alerta.incidencias_resueltas_count}")
         print(f"🔗 Relaciones AlertaIncidencia en memoria: {len([r for r in db.session.new if isinstance(r, AlertaIncidencia)])}")
         
-        # ✅ CRÍTICO: Actualizar contador de incidencias resueltas EN LA ALERTA
-        alerta.incidencias_resueltas_count += len(incidencias_resueltas)
-        
-        print(f"➕ Incrementando contador en: {len(incidencias_resueltas)}")
-        print(f"📊 Contador DESPUÉS de incrementar: {alerta.incidencias_resueltas_count}")
+        # El contador de la alerta lo incrementa cada AlertaIncidencia al guardarse (app/contadores.py)
         
         # ✅ Commit ANTES de recalcular
         db.session.commit()
@@ -1493,6 +1412,21 @@ def resolver_alerta_con_incidencias(alerta_id):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+def filtrar_alertas(query, modelo=Alerta):
+    """Filtros de la vista de alertas (también los usa la exportación)"""
+    estado = request.args.get('estado', '')
+    tipo = request.args.get('tipo', '')
+    urgencia = request.args.get('urgencia', '')
+    
+    if estado:
+        query = query.filter(modelo.estado == estado)
+    if tipo:
+        query = query.filter(modelo.tipo == tipo)
+    if urgencia:
+        query = query.filter(modelo.nivel_urgencia == urgencia)
+    return filtrar_rango_fechas(query, modelo.fecha_creacion)
+
+
 @bp.route('/alertas')
 @login_required
 def alertas():
@@ -1500,23 +1434,22 @@ def alertas():
     tipo_filtro = request.args.get('tipo', '')
     urgencia_filtro = request.args.get('urgencia', '')
     
-    # ✅ CORRECCIÓN: Usar la relación definida en el modelo
-    query = Alerta.query
+    incluir_archivo = request.args.get('incluir_archivo') == '1'
     
-    if estado_filtro:
-        query = query.filter(Alerta.estado == estado_filtro)
-    if tipo_filtro:
-        query = query.filter(Alerta.tipo == tipo_filtro)
-    if urgencia_filtro:
-        query = query.filter(Alerta.nivel_urgencia == urgencia_filtro)
+    # Mismos filtros sobre la tabla de trabajo y, si se pide, sobre el archivo
+    consultas = [
+        filtrar_alertas(modelo.query, modelo).order_by(modelo.fecha_creacion.desc())
+        for modelo in (Alerta, AlertaArchivo)
+    ]
     
     # ✅ Obtener alertas con sus items relacionados
-    alertas_raw = query.order_by(Alerta.fecha_creacion.desc()).all()
+    alertas_raw = con_archivo(consultas[0], consultas[1], 'fecha_creacion', incluir_archivo)
     
-    # ✅ CREAR LISTA CON ESTRUCTURA CORRECTA
+    # ✅ CREAR LISTA CON ESTRUCTURA CORRECTA (items desde el catálogo en memoria)
+    items_por_id = obtener_items({alerta.item_id for alerta in alertas_raw})
     alertas = []
     for alerta in alertas_raw:
-        item = Item.query.get(alerta.item_id)
+        item = items_por_id.get(alerta.item_id)
         if item:
             alertas.append({
                 'alerta': alerta,
@@ -1539,24 +1472,17 @@ def alertas():
                          alertas_altas=alertas_altas,
                          estado_filtro=estado_filtro,
                          tipo_filtro=tipo_filtro,
-                         urgencia_filtro=urgencia_filtro)
+                         urgencia_filtro=urgencia_filtro,
+                         incluir_archivo=incluir_archivo)
 
 
-@bp.route('/metricas')
-def metricas_lista():
-    if 'user_id' not in session:
-        return redirect(url_for('main.login'))
-    
-    # Obtener filtros
+def filtrar_metricas(query):
+    """Filtros de la vista de métricas (también los usa la exportación)"""
     item_id = request.args.get('item_id', '')
     mes = request.args.get('mes', '')
     anio = request.args.get('anio', '')
     semaforo = request.args.get('semaforo', '')
     
-    # Query base
-    query = Metrica.query
-    
-    # Aplicar filtros
     if item_id:
         query = query.filter_by(item_id=int(item_id))
     if mes:
@@ -1565,14 +1491,32 @@ def metricas_lista():
         query = query.filter_by(anio=int(anio))
     if semaforo:
         query = query.filter_by(semaforo=semaforo)
+    return query
+
+
+@bp.route('/metricas')
+@solo_lectura
+def metricas_lista():
+    if 'user_id' not in session:
+        return redirect(url_for('main.login'))
+    
+    # Obtener filtros
+    item_id = request.args.get('item_id', '')
+    mes = request.args.get('mes', '')
+    anio = request.args.get('anio', '')
+    semaforo = request.args.get('semaforo', '')
+    
+    # Query base con filtros
+    query = filtrar_metricas(Metrica.query)
     
     # Obtener métricas ordenadas
     metricas_raw = query.order_by(Metrica.anio.desc(), Metrica.mes.desc()).all()
     
-    # CREAR LISTA CON ITEMS
+    # CREAR LISTA CON ITEMS (desde el catálogo en memoria)
+    items_por_id = obtener_items({metrica.item_id for metrica in metricas_raw})
     metricas = []
     for metrica in metricas_raw:
-        item = Item.query.get(metrica.item_id)
+        item = items_por_id.get(metrica.item_id)
         if item:
             metricas.append({
                 'metrica': metrica,
@@ -1590,16 +1534,8 @@ def metricas_lista():
         func.avg(Metrica.porcentaje_cumplimiento)
     ).filter(Metrica.porcentaje_cumplimiento.isnot(None)).scalar() or 0
     
-    # ✅ CORRECCIÓN CRÍTICA: Items APROBADOS y ACTIVOS (NO REEMPLAZADOS)
-    items_reemplazados = db.session.query(Item.reemplaza_a_id).filter(
-        Item.reemplaza_a_id.isnot(None)
-    ).subquery()
-    
-    items = Item.query.filter(
-        Item.estado == 'aprobado',              # ← CORRECTO: estado de aprobación
-        Item.estado_operativo == 'activo',      # ← CORRECTO: estado operativo
-        ~Item.id.in_(items_reemplazados)        # ← CORRECTO: no reemplazados
-    ).order_by(Item.tipo, Item.codigo).all()
+    # ✅ Items APROBADOS y ACTIVOS (NO REEMPLAZADOS), desde el catálogo
+    items = catalogo_items_activos(orden=('tipo', 'codigo'))
     
     return render_template('metricas_lista.html',
                          metricas=metricas,
@@ -1632,6 +1568,7 @@ def metrica_eliminar(id):
 
 
 @bp.route('/historial/<int:item_id>')
+@solo_lectura
 def historial(item_id):
     if 'user_id' not in session:
         return redirect(url_for('main.login'))
@@ -1666,25 +1603,50 @@ def historial(item_id):
 
 
 @bp.route('/historial/<int:item_id>/comparar')
+@solo_lectura
 def historial_comparar(item_id):
+    """Compara el estado completo del item (campos y SLA) entre dos números de versión"""
     if 'user_id' not in session:
         return redirect(url_for('main.login'))
     
-    version1_id = request.args.get('v1')
-    version2_id = request.args.get('v2')
+    item = Item.query.get_or_404(item_id)
     
-    if not version1_id or not version2_id:
+    try:
+        v1 = int(request.args.get('v1', ''))
+        v2 = int(request.args.get('v2', ''))
+    except ValueError:
         flash('Debe seleccionar dos versiones para comparar', 'warning')
         return redirect(url_for('main.historial', item_id=item_id))
     
-    version1 = Version.query.get_or_404(version1_id)
-    version2 = Version.query.get_or_404(version2_id)
-    item = Item.query.get_or_404(item_id)
+    try:
+        comparacion = comparar_versiones(item_id, v1, v2)
+    except ComparacionError as e:
+        flash(str(e), 'warning')
+        return redirect(url_for('main.historial', item_id=item_id))
     
     return render_template('historial_comparar.html',
                          item=item,
-                         version1=version1,
-                         version2=version2)
+                         comparacion=comparacion)
+
+
+@bp.route('/api/historial/<int:item_id>/comparar')
+@login_required
+@solo_lectura
+def api_historial_comparar(item_id):
+    """API: Diferencias por palabra entre el estado del item en v1 y v2 (números de versión)"""
+    try:
+        v1 = int(request.args.get('v1', ''))
+        v2 = int(request.args.get('v2', ''))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Parámetros v1 y v2 requeridos (números de versión)'}), 400
+    
+    try:
+        return jsonify({'success': True, **comparar_versiones(item_id, v1, v2)})
+    except ComparacionError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    except Exception as e:
+        print(f"Error en api_historial_comparar: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
 
 
 # ====================================
@@ -1711,12 +1673,15 @@ def api_items_reemplazos():
         return {'error': 'No autenticado'}, 401
     
     try:
-        items = Item.query.order_by(Item.fecha_creacion.desc()).all()
+        # Sucesor de cada item precalculado en item_estado
+        items = db.session.query(Item, ItemEstado.reemplazado_por_id).outerjoin(
+            ItemEstado, ItemEstado.item_id == Item.id
+        ).order_by(Item.fecha_creacion.desc()).all()
         
         items_json = []
-        for item in items:
+        for item, reemplazado_por_id in items:
             # Verificar si tiene reemplazo posterior
-            tiene_reemplazo = Item.query.filter_by(reemplaza_a_id=item.id).first() is not None
+            tiene_reemplazo = reemplazado_por_id is not None
             
             # Contar niveles en la cadena
             nivel_anterior = contar_nivel_anterior(item)
@@ -1954,21 +1919,33 @@ def servicio_historial(id):
 # INCIDENCIAS (4 RUTAS SOLAMENTE)
 # ====================================
 
+def filtrar_incidencias(query, modelo=Incidencia):
+    """Filtros de la lista de incidencias (también los usa la exportación)"""
+    estado = request.args.get('estado', '')
+    item_id = request.args.get('item_id', '')
+    
+    if estado:
+        query = query.filter(modelo.estado == estado)
+    if item_id:
+        query = query.filter(modelo.item_id == int(item_id))
+    return filtrar_rango_fechas(query, modelo.fecha_incidencia)
+
+
 @bp.route('/incidencias')
 @login_required
 def incidencias_lista():
     """Lista todas las incidencias"""
     estado_filtro = request.args.get('estado', '')
     item_id = request.args.get('item_id', '')
+    incluir_archivo = request.args.get('incluir_archivo') == '1'
     
-    query = Incidencia.query
-    
-    if estado_filtro:
-        query = query.filter_by(estado=estado_filtro)
-    if item_id:
-        query = query.filter_by(item_id=int(item_id))
+    # Mismos filtros sobre la tabla de trabajo y, si se pide, sobre el archivo
+    consultas = [
+        filtrar_incidencias(modelo.query, modelo).order_by(modelo.fecha_incidencia.desc())
+        for modelo in (Incidencia, IncidenciaArchivo)
+    ]
     
-    incidencias = query.order_by(Incidencia.fecha_incidencia.desc()).all()
+    incidencias = con_archivo(consultas[0], consultas[1], 'fecha_incidencia', incluir_archivo)
     
     # Estadísticas
     total_incidencias = Incidencia.query.count()
@@ -1976,16 +1953,8 @@ def incidencias_lista():
     incidencias_proceso = Incidencia.query.filter_by(estado='en_proceso').count()
     incidencias_resueltas = Incidencia.query.filter_by(estado='resuelta').count()
     
-    # Items activos
-    items_reemplazados = db.session.query(Item.reemplaza_a_id).filter(
-        Item.reemplaza_a_id.isnot(None)
-    ).subquery()
-    
-    items = Item.query.filter(
-        Item.estado == 'aprobado',
-        Item.estado_operativo == 'activo',
-        ~Item.id.in_(items_reemplazados)
-    ).order_by(Item.codigo).all()
+    # Items activos (desde el catálogo en memoria)
+    items = catalogo_items_activos(orden=('codigo',))
     
     # ✅ CARGAR SERVICIOS AFECTADOS
     from app.models import ServicioAfectado
@@ -2000,7 +1969,8 @@ def incidencias_lista():
                          items=items,
                          servicios_afectados=servicios_afectados,  # ✅ NUEVO
                          estado_filtro=estado_filtro,
-                         item_id=item_id)
+                         item_id=item_id,
+                         incluir_archivo=incluir_archivo)
 
 
 @bp.route('/incidencias/registrar', methods=['POST'])
@@ -2327,16 +2297,17 @@ def incidencia_alerta_critica(id):
     
     # ✅ CRÍTICO: ENVIAR NOTIFICACIONES POR EMAIL
     try:
-        # Obtener técnicos y jefes TI con correo
-        usuarios_notificar = Usuario.query.filter(
-            Usuario.rol.in_(['tecnico', 'jefe_ti'])
-        ).all()
-        
+        # Usuarios suscritos a la alerta con correo
         destinatarios = []
-        for usuario in usuarios_notificar:
-            if usuario.persona and usuario.persona.correo:
-                destinatarios.append(usuario.persona.correo)
-                print(f"📧 Destinatario: {usuario.persona.nombres} ({usuario.persona.correo})")
+        telefonos = []
+        for usuario in destinatarios_alerta(alerta, item):
+            if usuario.correo:
+                destinatarios.append(usuario.correo)
+                print(f"📧 Destinatario: {usuario.nombres} ({usuario.correo})")
+            if usuario.telefono:
+                telefonos.append(usuario.telefono)
+        
+        enviar_alerta_whatsapp(alerta, item, telefonos)
         
         if destinatarios:
             # ✅ LLAMAR A LA FUNCIÓN DE EMAIL_SERVICE
@@ -2465,57 +2436,6 @@ def generar_alerta_si_sobrepasa_sla(item_id):
         return None
     
 
-def enviar_notificaciones_alerta_critica(alerta):
-    """
-    Envía notificaciones por email a técnicos y jefes TI cuando se genera una alerta crítica
-    
-    Args:
-        alerta: Objeto Alerta recién creado
-    """
-    try:
-        # Obtener el item relacionado
-        item = Item.query.get(alerta.item_id)
-        if not item:
-            print("⚠️ No se encontró el item para la alerta")
-            return False
-        
-        # ✅ OBTENER CORREOS DE TÉCNICOS Y JEFES TI
-        usuarios_notificar = Usuario.query.filter(
-            Usuario.rol.in_(['tecnico', 'jefe_ti'])
-        ).all()
-        
-        destinatarios = []
-        for usuario in usuarios_notificar:
-            if usuario.persona and usuario.persona.correo:
-                destinatarios.append(usuario.persona.correo)
-                print(f"📧 Agregando destinatario: {usuario.persona.nombres} ({usuario.persona.correo})")
-        
-        if not destinatarios:
-            print("⚠️ No hay destinatarios con correo registrado")
-            return False
-        
-        # ✅ ENVIAR NOTIFICACIÓN
-        from app.email_service import enviar_notificacion_alerta_critica
-        
-        resultado = enviar_notificacion_alerta_critica(
-            app=current_app._get_current_object(),
-            alerta=alerta,
-            item=item,
-            destinatarios=destinatarios
-        )
-        
-        if resultado:
-            print(f"✅ Notificaciones de alerta enviadas a {len(destinatarios)} usuario(s)")
-        else:
-            print("❌ Error al enviar notificaciones de alerta")
-        
-        return resultado
-        
-    except Exception as e:
-        print(f"❌ Error al enviar notificaciones de alerta: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return False
     
 
 # ====================================
@@ -2553,9 +2473,10 @@ def api_alertas_nuevas():
         # Actualizar última verificación
         session['ultima_verificacion_alertas'] = datetime.utcnow().isoformat()
         
+        items_por_id = obtener_items({alerta.item_id for alerta in alertas_nuevas})
         alertas_json = []
         for alerta in alertas_nuevas:
-            item = Item.query.get(alerta.item_id)
+            item = items_por_id.get(alerta.item_id)
             if item:
                 alertas_json.append({
                     'id': alerta.id,
@@ -2581,65 +2502,6 @@ def api_alertas_nuevas():
             'error': str(e)
         }), 500
 
-# ====================================
-# ENVIAR NOTIFICACIONES DE ALERTA
-# ====================================
-
-# ====================================
-# ENVIAR NOTIFICACIONES DE ALERTA
-# ====================================
-
-def enviar_notificaciones_alerta_critica(alerta):
-    """
-    Envía notificaciones por email a técnicos y jefes TI cuando se genera una alerta crítica
-    
-    Args:
-        alerta: Objeto Alerta recién creado
-    """
-    try:
-        # Obtener el item relacionado
-        item = Item.query.get(alerta.item_id)
-        if not item:
-            print("⚠️ No se encontró el item para la alerta")
-            return False
-        
-        # ✅ OBTENER CORREOS DE TÉCNICOS Y JEFES TI
-        usuarios_notificar = Usuario.query.filter(
-            Usuario.rol.in_(['tecnico', 'jefe_ti'])
-        ).all()
-        
-        destinatarios = []
-        for usuario in usuarios_notificar:
-            if usuario.persona and usuario.persona.correo:
-                destinatarios.append(usuario.persona.correo)
-                print(f"📧 Agregando destinatario: {usuario.persona.nombres} ({usuario.persona.correo})")
-        
-        if not destinatarios:
-            print("⚠️ No hay destinatarios con correo registrado")
-            return False
-        
-        # ✅ ENVIAR NOTIFICACIÓN
-        from app.email_service import enviar_notificacion_alerta_critica
-        
-        resultado = enviar_notificacion_alerta_critica(
-            app=current_app._get_current_object(),
-            alerta=alerta,
-            item=item,
-            destinatarios=destinatarios
-        )
-        
-        if resultado:
-            print(f"✅ Notificaciones de alerta enviadas a {len(destinatarios)} usuario(s)")
-        else:
-            print("❌ Error al enviar notificaciones de alerta")
-        
-        return resultado
-        
-    except Exception as e:
-        print(f"❌ Error al enviar notificaciones de alerta: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return False
 
 @bp.route('/admin/generar-metricas-ahora', methods=['POST'])
 @login_required
@@ -2662,6 +2524,7 @@ def admin_generar_metricas_ahora():
     return redirect(url_for('main.metricas_lista'))
 
 @bp.route('/api/servicios-afectados')
+@respuesta_condicional('servicio_afectado')
 def api_servicios_afectados():
     """API para obtener catálogo de servicios afectados"""
     if 'user_id' not in session:
@@ -2685,12 +2548,133 @@ def api_servicios_afectados():
         'servicios': servicios_json
     }
 
+# ====================================
+# EXPORTAR CSV / XLSX (EN FLUJO)
+# ====================================
+
+def _nombres_usuarios():
+    """{usuario_id: 'Nombres Apellidos'} (una consulta por exportación)"""
+    filas = db.session.query(Usuario.id, Usuario.username, Persona.nombres, Persona.apellidos).outerjoin(
+        Persona, Persona.usuario_id == Usuario.id
+    ).all()
+    return {
+        fila.id: f"{fila.nombres} {fila.apellidos}" if fila.nombres else fila.username
+        for fila in filas
+    }
+
+
+def _columna_item(atributo):
+    def valor(fila):
+        item = obtener_item(fila.item_id)
+        return getattr(item, atributo) if item else ''
+    return valor
+
+
+@bp.route('/incidencias/exportar/<formato>')
+@login_required
+def incidencias_exportar(formato):
+    """Exporta las incidencias con los filtros de la lista (CSV o XLSX)"""
+    usuarios = _nombres_usuarios()
+    
+    consultas = [filtrar_incidencias(Incidencia.query).order_by(Incidencia.fecha_incidencia.desc())]
+    if request.args.get('incluir_archivo') == '1':
+        consultas.append(
+            filtrar_incidencias(IncidenciaArchivo.query, IncidenciaArchivo)
+            .order_by(IncidenciaArchivo.fecha_incidencia.desc(), IncidenciaArchivo.id.desc())
+        )
+    
+    columnas = [
+        ('ID', lambda i: i.id),
+        ('Código', _columna_item('codigo')),
+        ('Item', _columna_item('nombre')),
+        ('Título', lambda i: i.titulo),
+        ('Tipo', lambda i: i.tipo),
+        ('Severidad', lambda i: i.severidad),
+        ('Estado', lambda i: i.estado),
+        ('Fecha incidencia', lambda i: i.fecha_incidencia),
+        ('Fecha resolución', lambda i: i.fecha_resolucion),
+        ('Tiempo resolución (min)', lambda i: i.tiempo_resolucion),
+        ('Usuarios afectados', lambda i: i.usuarios_afectados),
+        ('Servicios afectados', lambda i: i.servicios_afectados),
+        ('Descripción', lambda i: i.descripcion),
+        ('Causa raíz', lambda i: i.causa_raiz),
+        ('Solución aplicada', lambda i: i.solucion_aplicada),
+        ('Registrado por', lambda i: usuarios.get(i.registrado_por, '')),
+        ('Resuelto por', lambda i: usuarios.get(i.resuelto_por, '')),
+        ('Archivada', lambda i: 'Sí' if getattr(i, 'archivada', False) else 'No'),
+    ]
+    
+    return respuesta_exportacion(formato, 'incidencias', columnas, leer_en_lotes(*consultas), 'Incidencias')
+
+
+@bp.route('/alertas/exportar/<formato>')
+@login_required
+def alertas_exportar(formato):
+    """Exporta las alertas con los filtros de la vista (CSV o XLSX)"""
+    usuarios = _nombres_usuarios()
+    
+    consultas = [filtrar_alertas(Alerta.query).order_by(Alerta.fecha_creacion.desc())]
+    if request.args.get('incluir_archivo') == '1':
+        consultas.append(
+            filtrar_alertas(AlertaArchivo.query, AlertaArchivo)
+            .order_by(AlertaArchivo.fecha_creacion.desc(), AlertaArchivo.id.desc())
+        )
+    
+    columnas = [
+        ('ID', lambda a: a.id),
+        ('Código', _columna_item('codigo')),
+        ('Item', _columna_item('nombre')),
+        ('Tipo', lambda a: a.tipo),
+        ('Urgencia', lambda a: a.nivel_urgencia),
+        ('Estado', lambda a: a.estado),
+        ('Mensaje', lambda a: a.mensaje),
+        ('Fecha creación', lambda a: a.fecha_creacion),
+        ('Fecha resolución', lambda a: a.fecha_resolucion),
+        ('Resuelto por', lambda a: usuarios.get(a.resuelto_por, '')),
+        ('Archivada', lambda a: 'Sí' if getattr(a, 'archivada', False) else 'No'),
+    ]
+    
+    return respuesta_exportacion(formato, 'alertas', columnas, leer_en_lotes(*consultas), 'Alertas')
+
+
+@bp.route('/metricas/exportar/<formato>')
+@login_required
+def metricas_exportar(formato):
+    """Exporta las métricas con los filtros de la lista (CSV o XLSX)"""
+    usuarios = _nombres_usuarios()
+    
+    consulta = filtrar_metricas(Metrica.query).order_by(
+        Metrica.anio.desc(), Metrica.mes.desc(), Metrica.item_id
+    )
+    
+    columnas = [
+        ('ID', lambda m: m.id),
+        ('Código', _columna_item('codigo')),
+        ('Item', _columna_item('nombre')),
+        ('Año', lambda m: m.anio),
+        ('Mes', lambda m: m.mes),
+        ('Incidencias', lambda m: m.incidencias),
+        ('Disponibilidad (%)', lambda m: m.disponibilidad_real),
+        ('Velocidad', lambda m: m.velocidad_real),
+        ('Latencia', lambda m: m.latencia_real),
+        ('Tiempo respuesta', lambda m: m.tiempo_respuesta_real),
+        ('Semáforo', lambda m: m.semaforo),
+        ('Cumplimiento (%)', lambda m: m.porcentaje_cumplimiento),
+        ('Observaciones', lambda m: m.observaciones),
+        ('Fecha registro', lambda m: m.fecha_registro),
+        ('Registrado por', lambda m: usuarios.get(m.registrado_por, '')),
+    ]
+    
+    return respuesta_exportacion(formato, 'metricas', columnas, leer_en_lotes(consulta), 'Métricas')
+
+
 # ====================================
 # GENERAR PDF DE PRODUCTOS
 # ====================================
 
 @bp.route('/productos/pdf')
 @login_required
+@solo_lectura
 def productos_pdf():
     """Generar PDF de lista de productos"""
     from pdf_generator import generar_pdf_productos
@@ -2712,10 +2696,11 @@ def productos_pdf():
     if estado:
         query = query.filter_by(estado=estado)
     
-    productos = query.order_by(Item.codigo).all()
+    productos = query.order_by(*orden_codigo()).all()
     
     # Generar PDF
-    pdf_buffer = generar_pdf_productos(productos)
+    with medir_pdf('productos'):
+        pdf_buffer = generar_pdf_productos(productos)
     
     # Nombre del archivo
     from datetime import datetime
@@ -2732,6 +2717,7 @@ def productos_pdf():
 
 @bp.route('/servicios/pdf')
 @login_required
+@solo_lectura
 def servicios_pdf():
     """Generar PDF de lista de servicios"""
     from pdf_generator import generar_pdf_servicios
@@ -2753,10 +2739,11 @@ def servicios_pdf():
     if estado:
         query = query.filter_by(estado=estado)
     
-    servicios = query.order_by(Item.codigo).all()
+    servicios = query.order_by(*orden_codigo()).all()
     
     # Generar PDF
-    pdf_buffer = generar_pdf_servicios(servicios)
+    with medir_pdf('servicios'):
+        pdf_buffer = generar_pdf_servicios(servicios)
     
     # Nombre del archivo
     from datetime import datetime
@@ -2779,6 +2766,7 @@ def servicios_pdf():
 
 @bp.route('/api/historial/<int:item_id>/pdf')
 @login_required
+@solo_lectura
 def historial_pdf(item_id):
     """Generar PDF del historial completo de reemplazos"""
     from pdf_generator import generar_pdf_historial_reemplazos
@@ -2851,7 +2839,8 @@ def historial_pdf(item_id):
         }
         
         # Generar PDF
-        pdf_buffer = generar_pdf_historial_reemplazos(item_actual_dict, cadena_anterior, cadena_posterior)
+        with medir_pdf('historial_reemplazos'):
+            pdf_buffer = generar_pdf_historial_reemplazos(item_actual_dict, cadena_anterior, cadena_posterior)
         
         # Nombre del archivo
         from datetime import datetime
@@ -3088,6 +3077,7 @@ def reportes():
 
 @bp.route('/api/reportes/datos')
 @login_required
+@solo_lectura
 def api_reportes_datos():
     """API: Obtener datos para reporte"""
     try:
@@ -3095,37 +3085,24 @@ def api_reportes_datos():
         mes_actual = datetime.now().month
         anio_actual = datetime.now().year
         
-        # Items activos con sus métricas e incidencias
-        items_reemplazados = db.session.query(Item.reemplaza_a_id).filter(
-            Item.reemplaza_a_id.isnot(None)
-        ).subquery()
+        # Items vigentes con su última métrica (item_estado, app/estado_items.py)
+        query = db.session.query(Item, ItemEstado).join(
+            ItemEstado, ItemEstado.item_id == Item.id
+        ).filter(ItemEstado.vigente)
         
-        items = Item.query.filter(
-            Item.estado == 'aprobado',
-            Item.estado_operativo == 'activo',
-            ~Item.id.in_(items_reemplazados)
-        ).all()
+        # Orden opcional por un contador denormalizado (mayor primero)
+        orden = request.args.get('orden')
+        if orden == 'incidencias_mes':
+            query = query.order_by(incidencias_mes_actual().desc(), Item.id)
+        elif orden in ('incidencias_abiertas', 'incidencias_resueltas', 'alertas_activas'):
+            query = query.order_by(getattr(Item, orden).desc(), Item.id)
+        filas = query.all()
+        periodo = anio_actual * 100 + mes_actual
         
         datos = []
-        for item in items:
-            # Métrica del mes actual
-            metrica = Metrica.query.filter_by(
-                item_id=item.id,
-                mes=mes_actual,
-                anio=anio_actual
-            ).first()
-            
-            # Contar incidencias activas y resueltas
-            incidencias_activas = Incidencia.query.filter_by(
-                item_id=item.id,
-                estado='abierta'
-            ).count()
-            
-            incidencias_resueltas = Incidencia.query.filter_by(
-                item_id=item.id,
-                estado='resuelta'
-            ).count()
-            
+        for item, estado in filas:
+            # La última métrica solo cuenta si es la del mes actual
+            metrica = estado if (estado.metrica_anio, estado.metrica_mes) == (anio_actual, mes_actual) else None
             datos.append({
                 'id': item.id,
                 'codigo': item.codigo,
@@ -3134,8 +3111,11 @@ def api_reportes_datos():
                 'categoria': item.categoria or 'Sin categoría',
                 'semaforo_sla': metrica.semaforo if metrica else 'verde',
                 'cumplimiento_sla': metrica.porcentaje_cumplimiento if metrica else 100,
-                'incidencias_activas': incidencias_activas,
-                'incidencias_resueltas': incidencias_resueltas
+                # Contadores denormalizados de Item (app/contadores.py)
+                'incidencias_activas': item.incidencias_abiertas,
+                'incidencias_resueltas': item.incidencias_resueltas,
+                'incidencias_mes': item.incidencias_mes if item.periodo_incidencias == periodo else 0,
+                'alertas_activas': item.alertas_activas
             })
         
         return jsonify({'success': True, 'items': datos})
@@ -3145,8 +3125,169 @@ def api_reportes_datos():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@bp.route('/api/series')
+@login_required
+@solo_lectura
+def api_series():
+    """
+    API: Series mensuales de cumplimiento desde el resumen de métricas
+    Parámetros: dimension (item|categoria|tipo), clave (repetible o separada por comas),
+    desde y hasta en formato YYYY-MM
+    """
+    dimension = request.args.get('dimension', 'categoria')
+    if dimension not in ['item', 'categoria', 'tipo']:
+        return jsonify({'success': False, 'error': 'Dimensión inválida'}), 400
+    
+    claves = []
+    for valor in request.args.getlist('clave'):
+        claves.extend(c.strip() for c in valor.split(',') if c.strip())
+    
+    # Rango por defecto: últimos 12 meses
+    hoy = datetime.now()
+    hasta_defecto = f'{hoy.year}-{hoy.month:02d}'
+    anio_desde, mes_desde = (hoy.year - 1, hoy.month + 1) if hoy.month < 12 else (hoy.year, 1)
+    desde_defecto = f'{anio_desde}-{mes_desde:02d}'
+    
+    try:
+        anio, mes = request.args.get('desde', desde_defecto).split('-')
+        periodo_desde = int(anio) * 100 + int(mes)
+        anio, mes = request.args.get('hasta', hasta_defecto).split('-')
+        periodo_hasta = int(anio) * 100 + int(mes)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Formato de fecha inválido (use YYYY-MM)'}), 400
+    
+    if periodo_desde > periodo_hasta or not 1 <= periodo_desde % 100 <= 12 or not 1 <= periodo_hasta % 100 <= 12:
+        return jsonify({'success': False, 'error': 'Rango de fechas inválido'}), 400
+    
+    if (periodo_hasta // 100 - periodo_desde // 100) > 20:
+        return jsonify({'success': False, 'error': 'El rango máximo es de 20 años'}), 400
+    
+    try:
+        resultado = obtener_series(dimension, claves, periodo_desde, periodo_hasta)
+        return jsonify({'success': True, 'dimension': dimension, **resultado})
+    
+    except Exception as e:
+        print(f"Error en api_series: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/api/version/<int:version_id>/valor')
+@login_required
+def api_version_valor(version_id):
+    """API: Valores completos (anterior y nuevo) de una versión, reconstruidos del historial"""
+    version = Version.query.get_or_404(version_id)
+    
+    try:
+        valor_anterior, valor_nuevo, completo = valores_version(version)
+        return jsonify({
+            'success': True,
+            'version_id': version.id,
+            'item_id': version.item_id,
+            'numero_version': version.numero_version,
+            'campo': version.campo_modificado,
+            'valor_anterior': valor_anterior,
+            'valor_nuevo': valor_nuevo,
+            'completo': completo
+        })
+    
+    except Exception as e:
+        print(f"Error en api_version_valor: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/api/admin/pool')
+@login_required
+@jefe_o_gerente_required
+def api_admin_pool():
+    """API: Estadísticas del pool de conexiones por bind (principal / réplica)"""
+    try:
+        return jsonify({'success': True, **estadisticas_pool()})
+    except Exception as e:
+        print(f"Error en api_admin_pool: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/api/admin/invalidacion')
+@login_required
+@jefe_o_gerente_required
+def api_admin_invalidacion():
+    """API: Estado del bus de invalidación de cachés de este worker"""
+    return jsonify({'success': True, **estadisticas_invalidacion()})
+
+
+def _usuario_suscripciones(usuario_id):
+    """Usuario cuyas suscripciones se gestionan: el propio, u otro si es jefe TI o gerente"""
+    if usuario_id in (None, ''):
+        return session['user_id']
+    try:
+        usuario_id = int(usuario_id)
+    except (TypeError, ValueError):
+        return None
+    if usuario_id == session['user_id'] or session.get('rol') in ['jefe_ti', 'gerente']:
+        return usuario_id
+    return None
+
+
+@bp.route('/api/suscripciones', methods=['GET'])
+@login_required
+def api_suscripciones():
+    """API: Suscripciones a alertas de un usuario (por defecto el de la sesión)"""
+    usuario_id = _usuario_suscripciones(request.args.get('usuario_id', type=int))
+    if usuario_id is None:
+        return jsonify({'success': False, 'error': 'Sin permisos'}), 403
+    
+    suscripciones = Suscripcion.query.filter_by(usuario_id=usuario_id).order_by(
+        Suscripcion.ambito, Suscripcion.valor
+    ).all()
+    return jsonify({'success': True, 'suscripciones': [serializar_suscripcion(s) for s in suscripciones]})
+
+
+@bp.route('/api/suscripciones', methods=['POST'])
+@login_required
+def api_suscripcion_crear():
+    """API: Suscribir a un item, categoría, tipo o nivel de urgencia ({ambito, valor[, usuario_id]})"""
+    datos = request.get_json(silent=True) or request.form
+    usuario_id = _usuario_suscripciones(datos.get('usuario_id'))
+    if usuario_id is None:
+        return jsonify({'success': False, 'error': 'Sin permisos'}), 403
+    if db.session.get(Usuario, usuario_id) is None:
+        return jsonify({'success': False, 'error': 'Usuario no encontrado'}), 404
+    
+    try:
+        suscripcion = suscribir_usuario(usuario_id, datos.get('ambito'), datos.get('valor'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    return jsonify({'success': True, 'suscripcion': serializar_suscripcion(suscripcion)})
+
+
+@bp.route('/api/suscripciones/<int:suscripcion_id>', methods=['DELETE'])
+@login_required
+def api_suscripcion_eliminar(suscripcion_id):
+    """API: Cancelar una suscripción"""
+    suscripcion = Suscripcion.query.get_or_404(suscripcion_id)
+    if _usuario_suscripciones(suscripcion.usuario_id) is None:
+        return jsonify({'success': False, 'error': 'Sin permisos'}), 403
+    
+    db.session.delete(suscripcion)
+    db.session.commit()
+    return jsonify({'success': True})
+
+
+@bp.route('/metrics')
+def metrics_prometheus():
+    """Métricas de operación en formato Prometheus (Bearer METRICS_TOKEN si está configurado)"""
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return Response('No autorizado\n', status=401, mimetype='text/plain')
+    
+    cuerpo, content_type = exposicion_metricas()
+    return Response(cuerpo, content_type=content_type)
+
+
 @bp.route('/api/reportes/incidencias/<int:item_id>')
 @login_required
+@solo_lectura
 def api_reportes_incidencias(item_id):
     """API: Obtener incidencias de un item"""
     try:
@@ -3318,6 +3459,7 @@ def usuario_editar(id):
 # En routes.py
 
 @bp.route('/api/tecnicos-activos')
+@respuesta_condicional('usuario', 'persona')
 def api_tecnicos_activos():
     """API: Obtener técnicos con correo registrado"""
     if 'user_id' not in session:
@@ -1,8 +1,11 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from datetime import datetime
 import atexit
 
+from app.monitoreo import medir_tarea
+
 scheduler = None
 
 def iniciar_scheduler(app):
@@ -18,12 +21,14 @@ def iniciar_scheduler(app):
     
     # Función wrapper para ejecutar con contexto de Flask
     def ejecutar_con_contexto():
-        with app.app_context():
+        with app.app_context(), medir_tarea('generar_metricas_automaticas') as ejecucion:
             from app.scheduler_service import ejecutar_tareas_programadas
             print("=" * 60)
             print("🤖 INVENTECH - Ejecutando Tareas Programadas")
             print("=" * 60)
-            ejecutar_tareas_programadas()
+            resultado = ejecutar_tareas_programadas()
+            if resultado and not resultado.get('success'):
+                ejecucion['resultado'] = 'error'
             print("=" * 60)
     
     # Programar ejecución diaria a las 00:01
@@ -35,6 +40,36 @@ def iniciar_scheduler(app):
         replace_existing=True
     )
     
+    # Archivo de incidencias/alertas resueltas antiguas (lotes acotados) y particiones
+    def archivar_con_contexto():
+        with app.app_context(), medir_tarea('archivar_datos'):
+            from app.archivo_service import archivar_datos, asegurar_particiones
+            asegurar_particiones()
+            archivar_datos()
+    
+    scheduler.add_job(
+        func=archivar_con_contexto,
+        trigger=CronTrigger(hour=2, minute=30),
+        id='archivar_datos',
+        name='Archivar incidencias y alertas resueltas',
+        replace_existing=True
+    )
+    
+    # Correos de resumen de alertas (modo resumen)
+    if app.config.get('NOTIFICACIONES_MODO') == 'resumen':
+        def resumenes_con_contexto():
+            with app.app_context(), medir_tarea('resumen_notificaciones'):
+                from app.notificaciones_service import enviar_resumenes
+                enviar_resumenes()
+        
+        scheduler.add_job(
+            func=resumenes_con_contexto,
+            trigger=IntervalTrigger(minutes=app.config.get('NOTIFICACIONES_VENTANA_MINUTOS', 5)),
+            id='resumen_notificaciones',
+            name='Enviar resúmenes de alertas',
+            replace_existing=True
+        )
+    
     # Iniciar scheduler
     scheduler.start()
     
@@ -1,7 +1,9 @@
 from app import db
-from app.models import Item, Incidencia, Metrica, SLA
+from app.models import Item, Incidencia, Metrica, ItemEstado
 from datetime import datetime, timedelta
 from calendar import monthrange
+from app.metricas_service import calcular_semaforo
+from app.alertas_service import evaluar_alertas_periodo
 
 def generar_metricas_automaticas_mes_anterior():
     """
@@ -19,21 +21,15 @@ def generar_metricas_automaticas_mes_anterior():
     
     print(f"🔄 Generando métricas automáticas para {mes}/{anio}")
     
-    # Obtener items ACTIVOS y NO REEMPLAZADOS
-    items_reemplazados = db.session.query(Item.reemplaza_a_id).filter(
-        Item.reemplaza_a_id.isnot(None)
-    ).subquery()
-    
-    items = Item.query.filter(
-        Item.estado == 'aprobado',
-        Item.estado_operativo == 'activo',
-        ~Item.id.in_(items_reemplazados)
-    ).all()
+    # Obtener items ACTIVOS y NO REEMPLAZADOS con su límite de incidencias (item_estado)
+    items = db.session.query(Item, ItemEstado.limite_incidencias).join(
+        ItemEstado, ItemEstado.item_id == Item.id
+    ).filter(ItemEstado.vigente).all()
     
     metricas_generadas = 0
     metricas_omitidas = 0
     
-    for item in items:
+    for item, limite in items:
         try:
             # Verificar si ya existe métrica para este mes
             metrica_existe = Metrica.query.filter_by(
@@ -59,27 +55,8 @@ def generar_metricas_automaticas_mes_anterior():
                 Incidencia.fecha_incidencia <= ultimo_dia
             ).count()
             
-            # Obtener límite SLA
-            sla = SLA.query.filter_by(item_id=item.id).first()
-            
-            if item.tipo == 'producto' and sla:
-                limite = (sla.fallas_criticas_permitidas or 0) + (sla.fallas_menores_permitidas or 0)
-            else:
-                limite = 3
-            
-            # Calcular semáforo y porcentaje
-            if incidencias == 0:
-                semaforo = 'verde'
-                porcentaje = 100
-            elif incidencias <= limite:
-                semaforo = 'amarillo'
-                porcentaje = 100 - ((incidencias / limite) * 15)
-                porcentaje = round(porcentaje, 1)
-            else:
-                semaforo = 'rojo'
-                exceso = incidencias - limite
-                porcentaje = max(0, 85 - (exceso * 15))
-                porcentaje = round(porcentaje, 1)
+            # Calcular semáforo y porcentaje con el límite SLA precalculado
+            semaforo, porcentaje = calcular_semaforo(incidencias, limite)
             
             # Crear métrica
             metrica = Metrica(
@@ -104,14 +81,20 @@ def generar_metricas_automaticas_mes_anterior():
     # Guardar todas las métricas
     try:
         db.session.commit()
+        
+        # Reglas de alerta para todos los items del período en una sola evaluación
+        alertas = evaluar_alertas_periodo(anio, mes)
+        
         print(f"\n📊 RESUMEN:")
         print(f"   ✅ Generadas: {metricas_generadas}")
         print(f"   ⏭️  Omitidas: {metricas_omitidas}")
+        print(f"   🚨 Alertas: {len(alertas['generadas'])}")
         print(f"   📅 Período: {mes}/{anio}")
         return {
             'success': True,
             'generadas': metricas_generadas,
             'omitidas': metricas_omitidas,
+            'alertas_generadas': len(alertas['generadas']),
             'mes': mes,
             'anio': anio
         }
@@ -127,6 +110,7 @@ def generar_metricas_automaticas_mes_anterior():
 def ejecutar_tareas_programadas():
     """
     Ejecuta tareas programadas diarias
+    Devuelve el resultado de la generación de métricas (None si hoy no corresponde)
     """
     hoy = datetime.utcnow()
     
@@ -142,4 +126,7 @@ def ejecutar_tareas_programadas():
         else:
             print(f"❌ Error generando métricas: {resultado.get('error')}")
     else:
-        print(f"⏭️  Hoy es día {hoy.day} → No se generan métricas (solo día 1)")
\ No newline at end of file
+        print(f"⏭️  Hoy es día {hoy.day} → No se generan métricas (solo día 1)")
+        return None
+    
+    return resultado
\ No newline at end of file
@@ -0,0 +1,106 @@
+"""
+Suscripciones a alertas.
+
+Cada usuario se suscribe a los items, categorías, tipos de item ('producto',
+'servicio') o niveles de urgencia que atiende; una alerta se notifica a los
+suscritos a cualquiera de sus claves (item, categoría y tipo del item, nivel
+de la alerta). Los técnicos y jefes TI sin ninguna suscripción siguen
+recibiendo todas las alertas (SUSCRIPCIONES_TODAS_POR_DEFECTO).
+
+Los destinatarios de una alerta salen de una sola consulta que usa el índice
+(ambito, valor, usuario_id), y se guardan en la caché del worker hasta que
+cambie suscripcion, usuario o persona.
+"""
+from collections import namedtuple
+
+from flask import current_app
+from sqlalchemy import select, exists, and_, or_, tuple_
+
+from app import db
+from app.models import Suscripcion, Usuario, Persona, Item
+from app.invalidacion import CacheLocal
+
+AMBITOS = ('item', 'categoria', 'tipo', 'urgencia')
+TIPOS_ITEM = ('producto', 'servicio')
+URGENCIAS = ('critica', 'alta', 'media', 'baja')
+# Roles que reciben todas las alertas mientras no tengan suscripciones
+ROLES_POR_DEFECTO = ('tecnico', 'jefe_ti')
+
+Destinatario = namedtuple('Destinatario', 'usuario_id username nombres correo telefono')
+
+_cache = CacheLocal(['suscripcion', 'usuario', 'persona'], maximo=512)
+
+
+def claves_alerta(alerta, item):
+    """Pares (ambito, valor) a los que corresponde la alerta"""
+    claves = [('item', str(item.id)), ('tipo', item.tipo), ('urgencia', alerta.nivel_urgencia or 'media')]
+    if item.categoria:
+        claves.append(('categoria', item.categoria))
+    return tuple(claves)
+
+
+def _consultar_destinatarios(claves):
+    suscrito = exists().where(
+        Suscripcion.usuario_id == Usuario.id,
+        tuple_(Suscripcion.ambito, Suscripcion.valor).in_(claves)
+    )
+    condicion = suscrito
+    if current_app.config.get('SUSCRIPCIONES_TODAS_POR_DEFECTO', True):
+        sin_suscripciones = ~exists().where(Suscripcion.usuario_id == Usuario.id)
+        condicion = or_(suscrito, and_(Usuario.rol.in_(ROLES_POR_DEFECTO), sin_suscripciones))
+
+    filas = db.session.execute(
+        select(Usuario.id, Usuario.username, Persona.nombres, Persona.correo, Persona.telefono)
+        .select_from(Usuario).outerjoin(Persona, Persona.usuario_id == Usuario.id)
+        .where(condicion).order_by(Usuario.id)
+    ).all()
+    return tuple(Destinatario(*fila) for fila in filas)
+
+
+def destinatarios_alerta(alerta, item):
+    """Usuarios a notificar por la alerta (con sus datos de contacto)"""
+    claves = claves_alerta(alerta, item)
+    return _cache.obtener(claves, lambda: _consultar_destinatarios(claves))
+
+
+# ====================================
+# ALTA Y BAJA
+# ====================================
+
+def validar_suscripcion(ambito, valor):
+    """Normaliza el valor; lanza ValueError si la suscripción no es válida"""
+    valor = str(valor or '').strip()
+    if ambito not in AMBITOS:
+        raise ValueError(f"Ámbito inválido (use {', '.join(AMBITOS)})")
+    if not valor:
+        raise ValueError('Indique el valor de la suscripción')
+
+    if ambito == 'item':
+        if not valor.isdigit() or db.session.get(Item, int(valor)) is None:
+            raise ValueError('El item no existe')
+    elif ambito == 'tipo' and valor not in TIPOS_ITEM:
+        raise ValueError(f"Tipo inválido (use {', '.join(TIPOS_ITEM)})")
+    elif ambito == 'urgencia' and valor not in URGENCIAS:
+        raise ValueError(f"Nivel de urgencia inválido (use {', '.join(URGENCIAS)})")
+    return valor
+
+
+def suscribir_usuario(usuario_id, ambito, valor):
+    """Crea la suscripción (o devuelve la existente)"""
+    valor = validar_suscripcion(ambito, valor)
+    suscripcion = Suscripcion.query.filter_by(usuario_id=usuario_id, ambito=ambito, valor=valor).first()
+    if suscripcion is None:
+        suscripcion = Suscripcion(usuario_id=usuario_id, ambito=ambito, valor=valor)
+        db.session.add(suscripcion)
+        db.session.commit()
+    return suscripcion
+
+
+def serializar_suscripcion(suscripcion):
+    return {
+        'id': suscripcion.id,
+        'usuario_id': suscripcion.usuario_id,
+        'ambito': suscripcion.ambito,
+        'valor': suscripcion.valor,
+        'fecha_creacion': suscripcion.fecha_creacion.isoformat() if suscripcion.fecha_creacion else None,
+    }
@@ -0,0 +1,274 @@
+"""
+Historial de versiones con valores completos.
+
+Version guarda solo una vista previa (VISTA_PREVIA caracteres) para listados.
+El valor completo de cada campo vive en version_contenido como una cadena por
+(item, campo): un snapshot comprimido cada VERSIONES_SNAPSHOT_CADA cambios y,
+entre snapshots, deltas comprimidos contra el valor anterior. Así el espacio
+crece con el tamaño de cada cambio y cualquier valor pasado se reconstruye
+sin pérdida.
+"""
+import hashlib
+import json
+import zlib
+from difflib import SequenceMatcher
+
+from flask import current_app
+from sqlalchemy import func, select, update
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
+
+from app import db
+from app.models import Item, Version, VersionContenido
+
+VISTA_PREVIA = 500
+
+# Campos editables del item y su nombre en Version.campo_modificado
+CAMPOS_ITEM = {
+    'nombre': 'Nombre',
+    'categoria': 'Categoría',
+    'definicion': 'Definición',
+    'proposito': 'Propósito',
+    'estado_actual': 'Estado Actual',
+    'estado_objetivo': 'Estado Objetivo',
+    'beneficio': 'Beneficio Esperado',
+    'caso_uso': 'Caso de Uso',
+    'dependencias': 'Dependencias',
+    'estado_operativo': 'Estado Operativo'
+}
+
+# Campos del SLA que se editan según el tipo de item
+CAMPOS_SLA = {
+    'servicio': ['disponibilidad', 'velocidad_min', 'latencia_max', 'tiempo_respuesta',
+                 'tiempo_resolucion', 'capacidad_usuarios', 'horario'],
+    'producto': ['fallas_criticas_permitidas', 'fallas_menores_permitidas', 'disponibilidad_esperada',
+                 'tiempo_max_inactividad', 'vida_util', 'mantenimiento_preventivo', 'caracteristicas']
+}
+
+# Por encima de este tamaño (caracteres² del tramo central) no se busca
+# coincidencias dentro del tramo: se guarda completo como texto insertado
+MAX_COMPARACION = 4_000_000
+
+
+# ====================================
+# NUMERACIÓN
+# ====================================
+
+def reservar_numeros_version(item_id, cantidad=1):
+    """
+    Reserva `cantidad` números de versión consecutivos para el item y devuelve el primero.
+    Incrementa Item.ultima_version con un solo UPDATE en la transacción actual: la fila
+    del item queda bloqueada hasta el commit, así dos ediciones simultáneas no repiten número.
+    """
+    tabla = Item.__table__
+    stmt = update(tabla).where(tabla.c.id == item_id).values(
+        ultima_version=tabla.c.ultima_version + cantidad
+    )
+
+    if db.session.connection().dialect.update_returning:
+        ultima = db.session.execute(stmt.returning(tabla.c.ultima_version)).scalar()
+    else:
+        db.session.execute(stmt)
+        ultima = db.session.execute(select(tabla.c.ultima_version).where(tabla.c.id == item_id)).scalar()
+
+    if ultima is None:
+        raise ValueError(f'Item {item_id} no existe')
+
+    # Mantener sincronizado el objeto Item cargado en la sesión (sin marcarlo como modificado)
+    item = db.session.identity_map.get(identity_key(Item, item_id))
+    if item is not None:
+        set_committed_value(item, 'ultima_version', ultima)
+
+    return ultima - cantidad + 1
+
+
+# ====================================
+# CODIFICACIÓN
+# ====================================
+
+def _huella(valor):
+    return hashlib.sha1(valor.encode('utf-8')).hexdigest()
+
+
+def _comprimir(datos):
+    return zlib.compress(datos.encode('utf-8'), 9)
+
+
+def _descomprimir(contenido):
+    return zlib.decompress(contenido).decode('utf-8')
+
+
+def codificar_delta(anterior, nuevo):
+    """
+    Delta de `anterior` a `nuevo` como lista de operaciones:
+    [inicio, fin] copia un tramo de `anterior`; un texto se inserta tal cual.
+    """
+    # Prefijo y sufijo comunes (la mayoría de ediciones son locales)
+    limite = min(len(anterior), len(nuevo))
+    prefijo = 0
+    while prefijo < limite and anterior[prefijo] == nuevo[prefijo]:
+        prefijo += 1
+    sufijo = 0
+    while sufijo < limite - prefijo and anterior[-1 - sufijo] == nuevo[-1 - sufijo]:
+        sufijo += 1
+
+    medio_anterior = anterior[prefijo:len(anterior) - sufijo]
+    medio_nuevo = nuevo[prefijo:len(nuevo) - sufijo]
+
+    operaciones = []
+    if prefijo:
+        operaciones.append([0, prefijo])
+
+    if len(medio_anterior) * len(medio_nuevo) <= MAX_COMPARACION:
+        comparador = SequenceMatcher(None, medio_anterior, medio_nuevo, autojunk=False)
+        for etiqueta, i1, i2, j1, j2 in comparador.get_opcodes():
+            if etiqueta == 'equal':
+                operaciones.append([prefijo + i1, prefijo + i2])
+            elif j2 > j1:
+                operaciones.append(medio_nuevo[j1:j2])
+    elif medio_nuevo:
+        operaciones.append(medio_nuevo)
+
+    if sufijo:
+        operaciones.append([len(anterior) - sufijo, len(anterior)])
+
+    return operaciones
+
+
+def aplicar_delta(anterior, operaciones):
+    return ''.join(
+        anterior[op[0]:op[1]] if isinstance(op, list) else op
+        for op in operaciones
+    )
+
+
+# ====================================
+# ESCRITURA
+# ====================================
+
+def _agregar_entrada(version, item_id, campo, rol, valor, previa=None, valor_previo=None):
+    """Agrega una fila a la cadena: delta contra `previa` o snapshot"""
+    snapshot_cada = current_app.config.get('VERSIONES_SNAPSHOT_CADA', 20)
+    completo = _comprimir(valor)
+
+    entrada = VersionContenido(
+        version=version,
+        item_id=item_id,
+        campo=campo,
+        rol=rol,
+        es_snapshot=True,
+        profundidad=0,
+        contenido=completo,
+        huella=_huella(valor),
+        longitud=len(valor)
+    )
+
+    if previa is not None and previa.profundidad + 1 < snapshot_cada:
+        delta = _comprimir(json.dumps(codificar_delta(valor_previo, valor), ensure_ascii=False, separators=(',', ':')))
+        if len(delta) < len(completo):
+            entrada.es_snapshot = False
+            entrada.profundidad = previa.profundidad + 1
+            entrada.contenido = delta
+
+    db.session.add(entrada)
+    return entrada
+
+
+def registrar_version(item_id, numero_version, campo_modificado, anterior, nuevo,
+                      razon_cambio, usuario_id, campo=None):
+    """
+    Crea una Version con vista previa y guarda los valores completos en la
+    cadena del campo (`campo`, por defecto campo_modificado). No hace commit.
+    """
+    campo = campo or campo_modificado
+    anterior = anterior or ''
+    nuevo = nuevo or ''
+
+    version = Version(
+        item_id=item_id,
+        numero_version=numero_version,
+        campo_modificado=campo_modificado,
+        valor_anterior=anterior[:VISTA_PREVIA],
+        valor_nuevo=nuevo[:VISTA_PREVIA],
+        razon_cambio=razon_cambio,
+        usuario_id=usuario_id
+    )
+    db.session.add(version)
+
+    ultima = VersionContenido.query.filter_by(
+        item_id=item_id, campo=campo
+    ).order_by(VersionContenido.id.desc()).first()
+
+    # La cadena empieza (o se reinicia) si el valor actual no es el último registrado,
+    # p. ej. la primera edición del campo o un cambio hecho fuera del historial
+    if ultima is None or ultima.huella != _huella(anterior):
+        ultima = _agregar_entrada(version, item_id, campo, 'anterior', anterior)
+
+    _agregar_entrada(version, item_id, campo, 'nuevo', nuevo, previa=ultima, valor_previo=anterior)
+    return version
+
+
+# ====================================
+# LECTURA
+# ====================================
+
+def valores_versiones(versiones):
+    """
+    Valores completos de varias versiones: {version_id: {campo, anterior, nuevo, completo}}.
+    Cada cadena se reconstruye una sola vez desde el snapshot más cercano.
+    """
+    resultado = {
+        v.id: {'campo': None, 'anterior': v.valor_anterior or '', 'nuevo': v.valor_nuevo or '', 'completo': False}
+        for v in versiones
+    }
+    if not resultado:
+        return resultado
+
+    entradas = db.session.query(
+        VersionContenido.id, VersionContenido.version_id, VersionContenido.item_id, VersionContenido.campo
+    ).filter(
+        VersionContenido.version_id.in_(list(resultado)),
+        VersionContenido.rol == 'nuevo'
+    ).all()
+
+    cadenas = {}
+    for entrada in entradas:
+        cadenas.setdefault((entrada.item_id, entrada.campo), {})[entrada.id] = entrada.version_id
+
+    for (item_id, campo), por_entrada in cadenas.items():
+        cadena = (VersionContenido.item_id == item_id) & (VersionContenido.campo == campo)
+        primera, ultima = min(por_entrada), max(por_entrada)
+
+        # El snapshot anterior a la primera entrada cubre también su valor previo
+        desde_id = db.session.query(func.max(VersionContenido.id)).filter(
+            cadena, VersionContenido.es_snapshot.is_(True), VersionContenido.id < primera
+        ).scalar() or primera
+
+        filas = db.session.query(
+            VersionContenido.id, VersionContenido.es_snapshot, VersionContenido.contenido
+        ).filter(
+            cadena, VersionContenido.id >= desde_id, VersionContenido.id <= ultima
+        ).order_by(VersionContenido.id).all()
+
+        valor = ''
+        for fila in filas:
+            previo = valor
+            if fila.es_snapshot:
+                valor = _descomprimir(fila.contenido)
+            else:
+                valor = aplicar_delta(valor, json.loads(_descomprimir(fila.contenido)))
+
+            version_id = por_entrada.get(fila.id)
+            if version_id is not None:
+                resultado[version_id] = {'campo': campo, 'anterior': previo, 'nuevo': valor, 'completo': True}
+
+    return resultado
+
+
+def valores_version(version):
+    """
+    Devuelve (valor_anterior, valor_nuevo, completo) de una versión.
+    Las versiones anteriores al historial completo devuelven la vista previa guardada.
+    """
+    valores = valores_versiones([version])[version.id]
+    return valores['anterior'], valores['nuevo'], valores['completo']
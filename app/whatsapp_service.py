@@ -0,0 +1,251 @@
+"""
+Canal WhatsApp Business (Cloud API) para alertas críticas.
+
+- Pool de conexiones HTTP keep-alive por worker (http.client), hasta
+  WHATSAPP_MAX_CONEXIONES envíos simultáneos.
+- Envío en lote concurrente y en segundo plano: enviar_lote devuelve los
+  futures sin bloquear la solicitud.
+- Límite de tasa (token bucket) de WHATSAPP_MENSAJES_POR_SEGUNDO por worker.
+- Reintentos con espera exponencial ante errores de conexión, 429 y 5xx
+  (respetando Retry-After); los demás 4xx no se reintentan.
+
+Para probar sin la API real: WHATSAPP_API_URL=http://127.0.0.1:8090/v21.0 con
+benchmarks/whatsapp_stub.py.
+"""
+import http.client
+import json
+import queue
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from flask import current_app
+
+from app.monitoreo import registrar_notificacion
+
+_REINTENTABLES = {429, 500, 502, 503, 504}
+
+
+class PoolConexiones:
+    """Conexiones keep-alive reutilizables hacia un mismo host"""
+
+    def __init__(self, url_base, tamano, timeout):
+        partes = urlsplit(url_base)
+        self._clase = http.client.HTTPSConnection if partes.scheme == 'https' else http.client.HTTPConnection
+        self._host = partes.hostname
+        self._puerto = partes.port
+        self._timeout = timeout
+        self._libres = queue.LifoQueue(maxsize=tamano)
+
+    def obtener(self):
+        try:
+            return self._libres.get_nowait()
+        except queue.Empty:
+            return self._clase(self._host, self._puerto, timeout=self._timeout)
+
+    def devolver(self, conexion):
+        try:
+            self._libres.put_nowait(conexion)
+        except queue.Full:
+            conexion.close()
+
+    def cerrar(self):
+        while True:
+            try:
+                self._libres.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class LimiteTasa:
+    """Token bucket: como máximo `por_segundo` mensajes por segundo (ráfaga de 1 s)"""
+
+    def __init__(self, por_segundo):
+        self._tasa = por_segundo
+        self._capacidad = max(1.0, por_segundo)
+        self._tokens = self._capacidad
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def esperar(self):
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                self._tokens = min(self._capacidad, self._tokens + (ahora - self._ultimo) * self._tasa)
+                self._ultimo = ahora
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                faltante = (1 - self._tokens) / self._tasa
+            time.sleep(faltante)
+
+
+class ClienteWhatsApp:
+    def __init__(self, api_url, phone_number_id, token, max_conexiones=4,
+                 mensajes_por_segundo=20, reintentos=3, timeout=10):
+        self._ruta = f"{urlsplit(api_url).path.rstrip('/')}/{phone_number_id}/messages"
+        self._headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
+        self._pool = PoolConexiones(api_url, max_conexiones, timeout)
+        self._limite = LimiteTasa(mensajes_por_segundo)
+        self._reintentos = reintentos
+        self._ejecutor = ThreadPoolExecutor(max_workers=max_conexiones, thread_name_prefix='whatsapp')
+
+    def _post(self, cuerpo):
+        conexion = self._pool.obtener()
+        try:
+            conexion.request('POST', self._ruta, body=cuerpo, headers=self._headers)
+            respuesta = conexion.getresponse()
+            datos = respuesta.read()
+        except (OSError, http.client.HTTPException):
+            conexion.close()
+            raise
+        if respuesta.getheader('Connection', '').lower() == 'close':
+            conexion.close()
+        else:
+            self._pool.devolver(conexion)
+        return respuesta.status, respuesta.getheader('Retry-After'), datos
+
+    def enviar(self, mensaje, tipo='alerta_critica'):
+        """Envía un mensaje (payload de la API) con reintentos. Devuelve (exito, detalle)."""
+        cuerpo = json.dumps(mensaje)
+        detalle = None
+        espera = None
+
+        for intento in range(self._reintentos + 1):
+            if intento:
+                # Retry-After si la API lo indicó; si no, espera exponencial con jitter
+                time.sleep(espera if espera is not None
+                           else min(30.0, 0.5 * 2 ** (intento - 1)) * random.uniform(0.8, 1.2))
+                espera = None
+
+            self._limite.esperar()
+            try:
+                estado, retry_after, datos = self._post(cuerpo)
+            except (OSError, http.client.HTTPException) as e:
+                detalle = str(e)
+                continue
+
+            if 200 <= estado < 300:
+                registrar_notificacion('whatsapp', tipo, True)
+                return True, json.loads(datos or b'{}')
+
+            detalle = f'HTTP {estado}: {datos[:200].decode("utf-8", "ignore")}'
+            if estado not in _REINTENTABLES:
+                break
+            if retry_after and retry_after.isdigit():
+                espera = min(30, int(retry_after))
+
+        registrar_notificacion('whatsapp', tipo, False)
+        print(f"❌ WhatsApp a {mensaje.get('to')}: {detalle}")
+        return False, detalle
+
+    def enviar_lote(self, mensajes, tipo='alerta_critica'):
+        """Encola los mensajes para envío concurrente; devuelve la lista de futures"""
+        return [self._ejecutor.submit(self.enviar, mensaje, tipo) for mensaje in mensajes]
+
+    def cerrar(self):
+        self._ejecutor.shutdown(wait=True)
+        self._pool.cerrar()
+
+
+# ====================================
+# CLIENTE POR WORKER
+# ====================================
+
+_cliente = None
+_lock_cliente = threading.Lock()
+
+
+def whatsapp_configurado(app=None):
+    config = (app or current_app).config
+    return bool(config.get('WHATSAPP_PHONE_NUMBER_ID') and config.get('WHATSAPP_ACCESS_TOKEN'))
+
+
+def obtener_cliente(app=None):
+    """Cliente compartido por los hilos del worker (se crea en el primer envío)"""
+    global _cliente
+    if _cliente is None:
+        config = (app or current_app).config
+        with _lock_cliente:
+            if _cliente is None:
+                _cliente = ClienteWhatsApp(
+                    config['WHATSAPP_API_URL'],
+                    config['WHATSAPP_PHONE_NUMBER_ID'],
+                    config['WHATSAPP_ACCESS_TOKEN'],
+                    max_conexiones=config.get('WHATSAPP_MAX_CONEXIONES', 4),
+                    mensajes_por_segundo=config.get('WHATSAPP_MENSAJES_POR_SEGUNDO', 20),
+                    reintentos=config.get('WHATSAPP_REINTENTOS', 3),
+                    timeout=config.get('WHATSAPP_TIMEOUT', 10),
+                )
+    return _cliente
+
+
+# ====================================
+# ALERTAS
+# ====================================
+
+def normalizar_telefono(numero, codigo_pais='51'):
+    """'987 654 321' -> '51987654321' (None si no parece un número válido)"""
+    digitos = re.sub(r'\D', '', numero or '')
+    if len(digitos) < 8:
+        return None
+    if len(digitos) <= 9:
+        digitos = codigo_pais + digitos
+    return digitos
+
+
+def mensaje_alerta(alerta, item, telefono):
+    """Payload de la API: plantilla WHATSAPP_PLANTILLA o texto"""
+    config = current_app.config
+    plantilla = config.get('WHATSAPP_PLANTILLA')
+
+    if plantilla:
+        return {
+            'messaging_product': 'whatsapp',
+            'to': telefono,
+            'type': 'template',
+            'template': {
+                'name': plantilla,
+                'language': {'code': config.get('WHATSAPP_IDIOMA', 'es')},
+                'components': [{
+                    'type': 'body',
+                    'parameters': [
+                        {'type': 'text', 'text': item.codigo},
+                        {'type': 'text', 'text': item.nombre},
+                        {'type': 'text', 'text': alerta.mensaje[:900]},
+                    ]
+                }]
+            }
+        }
+
+    return {
+        'messaging_product': 'whatsapp',
+        'to': telefono,
+        'type': 'text',
+        'text': {
+            'body': f"🚨 INVENTECH - ALERTA {(alerta.nivel_urgencia or '').upper()}\n"
+                    f"{item.codigo} - {item.nombre}\n\n{alerta.mensaje[:3500]}"
+        }
+    }
+
+
+def enviar_alerta_whatsapp(alerta, item, telefonos):
+    """
+    Envía la alerta por WhatsApp a los teléfonos indicados (en segundo plano).
+    Devuelve los futures del lote ([] si el canal no está configurado).
+    """
+    if not whatsapp_configurado():
+        return []
+
+    codigo_pais = current_app.config.get('WHATSAPP_CODIGO_PAIS', '51')
+    destinos = [t for t in dict.fromkeys(normalizar_telefono(t, codigo_pais) for t in telefonos) if t]
+    if not destinos:
+        print("⚠️ No hay destinatarios con teléfono para WhatsApp")
+        return []
+
+    futuros = obtener_cliente().enviar_lote([mensaje_alerta(alerta, item, t) for t in destinos])
+    print(f"📱 Alerta {alerta.id} enviada por WhatsApp a {len(destinos)} destinatario(s) (en cola)")
+    return futuros
@@ -0,0 +1,414 @@
+"""
+Prueba de carga con escenarios reales de INVENTECH contra una instancia local.
+
+Escenarios (usuarios virtuales, cada uno con su propia sesión):
+- tecnico: login, dashboard, consulta de alertas nuevas (polling), registro
+  de incidencias y resolución con imagen de prueba
+- gerente: login, dashboard, aprobaciones pendientes y decisión
+
+Los usuarios se inician de forma escalonada durante --rampa segundos y
+trabajan hasta completar --duracion. Al final se informa por paso: solicitudes,
+errores, throughput y percentiles de latencia.
+
+Uso:
+    # 1. Datos de prueba en la base de la instancia (usa DATABASE_URL)
+    python benchmarks/carga.py sembrar --tecnicos 50 --items 100 --aprobaciones 300
+
+    # 2. Levantar la instancia (p. ej. gunicorn run:app -c gunicorn.conf.py)
+    # 3. Generar carga
+    python benchmarks/carga.py ejecutar --url http://127.0.0.1:8000 \\
+        --usuarios 40 --rampa 20 --duracion 120 --mezcla tecnico=8,gerente=1
+
+Solo usa la biblioteca estándar (http.client). Las resoluciones guardan
+imágenes en app/static/resoluciones de la instancia.
+"""
+import argparse
+import base64
+import http.client
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import threading
+import time
+import uuid
+from http.cookies import SimpleCookie
+from urllib.parse import urlsplit, urlencode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CLAVE = 'carga'
+PREFIJO_TECNICO = 'carga_tecnico'
+USUARIO_GERENTE = 'carga_gerente'
+
+# PNG de 1x1 px (imagen de prueba de la resolución)
+IMAGEN_PRUEBA = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=='
+)
+
+_RE_RESOLVER = re.compile(r'abrirModalResolver\((\d+)')
+_RE_APROBACION = re.compile(r'/aprobacion/(\d+)')
+
+
+# ====================================
+# SEMBRAR DATOS DE PRUEBA
+# ====================================
+
+def sembrar(tecnicos, items, aprobaciones):
+    from app import create_app, db
+    from app.models import Usuario, Persona, Item, SLA, Aprobacion
+    from app.codigos_service import asignar_codigo, inicializar_secuencias
+
+    app = create_app(crear_tablas=True, iniciar_tareas=False)
+    with app.app_context():
+        inicializar_secuencias()
+
+        def usuario(username, rol):
+            existente = Usuario.query.filter_by(username=username).first()
+            if existente:
+                return existente
+            nuevo = Usuario(username=username, rol=rol)
+            nuevo.set_password(CLAVE)
+            db.session.add(nuevo)
+            db.session.flush()
+            # Sin correo: la carga no debe enviar emails
+            db.session.add(Persona(usuario_id=nuevo.id, nombres=username, apellidos='Carga'))
+            return nuevo
+
+        gerente = usuario(USUARIO_GERENTE, 'gerente')
+        for n in range(1, tecnicos + 1):
+            usuario(f'{PREFIJO_TECNICO}{n:03d}', 'tecnico')
+
+        for n in range(items):
+            tipo = 'producto' if n % 2 == 0 else 'servicio'
+            item = Item(codigo=asignar_codigo(tipo), nombre=f'Carga {tipo} {n + 1}', tipo=tipo,
+                        categoria='Carga', estado='aprobado', creado_por=gerente.id)
+            db.session.add(item)
+            db.session.flush()
+            db.session.add(SLA(item_id=item.id, disponibilidad=99.0, tiempo_resolucion=240,
+                               fallas_criticas_permitidas=5, fallas_menores_permitidas=10))
+
+        for n in range(aprobaciones):
+            item = Item(codigo=asignar_codigo('producto'), nombre=f'Carga pendiente {n + 1}', tipo='producto',
+                        categoria='Carga', estado='pendiente', creado_por=gerente.id)
+            db.session.add(item)
+            db.session.flush()
+            db.session.add(Aprobacion(item_id=item.id, aprobador_id=gerente.id, estado='pendiente'))
+
+        db.session.commit()
+
+    print(f"✅ Sembrado: {tecnicos} técnico(s), {items} item(s) aprobados, "
+          f"{aprobaciones} aprobación(es) pendientes para {USUARIO_GERENTE} (clave '{CLAVE}')")
+
+
+# ====================================
+# CLIENTE HTTP (UNA SESIÓN POR USUARIO VIRTUAL)
+# ====================================
+
+class Cliente:
+    def __init__(self, url, estadisticas, timeout):
+        partes = urlsplit(url)
+        clase = http.client.HTTPSConnection if partes.scheme == 'https' else http.client.HTTPConnection
+        self.conexion = clase(partes.hostname, partes.port, timeout=timeout)
+        self.cookies = {}
+        self.estadisticas = estadisticas
+
+    def solicitud(self, paso, metodo, ruta, cuerpo=None, headers=None, esperado=(200,)):
+        """Ejecuta y mide un paso. Devuelve (estado, cuerpo) o (None, b'') si falló la conexión."""
+        headers = dict(headers or {})
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+
+        inicio = time.perf_counter()
+        try:
+            self.conexion.request(metodo, ruta, body=cuerpo, headers=headers)
+            respuesta = self.conexion.getresponse()
+            datos = respuesta.read()
+        except (OSError, http.client.HTTPException):
+            self.conexion.close()
+            self.estadisticas.registrar(paso, time.perf_counter() - inicio, False)
+            return None, b''
+
+        for valor in respuesta.headers.get_all('Set-Cookie') or []:
+            for nombre, morsel in SimpleCookie(valor).items():
+                self.cookies[nombre] = morsel.value
+        if respuesta.getheader('Connection', '').lower() == 'close':
+            self.conexion.close()
+
+        self.estadisticas.registrar(paso, time.perf_counter() - inicio, respuesta.status in esperado)
+        return respuesta.status, datos
+
+    def get(self, paso, ruta, esperado=(200,)):
+        return self.solicitud(paso, 'GET', ruta, esperado=esperado)
+
+    def post_form(self, paso, ruta, campos, esperado=(200, 302)):
+        return self.solicitud(paso, 'POST', ruta, urlencode(campos, doseq=True),
+                              {'Content-Type': 'application/x-www-form-urlencoded'}, esperado)
+
+    def post_json(self, paso, ruta, datos, esperado=(200,)):
+        return self.solicitud(paso, 'POST', ruta, json.dumps(datos),
+                              {'Content-Type': 'application/json'}, esperado)
+
+    def post_multipart(self, paso, ruta, campos, archivos, esperado=(200,)):
+        limite = uuid.uuid4().hex
+        partes = []
+        for nombre, valor in campos.items():
+            partes.append(f'--{limite}\r\nContent-Disposition: form-data; name="{nombre}"\r\n\r\n{valor}\r\n'.encode())
+        for nombre, (archivo, contenido, tipo) in archivos.items():
+            partes.append(f'--{limite}\r\nContent-Disposition: form-data; name="{nombre}"; filename="{archivo}"\r\n'
+                          f'Content-Type: {tipo}\r\n\r\n'.encode() + contenido + b'\r\n')
+        partes.append(f'--{limite}--\r\n'.encode())
+        return self.solicitud(paso, 'POST', ruta, b''.join(partes),
+                              {'Content-Type': f'multipart/form-data; boundary={limite}'}, esperado)
+
+    def login(self, usuario):
+        estado, _ = self.solicitud('login', 'POST', '/login', urlencode({'username': usuario, 'password': CLAVE}),
+                                   {'Content-Type': 'application/x-www-form-urlencoded'}, esperado=(302,))
+        return estado == 302
+
+    def cerrar(self):
+        self.conexion.close()
+
+
+# ====================================
+# ESTADÍSTICAS
+# ====================================
+
+class Estadisticas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencias = {}
+        self.errores = {}
+        self.activos = 0
+
+    def registrar(self, paso, segundos, exito):
+        with self._lock:
+            self.latencias.setdefault(paso, []).append(segundos)
+            if not exito:
+                self.errores[paso] = self.errores.get(paso, 0) + 1
+
+    def totales(self):
+        with self._lock:
+            return sum(len(v) for v in self.latencias.values()), sum(self.errores.values())
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+
+def informe(estadisticas, segundos):
+    print()
+    print(f"{'Paso':<24}{'Solic.':>8}{'Err.':>7}{'Err.%':>7}{'req/s':>8}"
+          f"{'p50':>8}{'p90':>8}{'p95':>8}{'p99':>8}{'máx':>8}  (ms)")
+    print('-' * 104)
+    resumen = {}
+    for paso in sorted(estadisticas.latencias):
+        valores = [v * 1000 for v in estadisticas.latencias[paso]]
+        errores = estadisticas.errores.get(paso, 0)
+        fila = {
+            'solicitudes': len(valores),
+            'errores': errores,
+            'rps': len(valores) / segundos,
+            'p50': statistics.median(valores),
+            'p90': percentil(valores, 90),
+            'p95': percentil(valores, 95),
+            'p99': percentil(valores, 99),
+            'max': max(valores),
+        }
+        resumen[paso] = fila
+        print(f"{paso:<24}{fila['solicitudes']:>8}{errores:>7}{errores / len(valores) * 100:>6.1f}%"
+              f"{fila['rps']:>8.1f}{fila['p50']:>8.0f}{fila['p90']:>8.0f}{fila['p95']:>8.0f}"
+              f"{fila['p99']:>8.0f}{fila['max']:>8.0f}")
+
+    total, errores = estadisticas.totales()
+    print('-' * 104)
+    print(f"{'TOTAL':<24}{total:>8}{errores:>7}{(errores / total * 100 if total else 0):>6.1f}%{total / segundos:>8.1f}")
+    return resumen
+
+
+# ====================================
+# ESCENARIOS
+# ====================================
+
+def _pausa(segundos):
+    if segundos:
+        time.sleep(random.uniform(0.5, 1.5) * segundos)
+
+
+def escenario_tecnico(cliente, usuario, fin, pausa):
+    if not cliente.login(usuario):
+        return
+    cliente.get('dashboard', '/dashboard')
+
+    estado, datos = cliente.get('items_activos', '/api/items-activos')
+    items = [item['id'] for item in json.loads(datos)['items']] if estado == 200 else []
+    if not items:
+        return
+
+    while time.monotonic() < fin:
+        cliente.get('alertas_nuevas', '/api/alertas/nuevas')
+        _pausa(pausa)
+
+        cliente.post_form('registrar_incidencia', '/incidencias/registrar', {
+            'item_id': random.choice(items),
+            'titulo': f'Incidencia de carga {uuid.uuid4().hex[:8]}',
+            'descripcion': 'Generada por benchmarks/carga.py',
+            'tipo': random.choice(['critica', 'mayor', 'menor']),
+            'severidad': random.choice(['alta', 'media', 'baja']),
+            'usuarios_afectados': random.randint(1, 50),
+        }, esperado=(302,))
+        _pausa(pausa)
+
+        estado, datos = cliente.get('incidencias_abiertas', '/incidencias?estado=abierta')
+        abiertas = _RE_RESOLVER.findall(datos.decode('utf-8', 'ignore')) if estado == 200 else []
+        if abiertas:
+            cliente.post_multipart(
+                'resolver_incidencia', f'/incidencias/{random.choice(abiertas)}/resolver',
+                {'comentario_resolucion': 'Resuelta durante la prueba de carga'},
+                {'imagen_prueba': ('prueba.png', IMAGEN_PRUEBA, 'image/png')}
+            )
+        _pausa(pausa)
+
+        cliente.get('dashboard', '/dashboard')
+        _pausa(pausa)
+
+
+def escenario_gerente(cliente, usuario, fin, pausa):
+    if not cliente.login(usuario):
+        return
+    cliente.get('dashboard', '/dashboard')
+
+    while time.monotonic() < fin:
+        cliente.get('alertas_nuevas', '/api/alertas/nuevas')
+
+        estado, datos = cliente.get('aprobaciones', '/aprobaciones')
+        pendientes = sorted(set(_RE_APROBACION.findall(datos.decode('utf-8', 'ignore')))) if estado == 200 else []
+        _pausa(pausa)
+
+        if pendientes:
+            cliente.post_json('decidir_aprobacion', f'/aprobacion/{random.choice(pendientes)}/decidir', {
+                'decision': random.choice(['aprobar', 'aprobar', 'rechazar']),
+                'comentarios': 'Prueba de carga'
+            })
+        _pausa(pausa)
+
+
+ESCENARIOS = {'tecnico': escenario_tecnico, 'gerente': escenario_gerente}
+
+
+def _leer_mezcla(texto):
+    mezcla = {}
+    for parte in texto.split(','):
+        nombre, _, peso = parte.partition('=')
+        if nombre.strip() not in ESCENARIOS:
+            raise SystemExit(f"❌ Escenario desconocido: {nombre}")
+        mezcla[nombre.strip()] = int(peso or 1)
+    return mezcla
+
+
+def _asignar_escenarios(usuarios, mezcla):
+    """Reparte los usuarios virtuales según los pesos (al menos uno por escenario)"""
+    total = sum(mezcla.values())
+    asignados = []
+    for nombre, peso in mezcla.items():
+        asignados += [nombre] * max(1, round(usuarios * peso / total))
+    return asignados[:usuarios] if len(asignados) > usuarios else asignados
+
+
+# ====================================
+# EJECUCIÓN
+# ====================================
+
+def ejecutar(url, usuarios, rampa, duracion, mezcla, pausa, timeout, salida_json, tecnicos):
+    estadisticas = Estadisticas()
+    escenarios = _asignar_escenarios(usuarios, mezcla)
+    inicio = time.monotonic()
+    fin = inicio + duracion
+
+    def usuario_virtual(indice, escenario):
+        nombre = USUARIO_GERENTE if escenario == 'gerente' else f'{PREFIJO_TECNICO}{indice % tecnicos + 1:03d}'
+        cliente = Cliente(url, estadisticas, timeout)
+        with estadisticas._lock:
+            estadisticas.activos += 1
+        try:
+            ESCENARIOS[escenario](cliente, nombre, fin, pausa)
+        except Exception as e:
+            print(f"❌ Usuario {nombre}: {e}")
+        finally:
+            cliente.cerrar()
+            with estadisticas._lock:
+                estadisticas.activos -= 1
+
+    print(f"🚀 {len(escenarios)} usuario(s) virtuales contra {url} · rampa {rampa}s · duración {duracion}s")
+    print(f"   Mezcla: " + ', '.join(f"{n}={escenarios.count(n)}" for n in mezcla))
+
+    hilos = []
+    for indice, escenario in enumerate(escenarios):
+        hilo = threading.Thread(target=usuario_virtual, args=(indice, escenario), daemon=True)
+        hilos.append(hilo)
+
+    # Arranque escalonado de los usuarios + progreso cada 5 s
+    siguiente_reporte = inicio + 5
+    anterior = 0
+    for indice, hilo in enumerate(hilos):
+        objetivo = inicio + (rampa * indice / len(hilos) if hilos else 0)
+        while time.monotonic() < objetivo:
+            time.sleep(0.05)
+        hilo.start()
+
+    while any(h.is_alive() for h in hilos):
+        time.sleep(0.2)
+        if time.monotonic() >= siguiente_reporte:
+            total, errores = estadisticas.totales()
+            print(f"   [{time.monotonic() - inicio:5.0f}s] usuarios {estadisticas.activos:>3} · "
+                  f"{(total - anterior) / 5:6.1f} req/s · {total} solicitudes · {errores} errores")
+            anterior = total
+            siguiente_reporte += 5
+
+    segundos = time.monotonic() - inicio
+    resumen = informe(estadisticas, segundos)
+
+    if salida_json:
+        with open(salida_json, 'w') as archivo:
+            json.dump({'url': url, 'usuarios': len(escenarios), 'rampa': rampa, 'duracion': duracion,
+                       'segundos': segundos, 'pasos': resumen}, archivo, indent=2)
+        print(f"\n💾 Resultados guardados en {salida_json}")
+
+    total, errores = estadisticas.totales()
+    return 1 if total == 0 or errores / total > 0.05 else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    p_sembrar = comandos.add_parser('sembrar', help='Crea usuarios, items y aprobaciones de prueba')
+    p_sembrar.add_argument('--tecnicos', type=int, default=50)
+    p_sembrar.add_argument('--items', type=int, default=100)
+    p_sembrar.add_argument('--aprobaciones', type=int, default=300)
+
+    p_ejecutar = comandos.add_parser('ejecutar', help='Genera carga contra una instancia')
+    p_ejecutar.add_argument('--url', default='http://127.0.0.1:8000')
+    p_ejecutar.add_argument('--usuarios', type=int, default=20)
+    p_ejecutar.add_argument('--rampa', type=float, default=10, help='Segundos para iniciar todos los usuarios')
+    p_ejecutar.add_argument('--duracion', type=float, default=60, help='Segundos totales de la prueba')
+    p_ejecutar.add_argument('--mezcla', default='tecnico=8,gerente=1', help='Pesos por escenario')
+    p_ejecutar.add_argument('--pausa', type=float, default=1.0, help='Tiempo de reflexión medio entre pasos (s)')
+    p_ejecutar.add_argument('--timeout', type=float, default=30)
+    p_ejecutar.add_argument('--tecnicos', type=int, default=50, help='Técnicos sembrados (se reparten entre los usuarios)')
+    p_ejecutar.add_argument('--json', dest='salida_json', default=None, help='Guardar resultados en un archivo JSON')
+
+    args = parser.parse_args()
+    if args.comando == 'sembrar':
+        sembrar(args.tecnicos, args.items, args.aprobaciones)
+        return 0
+    return ejecutar(args.url, args.usuarios, args.rampa, args.duracion, _leer_mezcla(args.mezcla),
+                    args.pausa, args.timeout, args.salida_json, args.tecnicos)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Mide el costo por mensaje de los correos de notificación:
+- render de la plantilla compilada (caché) frente a compilarla en cada envío
+- generación de la parte de texto plano
+- alerta para N destinatarios: un render por destinatario frente a un render
+  compartido (copia oculta)
+
+Uso:
+    python benchmarks/render_correos.py [--destinatarios 50] [--repeticiones 500]
+
+No envía correos ni toca portafolio.db.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TMP = tempfile.mkdtemp(prefix='inventech-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(TMP, 'bench.db')}"
+
+from app import create_app  # noqa: E402
+from app.email_service import renderizar_correo, texto_plano, _mensajes_compartidos  # noqa: E402
+
+
+def datos():
+    item = SimpleNamespace(codigo='PROD-001', nombre='Servidor de expedientes', tipo='producto', categoria='Hardware')
+    alerta = SimpleNamespace(
+        nivel_urgencia='critica', tipo='incidencias_excedidas', incidencias_pendientes=3,
+        mensaje='El item superó el límite de incidencias permitidas por el SLA este mes.',
+        fecha_creacion=datetime.now()
+    )
+    incidencia = SimpleNamespace(
+        titulo='Caída del servicio', severidad='alta', tipo='critica', descripcion='No responde desde las 8:00',
+        fecha_incidencia=datetime.now(), usuarios_afectados='Mesa de partes', servicios_afectados='VPN, Correo'
+    )
+    tecnico = SimpleNamespace(persona=SimpleNamespace(nombres='Ana'))
+    return item, alerta, incidencia, tecnico
+
+
+def medir(funcion, repeticiones):
+    """Mediana en microsegundos"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1e6)
+    return statistics.median(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--destinatarios', type=int, default=50)
+    parser.add_argument('--repeticiones', type=int, default=500)
+    args = parser.parse_args()
+
+    app = create_app('development', crear_tablas=False, iniciar_tareas=False)
+    item, alerta, incidencia, tecnico = datos()
+    url = app.config['URL_SISTEMA']
+
+    # Entorno sin caché: cada envío vuelve a compilar la plantilla (y su base)
+    sin_cache = app.jinja_env.overlay(cache_size=0)
+    sin_cache.bytecode_cache = None
+
+    print(f"\n📧 Costo por mensaje (mediana de {args.repeticiones}, µs)")
+    print(f"{'Correo':<18}{'Compilando':>12}{'Compilada':>12}{'Texto plano':>14}")
+    casos = [
+        ('incidencia', dict(tecnico=tecnico, incidencia=incidencia, item=item)),
+        ('alerta_critica', dict(alerta=alerta, item=item)),
+        ('resumen_alertas', dict(alertas=[alerta] * 10, items={None: item}, criticas=10)),
+    ]
+    for nombre, contexto in casos:
+        if nombre == 'resumen_alertas':
+            alerta.item_id = None
+        compilando = medir(lambda: sin_cache.get_template(f'email/{nombre}.html').render(url_sistema=url, **contexto),
+                           max(20, args.repeticiones // 10))
+        compilada = medir(lambda: renderizar_correo(app, nombre, **contexto)[0], args.repeticiones)
+        html = renderizar_correo(app, nombre, **contexto)[0]
+        texto = medir(lambda: texto_plano(html), args.repeticiones)
+        print(f"{nombre:<18}{compilando:>12.0f}{compilada:>12.0f}{texto:>14.0f}")
+
+    destinatarios = [f'usuario{i}@fiscalia.gob.pe' for i in range(args.destinatarios)]
+    asunto = f'ALERTA CRITICA - {item.codigo}: {item.nombre}'
+
+    def por_destinatario():
+        with app.app_context():
+            for correo in destinatarios:
+                html, texto = renderizar_correo(app, 'alerta_critica', alerta=alerta, item=item)
+                _mensajes_compartidos(app, asunto, [correo], html, texto)[0].as_string()
+
+    def compartido(modo):
+        def enviar():
+            with app.app_context():
+                app.config['MAIL_ALERTAS_ENVIO'] = modo
+                html, texto = renderizar_correo(app, 'alerta_critica', alerta=alerta, item=item)
+                for msg in _mensajes_compartidos(app, asunto, destinatarios, html, texto):
+                    msg.as_string()
+        return enviar
+
+    repeticiones = max(10, args.repeticiones // 20)
+    print(f"\n👥 Alerta para {args.destinatarios} destinatarios (render + MIME, mediana de {repeticiones}, ms)")
+    print(f"   Un render por destinatario: {medir(por_destinatario, repeticiones) / 1000:.2f}")
+    print(f"   Render compartido, individual: {medir(compartido('individual'), repeticiones) / 1000:.2f}")
+    print(f"   Render compartido, copia oculta: {medir(compartido('bcc'), repeticiones) / 1000:.2f}")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    finally:
+        shutil.rmtree(TMP, ignore_errors=True)
@@ -0,0 +1,111 @@
+"""
+Mide el tiempo de render de las páginas que extienden base.html
+con y sin caché de fragmentos, y la compilación de plantillas
+con y sin caché de bytecode.
+
+Uso:
+    python benchmarks/render_plantillas.py [--items 300] [--repeticiones 30]
+
+Usa una base SQLite temporal; no toca portafolio.db.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TMP = tempfile.mkdtemp(prefix='inventech-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(TMP, 'bench.db')}"
+os.environ['JINJA_CACHE_DIR'] = os.path.join(TMP, 'jinja')
+
+from app import create_app, db  # noqa: E402
+from app.models import Usuario, Item, ServicioAfectado, Metrica  # noqa: E402
+from app.fragmentos import limpiar_fragmentos  # noqa: E402
+
+PAGINAS = ['/dashboard', '/incidencias', '/metricas', '/alertas', '/reportes']
+
+
+def poblar(app, cantidad):
+    with app.app_context():
+        db.create_all()
+        usuario = Usuario(username='bench', rol='gerente')
+        usuario.set_password('bench')
+        db.session.add(usuario)
+        db.session.flush()
+
+        for i in range(cantidad):
+            db.session.add(Item(
+                codigo=f'PROD-{i + 1:03d}', nombre=f'Producto {i + 1}', tipo='producto',
+                categoria='Software', estado='aprobado', creado_por=usuario.id
+            ))
+        for i in range(10):
+            db.session.add(ServicioAfectado(nombre=f'Servicio {i}', icono='server', activo=True))
+        db.session.flush()
+
+        for item in Item.query.all():
+            db.session.add(Metrica(item_id=item.id, mes=1, anio=2025, porcentaje_cumplimiento=90,
+                                   semaforo='verde', incidencias=0))
+        db.session.commit()
+
+
+def medir(cliente, url, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        respuesta = cliente.get(url)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        assert respuesta.status_code == 200, (url, respuesta.status_code)
+    return statistics.median(tiempos)
+
+
+def medir_compilacion(app, bytecode):
+    """Carga todas las plantillas en un entorno nuevo (equivale a un worker recién iniciado)"""
+    entorno = app.jinja_env.overlay(cache_size=0)
+    entorno.bytecode_cache = app.jinja_env.bytecode_cache if bytecode else None
+    inicio = time.perf_counter()
+    for nombre in app.jinja_env.list_templates(extensions=['html']):
+        entorno.get_template(nombre)
+    return (time.perf_counter() - inicio) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=300)
+    parser.add_argument('--repeticiones', type=int, default=30)
+    args = parser.parse_args()
+
+    app = create_app('development', crear_tablas=False, iniciar_tareas=False)
+    app.config['TESTING'] = True
+    poblar(app, args.items)
+
+    cliente = app.test_client()
+    cliente.post('/login', data={'username': 'bench', 'password': 'bench'})
+
+    print(f"\n📊 Render de páginas ({args.items} items, mediana de {args.repeticiones} solicitudes)")
+    print(f"{'Página':<15}{'Sin caché (ms)':>16}{'Con caché (ms)':>16}")
+    for url in PAGINAS:
+        app.config['FRAGMENTOS_CACHE_ACTIVO'] = False
+        sin_cache = medir(cliente, url, args.repeticiones)
+
+        app.config['FRAGMENTOS_CACHE_ACTIVO'] = True
+        limpiar_fragmentos()
+        cliente.get(url)
+        con_cache = medir(cliente, url, args.repeticiones)
+
+        print(f"{url:<15}{sin_cache:>16.1f}{con_cache:>16.1f}")
+
+    medir_compilacion(app, bytecode=True)  # llena la caché de bytecode
+    print("\n📦 Compilación de todas las plantillas (worker nuevo)")
+    print(f"   Sin bytecode: {medir_compilacion(app, bytecode=False):.1f} ms")
+    print(f"   Con bytecode: {medir_compilacion(app, bytecode=True):.1f} ms")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    finally:
+        shutil.rmtree(TMP, ignore_errors=True)
@@ -0,0 +1,147 @@
+"""
+Servidor local que imita POST /<version>/<phone_number_id>/messages de la
+WhatsApp Cloud API, para probar app/whatsapp_service.py sin enviar mensajes.
+
+Uso:
+    python benchmarks/whatsapp_stub.py [--puerto 8090] [--token prueba]
+        [--latencia 0.05] [--tasa-error 0.1] [--limite 20]
+
+    # En la app:
+    WHATSAPP_API_URL=http://127.0.0.1:8090/v21.0
+    WHATSAPP_PHONE_NUMBER_ID=123 WHATSAPP_ACCESS_TOKEN=prueba
+
+--tasa-error: fracción de solicitudes que responden 503 (reintentables).
+--limite: mensajes por segundo aceptados; el exceso recibe 429 con Retry-After.
+Al terminar (Ctrl+C) imprime el resumen de solicitudes por código de estado.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RUTA = re.compile(r'^/v[\d.]+/[^/]+/messages$')
+
+
+class EstadoStub:
+    def __init__(self, token, latencia=0.0, tasa_error=0.0, limite=None):
+        self.token = token
+        self.latencia = latencia
+        self.tasa_error = tasa_error
+        self.limite = limite
+        self.estados = Counter()
+        self.mensajes = []
+        self.conexiones = set()
+        self._ventana = deque()
+        self._lock = threading.Lock()
+
+    def excede_limite(self):
+        if not self.limite:
+            return False
+        with self._lock:
+            ahora = time.monotonic()
+            while self._ventana and ahora - self._ventana[0] >= 1:
+                self._ventana.popleft()
+            if len(self._ventana) >= self.limite:
+                return True
+            self._ventana.append(ahora)
+            return False
+
+    def registrar(self, estado, mensaje=None, conexion=None):
+        with self._lock:
+            self.estados[estado] += 1
+            if mensaje is not None:
+                self.mensajes.append(mensaje)
+            if conexion is not None:
+                self.conexiones.add(conexion)
+
+
+def crear_handler(estado):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive
+
+        def _responder(self, codigo, cuerpo, headers=None):
+            datos = json.dumps(cuerpo).encode()
+            self.send_response(codigo)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(datos)))
+            for clave, valor in (headers or {}).items():
+                self.send_header(clave, valor)
+            self.end_headers()
+            self.wfile.write(datos)
+            estado.registrar(codigo, conexion=self.client_address)
+
+        def do_POST(self):
+            cuerpo = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if not RUTA.match(self.path):
+                return self._responder(404, {'error': {'message': 'Unknown path'}})
+            if self.headers.get('Authorization') != f'Bearer {estado.token}':
+                return self._responder(401, {'error': {'message': 'Invalid OAuth access token', 'code': 190}})
+            if estado.excede_limite():
+                return self._responder(429, {'error': {'message': 'Rate limit hit', 'code': 130429}},
+                                       {'Retry-After': '1'})
+            if estado.latencia:
+                time.sleep(estado.latencia)
+            if random.random() < estado.tasa_error:
+                return self._responder(503, {'error': {'message': 'Service temporarily unavailable'}})
+            try:
+                mensaje = json.loads(cuerpo)
+                destino = mensaje['to']
+            except (ValueError, KeyError):
+                return self._responder(400, {'error': {'message': 'Invalid parameter', 'code': 100}})
+
+            estado.registrar(200, mensaje=mensaje, conexion=self.client_address)
+            datos = json.dumps({
+                'messaging_product': 'whatsapp',
+                'contacts': [{'input': destino, 'wa_id': destino}],
+                'messages': [{'id': f'wamid.{uuid.uuid4().hex}'}],
+            }).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(datos)))
+            self.end_headers()
+            self.wfile.write(datos)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def iniciar(puerto=8090, **opciones):
+    """Arranca el stub en un hilo; devuelve (servidor, estado)"""
+    estado = EstadoStub(**opciones)
+    servidor = ThreadingHTTPServer(('127.0.0.1', puerto), crear_handler(estado))
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, estado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--puerto', type=int, default=8090)
+    parser.add_argument('--token', default='prueba', help='Token Bearer esperado')
+    parser.add_argument('--latencia', type=float, default=0.0, help='Segundos por respuesta')
+    parser.add_argument('--tasa-error', type=float, default=0.0, help='Fracción de respuestas 503')
+    parser.add_argument('--limite', type=int, default=None, help='Mensajes por segundo antes de responder 429')
+    args = parser.parse_args()
+
+    servidor, estado = iniciar(args.puerto, token=args.token, latencia=args.latencia,
+                               tasa_error=args.tasa_error, limite=args.limite)
+    print(f"📱 Stub de WhatsApp en http://127.0.0.1:{args.puerto}/v21.0 (Ctrl+C para terminar)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        servidor.shutdown()
+    print(f"\n📊 Mensajes aceptados: {len(estado.mensajes)} · conexiones: {len(estado.conexiones)}")
+    for codigo, total in sorted(estado.estados.items()):
+        print(f"   HTTP {codigo}: {total}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,43 @@
 import os
+import tempfile
 import warnings
 from datetime import timedelta
 
+
+# ========================================
+# PERFILES DE ENGINE POR DIALECTO
+# ========================================
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 15000))
+PG_STATEMENT_TIMEOUT_MS = int(os.getenv('PG_STATEMENT_TIMEOUT_MS', 30000))
+PG_LOCK_TIMEOUT_MS = int(os.getenv('PG_LOCK_TIMEOUT_MS', 10000))
+PG_IDLE_EN_TRANSACCION_MS = int(os.getenv('PG_IDLE_EN_TRANSACCION_MS', 60000))
+
+
+def perfil_engine(url):
+    """
+    Opciones de create_engine según el dialecto de la URL.
+    Los PRAGMAs de SQLite y el BEGIN IMMEDIATE se aplican en app/motores.py.
+    """
+    if url.startswith('sqlite'):
+        # Pool por defecto de SQLAlchemy; la espera ante el lock de escritura la da busy_timeout
+        return {'connect_args': {'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000}}
+
+    opciones = {
+        'pool_pre_ping': True,
+        'pool_recycle': 300,
+        'pool_size': 10,
+        'max_overflow': 20,
+        'connect_args': {
+            'options': f'-c statement_timeout={PG_STATEMENT_TIMEOUT_MS} '
+                       f'-c lock_timeout={PG_LOCK_TIMEOUT_MS} '
+                       f'-c idle_in_transaction_session_timeout={PG_IDLE_EN_TRANSACCION_MS}'
+        }
+    }
+    # Sin sentencias preparadas del lado del servidor: psycopg2 no las soporta y el bus de
+    # invalidación (app/invalidacion.py) usa la API de LISTEN de psycopg2 (poll/notifies)
+    return opciones
+
+
 class Config:
     """Configuración base"""
     
@@ -25,13 +61,72 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = False
     
-    # Pool de conexiones para PostgreSQL
-    SQLALCHEMY_ENGINE_OPTIONS = {
-        'pool_pre_ping': True,
-        'pool_recycle': 300,
-        'pool_size': 10,
-        'max_overflow': 20
-    }
+    # Réplica de lectura opcional (vistas marcadas con @solo_lectura)
+    # Local: DATABASE_REPLICA_URL=sqlite:///replica.db (copia de portafolio.db)
+    DATABASE_REPLICA_URL = os.getenv('DATABASE_REPLICA_URL')
+    
+    if DATABASE_REPLICA_URL and DATABASE_REPLICA_URL.startswith('postgres://'):
+        DATABASE_REPLICA_URL = DATABASE_REPLICA_URL.replace('postgres://', 'postgresql://', 1)
+    
+    REPLICA_MAX_LAG_SEGUNDOS = float(os.getenv('REPLICA_MAX_LAG_SEGUNDOS', 10))
+    REPLICA_VERIFICACION_SEGUNDOS = float(os.getenv('REPLICA_VERIFICACION_SEGUNDOS', 15))
+    
+    # Pool y opciones de conexión según el dialecto (PostgreSQL o SQLite)
+    SQLALCHEMY_ENGINE_OPTIONS = perfil_engine(SQLALCHEMY_DATABASE_URI)
+    
+    # La réplica usa el perfil de su propio dialecto
+    SQLALCHEMY_BINDS = {
+        'replica': {'url': DATABASE_REPLICA_URL, **perfil_engine(DATABASE_REPLICA_URL)}
+    } if DATABASE_REPLICA_URL else {}
+    
+    # SQLite: PRAGMAs al conectar (app/motores.py)
+    SQLITE_BUSY_TIMEOUT_MS = SQLITE_BUSY_TIMEOUT_MS
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_MMAP_BYTES = int(os.getenv('SQLITE_MMAP_BYTES', 256 * 1024 * 1024))
+    SQLITE_CACHE_KB = int(os.getenv('SQLITE_CACHE_KB', 64 * 1024))
+    
+    # ========================================
+    # ARRANQUE
+    # ========================================
+    # En producción el esquema lo crea create_db.py (preDeployCommand);
+    # los workers no repiten create_all() salvo que se pida explícitamente
+    CREAR_TABLAS_AL_INICIAR = os.getenv('CREAR_TABLAS_AL_INICIAR', 'false').lower() == 'true'
+    
+    # ========================================
+    # PLANTILLAS
+    # ========================================
+    # Bytecode compilado de Jinja compartido por todos los workers
+    JINJA_CACHE_DIR = os.getenv('JINJA_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'inventech-jinja'))
+    # Fragmentos {% cache %} en memoria de cada worker
+    FRAGMENTOS_CACHE_ACTIVO = os.getenv('FRAGMENTOS_CACHE_ACTIVO', 'true').lower() == 'true'
+    FRAGMENTOS_CACHE_MAX = int(os.getenv('FRAGMENTOS_CACHE_MAX', 500))
+    
+    # ========================================
+    # INVALIDACIÓN DE CACHÉS ENTRE WORKERS
+    # ========================================
+    # PostgreSQL: LISTEN/NOTIFY en INVALIDACION_CANAL; SQLite: sondeo de contador_cambios
+    INVALIDACION_ACTIVA = os.getenv('INVALIDACION_ACTIVA', 'true').lower() == 'true'
+    INVALIDACION_CANAL = os.getenv('INVALIDACION_CANAL', 'inventech_cache')
+    # Segundos entre sondeos en SQLite (retraso máximo de la invalidación)
+    INVALIDACION_INTERVALO = float(os.getenv('INVALIDACION_INTERVALO', 1.0))
+    
+    # ========================================
+    # HISTORIAL DE VERSIONES
+    # ========================================
+    # Cada cuántos cambios de un campo se guarda el valor completo (entre medio, deltas)
+    VERSIONES_SNAPSHOT_CADA = int(os.getenv('VERSIONES_SNAPSHOT_CADA', 20))
+    
+    # ========================================
+    # ARCHIVO DE DATOS HISTÓRICOS
+    # ========================================
+    # Incidencias y alertas resueltas hace más de estos días pasan a las tablas *_archivo
+    ARCHIVO_HORIZONTE_DIAS = int(os.getenv('ARCHIVO_HORIZONTE_DIAS', 365))
+    ARCHIVO_LOTE = int(os.getenv('ARCHIVO_LOTE', 500))
+    ARCHIVO_MAX_LOTES = int(os.getenv('ARCHIVO_MAX_LOTES', 20))
+    # Filas archivadas que muestran las vistas con ?incluir_archivo=1 (las más recientes)
+    ARCHIVO_CONSULTA_LIMITE = int(os.getenv('ARCHIVO_CONSULTA_LIMITE', 500))
+    # Particiones mensuales de incidencia creadas por adelantado (solo PostgreSQL)
+    PARTICIONES_MESES_ADELANTE = int(os.getenv('PARTICIONES_MESES_ADELANTE', 3))
     
     # ========================================
     # SESIÓN
@@ -60,12 +155,41 @@ class Config:
     MAIL_MAX_EMAILS = None
     MAIL_ASCII_ATTACHMENTS = False
     
+    # Alertas y resúmenes: 'bcc' (un mensaje, destinatarios en copia oculta)
+    # o 'individual' (un mensaje por destinatario con el mismo cuerpo)
+    MAIL_ALERTAS_ENVIO = os.getenv('MAIL_ALERTAS_ENVIO', 'bcc')
+    # URL pública del sistema para los enlaces de los correos
+    URL_SISTEMA = os.getenv('URL_SISTEMA', 'http://127.0.0.1:5000').rstrip('/')
+    
     # ========================================
     # WHATSAPP BUSINESS API
     # ========================================
     WHATSAPP_PHONE_NUMBER_ID = os.getenv('WHATSAPP_PHONE_NUMBER_ID')
     WHATSAPP_ACCESS_TOKEN = os.getenv('WHATSAPP_ACCESS_TOKEN')
     WHATSAPP_VERIFY_TOKEN = os.getenv('WHATSAPP_VERIFY_TOKEN', 'inventech_webhook_2024_secure')
+    # Base de la Graph API (apuntar a un stub local para pruebas: benchmarks/whatsapp_stub.py)
+    WHATSAPP_API_URL = os.getenv('WHATSAPP_API_URL', 'https://graph.facebook.com/v21.0')
+    # Plantilla aprobada para alertas (fuera de la ventana de 24 h solo se permiten plantillas);
+    # vacía = mensaje de texto
+    WHATSAPP_PLANTILLA = os.getenv('WHATSAPP_PLANTILLA', '')
+    WHATSAPP_IDIOMA = os.getenv('WHATSAPP_IDIOMA', 'es')
+    WHATSAPP_CODIGO_PAIS = os.getenv('WHATSAPP_CODIGO_PAIS', '51')
+    WHATSAPP_MAX_CONEXIONES = int(os.getenv('WHATSAPP_MAX_CONEXIONES', 4))
+    WHATSAPP_MENSAJES_POR_SEGUNDO = float(os.getenv('WHATSAPP_MENSAJES_POR_SEGUNDO', 20))
+    WHATSAPP_REINTENTOS = int(os.getenv('WHATSAPP_REINTENTOS', 3))
+    WHATSAPP_TIMEOUT = float(os.getenv('WHATSAPP_TIMEOUT', 10))
+    
+    # ========================================
+    # NOTIFICACIONES DE ALERTAS
+    # ========================================
+    # 'inmediato' (por defecto): un correo por alerta; 'resumen': las alertas de la
+    # ventana se agrupan en un correo por destinatario (requiere el scheduler)
+    NOTIFICACIONES_MODO = os.getenv('NOTIFICACIONES_MODO', 'inmediato')
+    NOTIFICACIONES_VENTANA_MINUTOS = int(os.getenv('NOTIFICACIONES_VENTANA_MINUTOS', 5))
+    # En modo resumen, las alertas de urgencia 'critica' se envían sin esperar la ventana
+    NOTIFICACIONES_CRITICAS_INMEDIATAS = os.getenv('NOTIFICACIONES_CRITICAS_INMEDIATAS', 'true').lower() == 'true'
+    # Técnicos y jefes TI sin suscripciones reciben todas las alertas (false: solo los suscritos)
+    SUSCRIPCIONES_TODAS_POR_DEFECTO = os.getenv('SUSCRIPCIONES_TODAS_POR_DEFECTO', 'true').lower() == 'true'
     
     # ========================================
     # UPLOADS Y ARCHIVOS
@@ -80,6 +204,12 @@ class Config:
     SCHEDULER_API_ENABLED = True
     SCHEDULER_TIMEZONE = 'America/Lima'
     
+    # ========================================
+    # MONITOREO (GET /metrics, formato Prometheus)
+    # ========================================
+    # Si está definido, /metrics exige "Authorization: Bearer <METRICS_TOKEN>"
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+    
     # ========================================
     # VALIDACIÓN
     # ========================================
@@ -122,6 +252,7 @@ class DevelopmentConfig(Config):
     DEBUG = True
     TESTING = False
     SESSION_COOKIE_SECURE = False  # HTTP en desarrollo
+    CREAR_TABLAS_AL_INICIAR = os.getenv('CREAR_TABLAS_AL_INICIAR', 'true').lower() == 'true'
 
 
 class ProductionConfig(Config):
@@ -1,7 +1,8 @@
 from app import create_app, db
 from app.models import Usuario, Persona, ServicioAfectado
 
-app = create_app()
+# Sin create_all() implícito ni scheduler: este script se ejecuta una vez por despliegue
+app = create_app(crear_tablas=False, iniciar_tareas=False)
 
 with app.app_context():
     # IMPORTANTE: No usar drop_all() en producción
@@ -54,4 +55,11 @@ with app.app_context():
     else:
         print(f"ℹ️  Ya existen {existing_services} servicios, omitiendo creación")
     
+    # Resumen mensual de métricas (solo si está vacío)
+    from app.models import Metrica, MetricaResumen
+    if MetricaResumen.query.count() == 0 and Metrica.query.count() > 0:
+        print("📈 Construyendo resumen mensual de métricas...")
+        from app.metricas_service import reconstruir_resumen_metricas
+        reconstruir_resumen_metricas()
+    
     print("✅ Inicialización de base de datos completada")
\ No newline at end of file
@@ -0,0 +1,77 @@
+"""
+Configuración de gunicorn para Render.
+
+- preload_app: la aplicación se importa una sola vez en el proceso master
+  y los workers la heredan por fork (arranque más rápido, menos memoria).
+- post_fork: cada worker descarta las conexiones heredadas del master
+  (engine.dispose(close=False)) y abre las suyas.
+- El scheduler se inicia en un solo worker, elegido con un lock de archivo.
+- Métricas Prometheus en modo multiproceso: cada worker escribe en
+  PROMETHEUS_MULTIPROC_DIR (se vacía al arrancar, antes de importar la app)
+  y child_exit descarta los gauges de los workers que terminan.
+"""
+import os
+import shutil
+import time
+
+_inicio = time.perf_counter()
+
+# create_app no inicia el scheduler en el master (los hilos no sobreviven al fork)
+os.environ.setdefault('SCHEDULER_DIFERIDO', 'true')
+
+# Debe definirse antes de importar prometheus_client (preload_app importa la app)
+PROMETHEUS_DIR = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/inventech-prometheus')
+shutil.rmtree(PROMETHEUS_DIR, ignore_errors=True)
+os.makedirs(PROMETHEUS_DIR, exist_ok=True)
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+timeout = 120
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+SCHEDULER_LOCK = os.getenv('SCHEDULER_LOCK_FILE', '/tmp/inventech-scheduler.lock')
+_lock_scheduler = None
+
+
+def when_ready(server):
+    server.log.info(f"🚀 Master listo en {time.perf_counter() - _inicio:.2f} s (preload={preload_app})")
+
+
+def post_fork(server, worker):
+    from app import db, scheduler_habilitado
+
+    app = worker.app.wsgi()
+
+    # No reutilizar conexiones abiertas por el master
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+    if scheduler_habilitado(os.getenv('FLASK_ENV', 'production')):
+        _iniciar_scheduler_en_un_worker(server, worker, app)
+
+    server.log.info(f"✅ Worker {worker.pid} listo en {time.perf_counter() - _inicio:.2f} s")
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def _iniciar_scheduler_en_un_worker(server, worker, app):
+    """Solo el worker que obtiene el lock ejecuta las tareas programadas"""
+    global _lock_scheduler
+    import fcntl
+    from app import iniciar_scheduler_app
+
+    archivo = open(SCHEDULER_LOCK, 'w')
+    try:
+        fcntl.flock(archivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        archivo.close()
+        return
+
+    # El lock se libera cuando el worker termina; el siguiente worker lo toma
+    _lock_scheduler = archivo
+    server.log.info(f"⏰ Scheduler asignado al worker {worker.pid}")
+    iniciar_scheduler_app(app)
@@ -0,0 +1,63 @@
+"""
+Script de migración: Secuencias de códigos de item
+- PostgreSQL: crea item_codigo_p_seq / item_codigo_s_seq
+- Otros motores: crea la tabla secuencia_codigo con una fila por prefijo
+- Sitúa cada secuencia en el mayor número existente comparando numéricamente
+  (P100 > P99), no por orden de texto
+Ejecutar desde la raíz del proyecto (funciona en SQLite y PostgreSQL)
+"""
+
+import sys
+
+from app import create_app, db
+from app.models import SecuenciaCodigo
+from app.codigos_service import inicializar_secuencias, formatear_codigo
+
+def migrate():
+    app = create_app(crear_tablas=False, iniciar_tareas=False)
+
+    with app.app_context():
+        print("🔄 Iniciando migración de base de datos...")
+        print("📋 Secuencias de códigos de item (P, S)")
+        print("-" * 60)
+
+        try:
+            if db.engine.dialect.name != 'postgresql':
+                SecuenciaCodigo.__table__.create(db.engine, checkfirst=True)
+                print("✅ Tabla 'secuencia_codigo' verificada")
+
+            ultimos = inicializar_secuencias()
+            for prefijo, ultimo in ultimos.items():
+                print(f"🔢 Prefijo {prefijo}: último {ultimo}, siguiente {formatear_codigo(prefijo, ultimo + 1)}")
+
+            db.session.commit()
+            print("-" * 60)
+            print("✅ Migración completada")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n❌ ERROR durante la migración:")
+            print(f"   {str(e)}")
+            print("\n💡 Solución:")
+            print("   - Verifica que el archivo models.py esté actualizado")
+            print("   - Asegúrate de que la base de datos no esté en uso")
+            return False
+
+        return True
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("🚀 MIGRACIÓN DE BASE DE DATOS - INVENTECH")
+    print("=" * 60)
+    print()
+
+    success = migrate()
+
+    print()
+    print("=" * 60)
+    if success:
+        print("✅ MIGRACIÓN EXITOSA")
+    else:
+        print("❌ MIGRACIÓN FALLIDA")
+    print("=" * 60)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,86 @@
+"""
+Script de migración: Contadores denormalizados de item
+- Agrega a item: incidencias_abiertas, incidencias_resueltas, incidencias_mes,
+  periodo_incidencias, alertas_activas y ultimo_semaforo
+- Crea los índices de los contadores usados para ordenar y filtrar
+- Inicializa los valores desde incidencia, alerta y metrica (y recalcula
+  alerta.incidencias_resueltas_count)
+Ejecutar desde la raíz del proyecto (funciona en SQLite y PostgreSQL)
+"""
+
+import sys
+
+from app import create_app, db
+from app.contadores import reconciliar_contadores
+from sqlalchemy import text, inspect
+
+COLUMNAS = [
+    ('incidencias_abiertas', 'INTEGER NOT NULL DEFAULT 0'),
+    ('incidencias_resueltas', 'INTEGER NOT NULL DEFAULT 0'),
+    ('incidencias_mes', 'INTEGER NOT NULL DEFAULT 0'),
+    ('periodo_incidencias', 'INTEGER'),
+    ('alertas_activas', 'INTEGER NOT NULL DEFAULT 0'),
+    ('ultimo_semaforo', 'VARCHAR(10)'),
+]
+
+INDICES = ['incidencias_abiertas', 'alertas_activas', 'ultimo_semaforo']
+
+def migrate():
+    app = create_app(crear_tablas=False, iniciar_tareas=False)
+
+    with app.app_context():
+        print("🔄 Iniciando migración de base de datos...")
+        print("📋 Contadores denormalizados en item")
+        print("-" * 60)
+
+        try:
+            # 1. Columnas
+            columnas_existentes = [col['name'] for col in inspect(db.engine).get_columns('item')]
+
+            for nombre, tipo in COLUMNAS:
+                if nombre not in columnas_existentes:
+                    db.session.execute(text(f'ALTER TABLE item ADD COLUMN {nombre} {tipo}'))
+                    print(f"✅ Columna '{nombre}' agregada correctamente")
+                else:
+                    print(f"ℹ️  Columna '{nombre}' ya existe")
+
+            # 2. Índices
+            for nombre in INDICES:
+                db.session.execute(text(f'CREATE INDEX IF NOT EXISTS ix_item_{nombre} ON item ({nombre})'))
+                print(f"✅ Índice 'ix_item_{nombre}' verificado")
+
+            # 3. Valores iniciales
+            corregidos = reconciliar_contadores(db.session.connection())
+            print(f"✅ Contadores inicializados ({corregidos} item(s) actualizados)")
+
+            db.session.commit()
+            print("-" * 60)
+            print("✅ Migración completada")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n❌ ERROR durante la migración:")
+            print(f"   {str(e)}")
+            print("\n💡 Solución:")
+            print("   - Verifica que el archivo models.py esté actualizado")
+            print("   - Asegúrate de que la base de datos no esté en uso")
+            return False
+
+        return True
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("🚀 MIGRACIÓN DE BASE DE DATOS - INVENTECH")
+    print("=" * 60)
+    print()
+
+    success = migrate()
+
+    print()
+    print("=" * 60)
+    if success:
+        print("✅ MIGRACIÓN EXITOSA")
+    else:
+        print("❌ MIGRACIÓN FALLIDA")
+    print("=" * 60)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,71 @@
+"""
+Script de migración: Estado vigente de los items (item_estado)
+- Crea la tabla item_estado
+- Calcula el estado de todos los items
+Ejecutar desde la raíz del proyecto (funciona en SQLite y PostgreSQL)
+"""
+
+import sys
+
+from app import create_app, db
+from app.estado_items import crear_item_estado, refrescar_item_estado
+from app.models import ItemEstado
+from sqlalchemy import inspect, func
+
+def migrate():
+    app = create_app(crear_tablas=False, iniciar_tareas=False)
+
+    with app.app_context():
+        print("🔄 Iniciando migración de base de datos...")
+        print("📋 Relación item_estado")
+        print("-" * 60)
+
+        try:
+            connection = db.session.connection()
+            inspector = inspect(connection)
+            existe = inspector.has_table('item_estado')
+
+            # 1. Tabla
+            if not existe:
+                crear_item_estado(connection)
+                print("✅ item_estado creada correctamente")
+            else:
+                print("ℹ️  item_estado ya existe")
+
+            # 2. Valores iniciales
+            refrescar_item_estado(connection)
+            total = db.session.query(func.count(ItemEstado.item_id)).scalar()
+            vigentes = db.session.query(func.count(ItemEstado.item_id)).filter(ItemEstado.vigente).scalar()
+            print(f"✅ Estado calculado para {total} item(s) ({vigentes} vigentes)")
+
+            db.session.commit()
+            print("-" * 60)
+            print("✅ Migración completada")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n❌ ERROR durante la migración:")
+            print(f"   {str(e)}")
+            print("\n💡 Solución:")
+            print("   - Verifica que el archivo models.py esté actualizado")
+            print("   - Asegúrate de que la base de datos no esté en uso")
+            return False
+
+        return True
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("🚀 MIGRACIÓN DE BASE DE DATOS - INVENTECH")
+    print("=" * 60)
+    print()
+
+    success = migrate()
+
+    print()
+    print("=" * 60)
+    if success:
+        print("✅ MIGRACIÓN EXITOSA")
+    else:
+        print("❌ MIGRACIÓN FALLIDA")
+    print("=" * 60)
+    sys.exit(0 if success else 1)
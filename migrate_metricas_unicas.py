@@ -0,0 +1,77 @@
+"""
+Script de migración: Una métrica por item y período
+- Elimina métricas duplicadas (mismo item, mes y año) conservando la más reciente
+- Crea el índice único (item_id, mes, anio) que usan los upserts del backfill
+- Recalcula el resumen de los períodos afectados
+Ejecutar desde la raíz del proyecto (funciona en SQLite y PostgreSQL)
+"""
+
+import sys
+
+from app import create_app, db
+from app.metricas_service import recalcular_resumen_periodos
+from sqlalchemy import text
+
+def migrate():
+    app = create_app(crear_tablas=False, iniciar_tareas=False)
+
+    with app.app_context():
+        print("🔄 Iniciando migración de base de datos...")
+        print("📋 Métricas: índice único (item_id, mes, anio)")
+        print("-" * 60)
+
+        try:
+            # 1. Duplicados: se conserva la métrica con mayor id de cada período
+            duplicados = db.session.execute(text(
+                "SELECT item_id, mes, anio, MAX(id) AS conservar FROM metrica "
+                "GROUP BY item_id, mes, anio HAVING COUNT(*) > 1"
+            )).all()
+
+            for fila in duplicados:
+                db.session.execute(text(
+                    "DELETE FROM metrica WHERE item_id = :item_id AND mes = :mes AND anio = :anio AND id <> :conservar"
+                ), {'item_id': fila.item_id, 'mes': fila.mes, 'anio': fila.anio, 'conservar': fila.conservar})
+                print(f"🧹 Item {fila.item_id} {fila.mes}/{fila.anio}: duplicados eliminados")
+
+            if duplicados:
+                recalcular_resumen_periodos(db.session.connection(), {(f.anio, f.mes) for f in duplicados})
+            else:
+                print("ℹ️  No hay métricas duplicadas")
+
+            # 2. Índice único
+            db.session.execute(text(
+                'CREATE UNIQUE INDEX IF NOT EXISTS uq_metrica_item_periodo ON metrica (item_id, mes, anio)'
+            ))
+            print("✅ Índice único 'uq_metrica_item_periodo' verificado")
+
+            db.session.commit()
+            print("-" * 60)
+            print("✅ Migración completada")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n❌ ERROR durante la migración:")
+            print(f"   {str(e)}")
+            print("\n💡 Solución:")
+            print("   - Verifica que el archivo models.py esté actualizado")
+            print("   - Asegúrate de que la base de datos no esté en uso")
+            return False
+
+        return True
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("🚀 MIGRACIÓN DE BASE DE DATOS - INVENTECH")
+    print("=" * 60)
+    print()
+
+    success = migrate()
+
+    print()
+    print("=" * 60)
+    if success:
+        print("✅ MIGRACIÓN EXITOSA")
+    else:
+        print("❌ MIGRACIÓN FALLIDA")
+    print("=" * 60)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,125 @@
+"""
+Script de migración: Particiones mensuales de incidencia (solo PostgreSQL)
+- Convierte incidencia en tabla particionada por rango de fecha_incidencia
+  (una partición por mes + partición por defecto)
+- La clave primaria pasa a ser (id, fecha_incidencia); el id sigue saliendo
+  de la misma secuencia
+- Se elimina la clave foránea alerta_incidencia.incidencia_id (PostgreSQL no
+  permite referenciar solo el id de una tabla particionada)
+- Crea las particiones de los próximos meses (el scheduler las mantiene)
+En SQLite no hace nada. Ejecutar desde la raíz del proyecto.
+"""
+
+import sys
+
+from app import create_app, db
+from app.archivo_service import incidencia_particionada, crear_particion, asegurar_particiones
+from sqlalchemy import text
+
+def migrate():
+    app = create_app(crear_tablas=False, iniciar_tareas=False)
+
+    with app.app_context():
+        print("🔄 Iniciando migración de base de datos...")
+        print("📋 Particiones mensuales de 'incidencia'")
+        print("-" * 60)
+
+        if db.engine.dialect.name != 'postgresql':
+            print("ℹ️  Solo aplica a PostgreSQL, nada que hacer")
+            return True
+
+        try:
+            # La copia de datos puede superar PG_STATEMENT_TIMEOUT_MS
+            db.session.execute(text("SET statement_timeout = 0"))
+            
+            if incidencia_particionada():
+                print("ℹ️  'incidencia' ya está particionada")
+            else:
+                # 1. Tabla nueva particionada con las mismas columnas
+                db.session.execute(text("LOCK TABLE incidencia IN ACCESS EXCLUSIVE MODE"))
+                db.session.execute(text("ALTER TABLE incidencia RENAME TO incidencia_sin_particion"))
+                db.session.execute(text(
+                    "CREATE TABLE incidencia (LIKE incidencia_sin_particion INCLUDING DEFAULTS) "
+                    "PARTITION BY RANGE (fecha_incidencia)"
+                ))
+                db.session.execute(text("ALTER TABLE incidencia ADD PRIMARY KEY (id, fecha_incidencia)"))
+                db.session.execute(text("ALTER TABLE incidencia ADD FOREIGN KEY (item_id) REFERENCES item (id)"))
+                db.session.execute(text("ALTER TABLE incidencia ADD FOREIGN KEY (registrado_por) REFERENCES usuario (id)"))
+                db.session.execute(text("ALTER TABLE incidencia ADD FOREIGN KEY (resuelto_por) REFERENCES usuario (id)"))
+                db.session.execute(text("CREATE TABLE incidencia_default PARTITION OF incidencia DEFAULT"))
+                print("✅ Tabla particionada creada")
+
+                # 2. Una partición por cada mes con datos
+                meses = db.session.execute(text(
+                    "SELECT DISTINCT CAST(EXTRACT(YEAR FROM fecha_incidencia) AS INTEGER) AS anio, "
+                    "CAST(EXTRACT(MONTH FROM fecha_incidencia) AS INTEGER) AS mes "
+                    "FROM incidencia_sin_particion ORDER BY 1, 2"
+                )).all()
+                for fila in meses:
+                    crear_particion(fila.anio, fila.mes)
+                print(f"✅ {len(meses)} partición(es) mensuales creadas")
+
+                # 3. Copiar datos y mover la secuencia del id a la tabla nueva
+                copiadas = db.session.execute(text(
+                    "INSERT INTO incidencia SELECT * FROM incidencia_sin_particion"
+                )).rowcount
+                db.session.execute(text(
+                    "ALTER SEQUENCE IF EXISTS incidencia_id_seq OWNED BY incidencia.id"
+                ))
+                print(f"✅ {copiadas} incidencia(s) copiadas")
+
+                # 4. Claves foráneas que apuntaban a la tabla anterior
+                restricciones = db.session.execute(text(
+                    "SELECT conname, conrelid::regclass::text AS tabla FROM pg_constraint "
+                    "WHERE contype = 'f' AND confrelid = 'incidencia_sin_particion'::regclass"
+                )).all()
+                for fila in restricciones:
+                    db.session.execute(text(f'ALTER TABLE {fila.tabla} DROP CONSTRAINT "{fila.conname}"'))
+                    print(f"🔗 Clave foránea {fila.tabla}.{fila.conname} eliminada")
+
+                db.session.execute(text("DROP TABLE incidencia_sin_particion"))
+
+                # 5. Índices en todas las particiones
+                db.session.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_incidencia_item_fecha ON incidencia (item_id, fecha_incidencia)"
+                ))
+                db.session.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_incidencia_estado ON incidencia (estado)"
+                ))
+                db.session.commit()
+                print("✅ Índices creados")
+
+            # 6. Particiones futuras
+            particiones = asegurar_particiones()
+            print(f"✅ Particiones verificadas: {', '.join(particiones)}")
+
+            print("-" * 60)
+            print("✅ Migración completada")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n❌ ERROR durante la migración:")
+            print(f"   {str(e)}")
+            print("\n💡 Solución:")
+            print("   - Verifica que el archivo models.py esté actualizado")
+            print("   - Asegúrate de que la base de datos no esté en uso")
+            return False
+
+        return True
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("🚀 MIGRACIÓN DE BASE DE DATOS - INVENTECH")
+    print("=" * 60)
+    print()
+
+    success = migrate()
+
+    print()
+    print("=" * 60)
+    if success:
+        print("✅ MIGRACIÓN EXITOSA")
+    else:
+        print("❌ MIGRACIÓN FALLIDA")
+    print("=" * 60)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,59 @@
+"""
+Script de migración: Suscripciones a alertas
+- Crea la tabla suscripcion con el índice (ambito, valor, usuario_id) usado
+  para resolver los destinatarios de una alerta
+- No crea suscripciones: los técnicos y jefes TI sin suscripciones siguen
+  recibiendo todas las alertas (SUSCRIPCIONES_TODAS_POR_DEFECTO)
+Ejecutar desde la raíz del proyecto (funciona en SQLite y PostgreSQL)
+"""
+
+import sys
+
+from app import create_app, db
+from app.models import Suscripcion
+
+def migrate():
+    app = create_app(crear_tablas=False, iniciar_tareas=False)
+
+    with app.app_context():
+        print("🔄 Iniciando migración de base de datos...")
+        print("📋 Suscripciones a alertas")
+        print("-" * 60)
+
+        try:
+            # Crea la tabla y sus índices si no existen
+            Suscripcion.__table__.create(db.engine, checkfirst=True)
+            print("✅ Tabla 'suscripcion' verificada")
+            print("✅ Índice 'ix_suscripcion_ambito_valor' verificado")
+
+            print(f"ℹ️  Suscripciones registradas: {Suscripcion.query.count()}")
+            print("-" * 60)
+            print("✅ Migración completada")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n❌ ERROR durante la migración:")
+            print(f"   {str(e)}")
+            print("\n💡 Solución:")
+            print("   - Verifica que el archivo models.py esté actualizado")
+            print("   - Asegúrate de que la base de datos no esté en uso")
+            return False
+
+        return True
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("🚀 MIGRACIÓN DE BASE DE DATOS - INVENTECH")
+    print("=" * 60)
+    print()
+
+    success = migrate()
+
+    print()
+    print("=" * 60)
+    if success:
+        print("✅ MIGRACIÓN EXITOSA")
+    else:
+        print("❌ MIGRACIÓN FALLIDA")
+    print("=" * 60)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,99 @@
+"""
+Script de migración: Numeración de versiones por item
+- Agrega item.ultima_version (contador de versiones por item)
+- Renumera versiones duplicadas (mismo item y número) en orden de creación
+- Inicializa item.ultima_version con el máximo de cada item
+- Crea el índice único (item_id, numero_version)
+Ejecutar desde la raíz del proyecto (funciona en SQLite y PostgreSQL)
+"""
+
+import sys
+
+from app import create_app, db
+from sqlalchemy import text, inspect
+
+def migrate():
+    app = create_app(crear_tablas=False, iniciar_tareas=False)
+
+    with app.app_context():
+        print("🔄 Iniciando migración de base de datos...")
+        print("📋 Numeración de versiones: item.ultima_version + índice único")
+        print("-" * 60)
+
+        try:
+            # 1. Columna ultima_version
+            columnas_existentes = [col['name'] for col in inspect(db.engine).get_columns('item')]
+
+            if 'ultima_version' not in columnas_existentes:
+                db.session.execute(text('ALTER TABLE item ADD COLUMN ultima_version INTEGER NOT NULL DEFAULT 0'))
+                print("✅ Columna 'ultima_version' agregada correctamente")
+            else:
+                print("ℹ️  Columna 'ultima_version' ya existe")
+
+            # 2. Renumerar items con números de versión repetidos
+            duplicados = db.session.execute(text(
+                "SELECT DISTINCT item_id FROM version "
+                "GROUP BY item_id, numero_version HAVING COUNT(*) > 1"
+            )).scalars().all()
+
+            for item_id in duplicados:
+                ids = db.session.execute(text(
+                    "SELECT id FROM version WHERE item_id = :item_id ORDER BY numero_version, fecha, id"
+                ), {'item_id': item_id}).scalars().all()
+
+                # Primero a negativos para no chocar con el índice único si ya existe
+                for numero, version_id in enumerate(ids, start=1):
+                    db.session.execute(text("UPDATE version SET numero_version = :numero WHERE id = :id"),
+                                       {'numero': -numero, 'id': version_id})
+                db.session.execute(text(
+                    "UPDATE version SET numero_version = -numero_version WHERE item_id = :item_id"
+                ), {'item_id': item_id})
+                print(f"🔢 Item {item_id}: {len(ids)} versiones renumeradas")
+
+            if not duplicados:
+                print("ℹ️  No hay números de versión duplicados")
+
+            # 3. Inicializar el contador con el máximo actual
+            resultado = db.session.execute(text(
+                "UPDATE item SET ultima_version = COALESCE("
+                "(SELECT MAX(v.numero_version) FROM version v WHERE v.item_id = item.id), 0)"
+            ))
+            print(f"✅ Contador inicializado en {resultado.rowcount} item(s)")
+
+            # 4. Índice único
+            db.session.execute(text(
+                'CREATE UNIQUE INDEX IF NOT EXISTS uq_version_item_numero ON version (item_id, numero_version)'
+            ))
+            print("✅ Índice único 'uq_version_item_numero' verificado")
+
+            db.session.commit()
+            print("-" * 60)
+            print("✅ Migración completada")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n❌ ERROR durante la migración:")
+            print(f"   {str(e)}")
+            print("\n💡 Solución:")
+            print("   - Verifica que el archivo models.py esté actualizado")
+            print("   - Asegúrate de que la base de datos no esté en uso")
+            return False
+
+        return True
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("🚀 MIGRACIÓN DE BASE DE DATOS - INVENTECH")
+    print("=" * 60)
+    print()
+
+    success = migrate()
+
+    print()
+    print("=" * 60)
+    if success:
+        print("✅ MIGRACIÓN EXITOSA")
+    else:
+        print("❌ MIGRACIÓN FALLIDA")
+    print("=" * 60)
+    sys.exit(0 if success else 1)
@@ -2,7 +2,8 @@ import os
 from app import create_app, db
 from app.models import (
     Usuario, Item, SLA, Metrica, Alerta, Aprobacion, 
-    Version, Persona, Incidencia, AlertaIncidencia, ServicioAfectado
+    Version, Persona, Incidencia, AlertaIncidencia, ServicioAfectado,
+    MetricaResumen, VersionContenido
 )
 from dotenv import load_dotenv
 
@@ -27,7 +28,9 @@ def make_shell_context():
         'Persona': Persona,
         'Incidencia': Incidencia,
         'AlertaIncidencia': AlertaIncidencia,
-        'ServicioAfectado': ServicioAfectado
+        'ServicioAfectado': ServicioAfectado,
+        'MetricaResumen': MetricaResumen,
+        'VersionContenido': VersionContenido
     }
 
 if __name__ == '__main__':
@@ -0,0 +1,78 @@
+"""
+Fixtures de las pruebas: la aplicación con SQLite en un directorio temporal
+(sin scheduler ni bus de invalidación) y una base vacía por prueba.
+"""
+import os
+import tempfile
+
+import pytest
+
+# config.py lee el entorno al importarse
+_DIRECTORIO = tempfile.mkdtemp(prefix='inventech-pruebas-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_DIRECTORIO, 'pruebas.db')
+os.environ['INVALIDACION_ACTIVA'] = 'false'
+os.environ['CREAR_TABLAS_AL_INICIAR'] = 'false'
+os.environ.pop('ENABLE_SCHEDULER', None)
+
+from app import create_app, db  # noqa: E402
+from app.invalidacion import TODO, _despachar  # noqa: E402
+from app.models import Usuario, Persona, Item  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def app():
+    app = create_app('development', crear_tablas=False, iniciar_tareas=False)
+    app.config.update(TESTING=True, SCHEDULER_ACTIVO=False, NOTIFICACIONES_MODO='inmediato')
+    app.extensions['mail'].suppress = True
+    return app
+
+
+@pytest.fixture(autouse=True)
+def bd(app):
+    """Base vacía y cachés del worker descartadas (los contadores de versión vuelven a empezar)"""
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        _despachar({TODO}, local=False)
+        yield db
+        db.session.remove()
+
+
+@pytest.fixture
+def usuarios(bd):
+    """Gerente, jefe TI y técnico (los dos últimos con correo)"""
+    creados = {}
+    for username, rol, correo in (('gerente', 'gerente', None), ('jefe', 'jefe_ti', 'jefe@inventech.test'),
+                                  ('tecnico', 'tecnico', 'tecnico@inventech.test')):
+        usuario = Usuario(username=username, rol=rol)
+        usuario.set_password('clave')
+        db.session.add(usuario)
+        db.session.flush()
+        if correo:
+            db.session.add(Persona(usuario_id=usuario.id, nombres=username.title(), apellidos='Prueba',
+                                   correo=correo))
+        creados[username] = usuario
+    db.session.commit()
+    return creados
+
+
+@pytest.fixture
+def crear_item(bd):
+    def crear(codigo='P01', tipo='producto', **campos):
+        campos.setdefault('estado', 'aprobado')
+        item = Item(codigo=codigo, nombre=f'Item {codigo}', tipo=tipo, categoria=campos.pop('categoria', 'PC'),
+                    **campos)
+        db.session.add(item)
+        db.session.commit()
+        return item
+    return crear
+
+
+@pytest.fixture
+def cliente(app, usuarios):
+    cliente = app.test_client()
+
+    def login(username):
+        cliente.post('/login', data={'username': username, 'password': 'clave'})
+    cliente.login = login
+    return cliente
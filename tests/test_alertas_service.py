@@ -0,0 +1,108 @@
+from types import SimpleNamespace
+
+from app import db
+from app.models import Alerta, Metrica
+from app.alertas_service import historial_metricas, evaluar_alertas_periodo, _cumple
+
+
+def metrica(item, anio, mes, semaforo, incidencias=0, porcentaje=50.0):
+    db.session.add(Metrica(item_id=item.id, anio=anio, mes=mes, semaforo=semaforo, incidencias=incidencias,
+                           porcentaje_cumplimiento=porcentaje))
+    db.session.commit()
+
+
+def tipos_generados(resultado):
+    return sorted(alerta.tipo for alerta in resultado['generadas'])
+
+
+def test_cumple_condiciones():
+    rojo, verde = SimpleNamespace(semaforo='rojo', incidencias=6), SimpleNamespace(semaforo='verde', incidencias=0)
+
+    assert _cumple({'semaforo': 'rojo', 'meses': 2}, [rojo, rojo, verde])
+    assert not _cumple({'semaforo': 'rojo', 'meses': 2}, [rojo, None, rojo])
+    assert _cumple({'semaforo': 'rojo', 'meses': 1, 'sin_previo': 'rojo'}, [rojo, verde, None])
+    assert not _cumple({'semaforo': 'rojo', 'meses': 1, 'sin_previo': 'rojo'}, [rojo, verde, rojo])
+    assert _cumple({'incidencias_min': 5}, [rojo, None, None])
+    assert not _cumple({'incidencias_min': 5}, [verde, None, None])
+
+
+def test_historial_por_meses_con_huecos(crear_item):
+    item = crear_item()
+    metrica(item, 2025, 1, 'rojo')
+    metrica(item, 2024, 11, 'verde')
+    otro = crear_item('P02')
+    metrica(otro, 2024, 12, 'rojo')
+
+    historial = historial_metricas(2025, 1)
+
+    # Solo los items con métrica en el mes evaluado; None en los meses sin métrica
+    assert list(historial) == [item.id]
+    meses = historial[item.id]
+    assert [m and (m.anio, m.mes, m.semaforo) for m in meses] == [(2025, 1, 'rojo'), None, (2024, 11, 'verde')]
+
+
+def test_rojo_por_primera_vez(crear_item):
+    item = crear_item()
+    metrica(item, 2025, 2, 'verde')
+    metrica(item, 2025, 3, 'rojo', incidencias=2, porcentaje=40.0)
+
+    resultado = evaluar_alertas_periodo(2025, 3, notificar=False)
+
+    assert resultado['evaluados'] == 1
+    assert tipos_generados(resultado) == ['rojo_inmediato']
+    alerta = resultado['generadas'][0]
+    assert alerta.nivel_urgencia == 'critica' and alerta.estado == 'activa'
+    assert 'P01' in alerta.mensaje and 'Incidencias: 2' in alerta.mensaje
+
+
+def test_rojo_persistente_escala(crear_item):
+    item = crear_item()
+    for mes in (1, 2, 3):
+        metrica(item, 2025, mes, 'rojo', incidencias=6)
+
+    resultado = evaluar_alertas_periodo(2025, 3, notificar=False)
+
+    # sin_previo descarta rojo_inmediato; el resto de niveles aplican a la vez
+    assert tipos_generados(resultado) == ['incidencias_masivas', 'rojo_mes2', 'rojo_mes3']
+
+
+def test_no_duplica_alertas_activas(crear_item):
+    item = crear_item()
+    metrica(item, 2025, 1, 'amarillo')
+    metrica(item, 2025, 2, 'amarillo')
+
+    primera = evaluar_alertas_periodo(2025, 2, notificar=False)
+    segunda = evaluar_alertas_periodo(2025, 2, notificar=False)
+
+    assert tipos_generados(primera) == ['amarillo_recurrente']
+    assert segunda['generadas'] == [] and segunda['omitidas'] == 1
+    assert Alerta.query.count() == 1
+
+    # Resuelta, la regla vuelve a generar la alerta
+    Alerta.query.one().estado = 'resuelta'
+    db.session.commit()
+    assert tipos_generados(evaluar_alertas_periodo(2025, 2, notificar=False)) == ['amarillo_recurrente']
+
+
+def test_reglas_desde_la_configuracion(app, crear_item):
+    item = crear_item()
+    metrica(item, 2025, 5, 'verde', incidencias=1)
+    app.config['REGLAS_ALERTA'] = [{
+        'tipo': 'cualquier_incidencia',
+        'nivel_urgencia': 'baja',
+        'condicion': {'incidencias_min': 1},
+        'mensaje': '{codigo}: {incidencias} incidencia(s) en {mes}/{anio}',
+    }]
+    try:
+        resultado = evaluar_alertas_periodo(2025, 5, notificar=False)
+    finally:
+        app.config.pop('REGLAS_ALERTA')
+
+    assert [(a.tipo, a.nivel_urgencia, a.mensaje) for a in resultado['generadas']] == [
+        ('cualquier_incidencia', 'baja', 'P01: 1 incidencia(s) en 5/2025')
+    ]
+
+
+def test_sin_metricas_no_evalua(crear_item):
+    crear_item()
+    assert evaluar_alertas_periodo(2025, 1, notificar=False) == {'evaluados': 0, 'generadas': [], 'omitidas': 0}
@@ -0,0 +1,83 @@
+from sqlalchemy import text
+
+from app import db
+from app.cambios import versiones_tablas, registrar_cambios
+from app.models import Item
+
+
+def version(tabla):
+    return versiones_tablas([tabla])[tabla][0]
+
+
+def test_commit_incrementa_una_vez_por_transaccion(crear_item):
+    item = crear_item()
+    antes = version('item')
+
+    item.nombre = 'Primer cambio'
+    db.session.flush()
+    item.categoria = 'Servidores'
+    db.session.flush()
+    db.session.commit()
+
+    assert version('item') == antes + 1
+
+
+def test_rollback_no_incrementa(crear_item):
+    item = crear_item()
+    antes = version('item')
+
+    item.nombre = 'Descartado'
+    db.session.flush()
+    db.session.rollback()
+    db.session.commit()
+
+    assert version('item') == antes
+
+
+def test_objeto_sin_cambios_reales_no_incrementa(crear_item):
+    item = crear_item()
+    antes = version('item')
+
+    item.nombre = item.nombre
+    db.session.commit()
+
+    assert version('item') == antes
+
+
+def test_sql_directo_incrementa_al_confirmar(crear_item):
+    item = crear_item()
+    antes = version('item')
+
+    connection = db.session.connection()
+    connection.execute(text('UPDATE item SET nombre = :nombre WHERE id = :id'), {'nombre': 'SQL', 'id': item.id})
+    registrar_cambios(connection, ['item'])
+    assert version('item') == antes
+
+    db.session.commit()
+    assert version('item') == antes + 1
+
+
+def test_etag_responde_304_hasta_que_cambia_la_tabla(cliente, crear_item):
+    crear_item()
+    cliente.login('jefe')
+
+    respuesta = cliente.get('/api/items-activos')
+    assert respuesta.status_code == 200
+    etag = respuesta.headers['ETag']
+
+    assert cliente.get('/api/items-activos', headers={'If-None-Match': etag}).status_code == 304
+
+    item = db.session.get(Item, 1)
+    item.nombre = 'Renombrado'
+    db.session.commit()
+
+    respuesta = cliente.get('/api/items-activos', headers={'If-None-Match': etag})
+    assert respuesta.status_code == 200
+    assert respuesta.headers['ETag'] != etag
+    assert 'Renombrado' in respuesta.get_data(as_text=True)
+
+
+def test_etag_sin_sesion_no_se_evalua(app, crear_item):
+    respuesta = app.test_client().get('/api/items-activos')
+    assert respuesta.status_code == 401
+    assert 'ETag' not in respuesta.headers
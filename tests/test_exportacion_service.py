@@ -0,0 +1,146 @@
+import csv
+import hashlib
+import io
+import zipfile
+import xml.etree.ElementTree as ET
+from datetime import datetime, date, timedelta
+
+from app import db
+from app.models import Alerta, AlertaArchivo
+from app import exportacion_service
+from app.exportacion_service import generar_csv, generar_xlsx, leer_en_lotes, respuesta_exportacion
+
+NS = {'s': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+
+COLUMNAS = [
+    ('ID', lambda f: f['id']),
+    ('Nombre', lambda f: f['nombre']),
+    ('Fecha', lambda f: f['fecha']),
+    ('Activo', lambda f: f['activo']),
+]
+
+FILAS = [
+    {'id': 1, 'nombre': 'Servidor, "principal"', 'fecha': datetime(2025, 3, 1, 8, 30), 'activo': True},
+    {'id': 2, 'nombre': 'Línea\nnueva <&>', 'fecha': date(2025, 3, 2), 'activo': False},
+    {'id': 3, 'nombre': None, 'fecha': None, 'activo': None},
+]
+
+
+def leer_csv(bloques):
+    texto = b''.join(bloques).decode('utf-8')
+    assert texto.startswith('\ufeff')
+    return list(csv.reader(io.StringIO(texto[1:])))
+
+
+def leer_xlsx(bloques):
+    archivo = zipfile.ZipFile(io.BytesIO(b''.join(bloques)))
+    assert archivo.testzip() is None
+    hoja = ET.fromstring(archivo.read('xl/worksheets/sheet1.xml'))
+    filas = []
+    for fila in hoja.iterfind('s:sheetData/s:row', NS):
+        celdas = []
+        for celda in fila.iterfind('s:c', NS):
+            texto = celda.find('s:is/s:t', NS)
+            valor = celda.find('s:v', NS)
+            celdas.append((celda.get('t'), celda.get('s'),
+                           texto.text if texto is not None else valor.text if valor is not None else None))
+        filas.append(celdas)
+    return archivo, filas
+
+
+def test_csv():
+    filas = leer_csv(generar_csv(COLUMNAS, FILAS))
+
+    assert filas == [
+        ['ID', 'Nombre', 'Fecha', 'Activo'],
+        ['1', 'Servidor, "principal"', '2025-03-01 08:30:00', 'True'],
+        ['2', 'Línea\nnueva <&>', '2025-03-02', 'False'],
+        ['3', '', '', ''],
+    ]
+
+
+def test_csv_por_bloques(monkeypatch):
+    monkeypatch.setattr(exportacion_service, 'FILAS_POR_ENVIO', 2)
+    filas = [{'id': n, 'nombre': f'fila {n}', 'fecha': None, 'activo': True} for n in range(5)]
+
+    bloques = list(generar_csv(COLUMNAS, iter(filas)))
+
+    # Encabezado + 2 filas, 2 filas, 1 fila
+    assert len(bloques) == 3
+    assert [f[0] for f in leer_csv(bloques)[1:]] == ['0', '1', '2', '3', '4']
+
+
+def test_xlsx():
+    archivo, filas = leer_xlsx(generar_xlsx(COLUMNAS, FILAS, 'Una hoja con un nombre demasiado largo'))
+
+    assert filas[0] == [('inlineStr', '2', titulo) for titulo, _ in COLUMNAS]
+    assert filas[1] == [(None, None, '1'), ('inlineStr', None, 'Servidor, "principal"'),
+                        (None, '1', '45717.354167'), ('b', None, '1')]
+    assert filas[2][1] == ('inlineStr', None, 'Línea\nnueva <&>')
+    assert filas[2][2] == (None, '1', '45718.000000')
+    assert filas[3] == [(None, None, '3')] + [(None, None, None)] * 3
+
+    libro = ET.fromstring(archivo.read('xl/workbook.xml'))
+    assert libro.find('s:sheets/s:sheet', NS).get('name') == 'Una hoja con un nombre demasiad'
+
+
+def test_xlsx_quita_caracteres_de_control():
+    _, filas = leer_xlsx(generar_xlsx([('Texto', lambda f: f)], ['a\x00b\x1fc\td']))
+    assert filas[1] == [('inlineStr', None, 'abc\td')]
+
+
+def test_xlsx_muchas_filas_en_flujo(monkeypatch):
+    monkeypatch.setattr(exportacion_service, 'FILAS_POR_ENVIO', 10)
+    # Contenido poco comprimible: el ZIP entrega datos mientras se escriben las filas
+    filas = ({'id': n, 'nombre': hashlib.sha256(str(n).encode()).hexdigest(), 'fecha': None, 'activo': True}
+             for n in range(2000))
+
+    bloques = list(generar_xlsx(COLUMNAS, filas))
+
+    assert len(bloques) > 3
+    _, leidas = leer_xlsx(bloques)
+    assert len(leidas) == 2001 and leidas[-1][0] == (None, None, '1999')
+
+
+def test_respuesta_exportacion(app):
+    with app.test_request_context():
+        respuesta = respuesta_exportacion('xlsx', 'alertas', COLUMNAS, FILAS)
+        assert respuesta.mimetype == 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        assert respuesta.headers['Content-Disposition'].endswith('.xlsx"')
+
+        # Cualquier otro formato se exporta como CSV
+        respuesta = respuesta_exportacion('pdf', 'alertas', COLUMNAS, FILAS)
+        assert respuesta.mimetype == 'text/csv'
+        assert respuesta.headers['Content-Disposition'].startswith('attachment; filename="alertas_')
+
+
+def test_leer_en_lotes_recorre_las_consultas_en_orden(crear_item):
+    item = crear_item()
+    base = datetime(2025, 1, 1)
+    db.session.add_all(Alerta(item_id=item.id, tipo='t', mensaje=f'a{n}', estado='activa',
+                              fecha_creacion=base + timedelta(days=n)) for n in range(5))
+    db.session.commit()
+
+    filas = leer_en_lotes(Alerta.query.order_by(Alerta.fecha_creacion.desc()),
+                          Alerta.query.filter(Alerta.mensaje == 'a0'), lote=2)
+
+    assert [a.mensaje for a in filas] == ['a4', 'a3', 'a2', 'a1', 'a0', 'a0']
+
+
+def test_exportar_alertas_con_archivo(cliente, crear_item):
+    item = crear_item()
+    base = datetime(2024, 1, 1)
+    db.session.add(Alerta(item_id=item.id, tipo='t', mensaje='vigente', estado='activa', fecha_creacion=base))
+    db.session.add_all(AlertaArchivo(id=100 + n, item_id=item.id, tipo='t', mensaje=f'archivada {n}',
+                                     estado='resuelta', fecha_creacion=base - timedelta(days=n),
+                                     fecha_archivo=base) for n in (2, 1, 3))
+    db.session.commit()
+    cliente.login('jefe')
+
+    filas = leer_csv([cliente.get('/alertas/exportar/csv?incluir_archivo=1').data])
+
+    encabezado = filas[0]
+    mensajes = [f[encabezado.index('Mensaje')] for f in filas[1:]]
+    assert mensajes == ['vigente', 'archivada 1', 'archivada 2', 'archivada 3']
+    assert [f[encabezado.index('Código')] for f in filas[1:]] == ['P01'] * 4
+    assert [f[encabezado.index('Archivada')] for f in filas[1:]] == ['No', 'Sí', 'Sí', 'Sí']
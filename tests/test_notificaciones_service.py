@@ -0,0 +1,128 @@
+from datetime import datetime
+
+import flask_mail
+import pytest
+
+from app import db, mail
+from app.models import Alerta, NotificacionPendiente
+from app.notificaciones_service import envio_inmediato, encolar_notificacion, enviar_resumenes
+
+
+@pytest.fixture
+def modo_resumen(app):
+    app.config.update(NOTIFICACIONES_MODO='resumen', SCHEDULER_ACTIVO=True, NOTIFICACIONES_CRITICAS_INMEDIATAS=True)
+    yield
+    app.config.update(NOTIFICACIONES_MODO='inmediato', SCHEDULER_ACTIVO=False, MAIL_ALERTAS_ENVIO='bcc')
+
+
+def alerta_de(item, mensaje, nivel='media'):
+    alerta = Alerta(item_id=item.id, tipo='prueba', mensaje=mensaje, estado='activa', nivel_urgencia=nivel,
+                    fecha_creacion=datetime.utcnow())
+    db.session.add(alerta)
+    db.session.commit()
+    return alerta
+
+
+def pendientes():
+    return sorted((f.alerta_id, f.destinatario) for f in NotificacionPendiente.query)
+
+
+def test_envio_inmediato_segun_modo(app, crear_item):
+    item = crear_item()
+    media, critica = alerta_de(item, 'm'), alerta_de(item, 'c', nivel='critica')
+    assert envio_inmediato(media) and envio_inmediato(critica)
+
+    app.config.update(NOTIFICACIONES_MODO='resumen')
+    # Sin scheduler el resumen nunca se enviaría
+    assert envio_inmediato(media)
+
+    app.config.update(SCHEDULER_ACTIVO=True)
+    try:
+        assert not envio_inmediato(media)
+        assert envio_inmediato(critica)
+        app.config['NOTIFICACIONES_CRITICAS_INMEDIATAS'] = False
+        assert not envio_inmediato(critica)
+    finally:
+        app.config.update(NOTIFICACIONES_MODO='inmediato', SCHEDULER_ACTIVO=False,
+                          NOTIFICACIONES_CRITICAS_INMEDIATAS=True)
+
+
+def test_resumen_agrupa_destinatarios_con_las_mismas_alertas(modo_resumen, crear_item):
+    item = crear_item()
+    primera, segunda = alerta_de(item, 'primera alerta'), alerta_de(item, 'segunda alerta', nivel='alta')
+    encolar_notificacion(primera, ['a@x.test', 'b@x.test', 'c@x.test'])
+    encolar_notificacion(segunda, ['a@x.test', 'b@x.test'])
+
+    with mail.record_messages() as enviados:
+        resultado = enviar_resumenes()
+
+    assert resultado == {'destinatarios': 3, 'correos': 2, 'alertas': 2}
+    resumen, = [m for m in enviados if 'Resumen de 2 alertas' in m.subject]
+    assert sorted(resumen.bcc) == ['a@x.test', 'b@x.test']
+    # Ordenadas por urgencia: la 'alta' primero
+    assert resumen.html.index('segunda alerta') < resumen.html.index('primera alerta')
+    individual, = [m for m in enviados if m is not resumen]
+    assert individual.bcc == ['c@x.test'] and 'primera alerta' in individual.html
+    assert pendientes() == []
+
+
+def test_resumen_omite_alertas_resueltas(modo_resumen, crear_item):
+    item = crear_item()
+    activa, resuelta = alerta_de(item, 'sigue activa'), alerta_de(item, 'ya resuelta')
+    for alerta in (activa, resuelta):
+        encolar_notificacion(alerta, ['a@x.test'])
+    resuelta.estado = 'resuelta'
+    db.session.commit()
+
+    with mail.record_messages() as enviados:
+        enviar_resumenes()
+
+    mensaje, = enviados
+    assert 'sigue activa' in mensaje.html and 'ya resuelta' not in mensaje.html
+    assert pendientes() == []
+
+
+def test_fallo_smtp_conserva_las_filas(modo_resumen, crear_item, monkeypatch):
+    item = crear_item()
+    alerta = alerta_de(item, 'alerta')
+    encolar_notificacion(alerta, ['a@x.test'])
+
+    def sin_servidor():
+        raise OSError('SMTP no disponible')
+    monkeypatch.setattr(mail, 'connect', sin_servidor)
+
+    assert enviar_resumenes()['correos'] == 0
+    assert pendientes() == [(alerta.id, 'a@x.test')]
+
+    monkeypatch.undo()
+    assert enviar_resumenes()['correos'] == 1
+    assert pendientes() == []
+
+
+def test_envio_parcial_conserva_solo_los_fallidos(app, modo_resumen, crear_item, monkeypatch):
+    app.config['MAIL_ALERTAS_ENVIO'] = 'individual'
+    item = crear_item()
+    alerta = alerta_de(item, 'alerta')
+    encolar_notificacion(alerta, ['a@x.test', 'b@x.test', 'c@x.test'])
+
+    enviar = flask_mail.Connection.send
+
+    def falla_con_b(self, mensaje, *args, **kwargs):
+        if mensaje.recipients == ['b@x.test']:
+            raise OSError('buzón lleno')
+        return enviar(self, mensaje, *args, **kwargs)
+    monkeypatch.setattr(flask_mail.Connection, 'send', falla_con_b)
+
+    enviar_resumenes()
+
+    # Los mensajes salen en orden por una conexión: a@ salió, b@ falló y c@ no se intentó
+    assert pendientes() == [(alerta.id, 'b@x.test'), (alerta.id, 'c@x.test')]
+
+
+def test_resumen_respeta_la_fecha_de_corte(modo_resumen, crear_item):
+    item = crear_item()
+    alerta = alerta_de(item, 'alerta')
+    encolar_notificacion(alerta, ['a@x.test'])
+
+    assert enviar_resumenes(hasta=datetime(2000, 1, 1)) == {'destinatarios': 0, 'correos': 0, 'alertas': 0}
+    assert pendientes() == [(alerta.id, 'a@x.test')]
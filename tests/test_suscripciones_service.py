@@ -0,0 +1,85 @@
+import pytest
+
+from app import db
+from app.models import Alerta
+from app.suscripciones_service import (
+    claves_alerta, destinatarios_alerta, suscribir_usuario, validar_suscripcion
+)
+
+
+def alerta_de(item, nivel='alta'):
+    alerta = Alerta(item_id=item.id, tipo='prueba', mensaje='m', estado='activa', nivel_urgencia=nivel)
+    db.session.add(alerta)
+    db.session.commit()
+    return alerta
+
+
+def usernames(alerta, item):
+    return [d.username for d in destinatarios_alerta(alerta, item)]
+
+
+def test_claves_de_la_alerta(crear_item):
+    item = crear_item(categoria='Redes')
+    alerta = alerta_de(item, nivel='critica')
+
+    assert claves_alerta(alerta, item) == (
+        ('item', str(item.id)), ('tipo', 'producto'), ('urgencia', 'critica'), ('categoria', 'Redes')
+    )
+
+
+def test_sin_suscripciones_reciben_tecnicos_y_jefes(usuarios, crear_item):
+    item = crear_item()
+    destinatarios = destinatarios_alerta(alerta_de(item), item)
+
+    assert [d.username for d in destinatarios] == ['jefe', 'tecnico']
+    assert destinatarios[1].correo == 'tecnico@inventech.test'
+
+
+def test_suscripcion_filtra_al_usuario(usuarios, crear_item):
+    pc = crear_item('P01', categoria='PC')
+    redes = crear_item('P02', categoria='Redes')
+    suscribir_usuario(usuarios['tecnico'].id, 'categoria', 'Redes')
+    suscribir_usuario(usuarios['gerente'].id, 'urgencia', 'critica')
+
+    assert usernames(alerta_de(pc), pc) == ['jefe']
+    assert usernames(alerta_de(redes), redes) == ['jefe', 'tecnico']
+    assert usernames(alerta_de(pc, nivel='critica'), pc) == ['gerente', 'jefe']
+
+
+def test_solo_suscritos_sin_valor_por_defecto(app, usuarios, crear_item):
+    item = crear_item()
+    suscribir_usuario(usuarios['tecnico'].id, 'item', str(item.id))
+    app.config['SUSCRIPCIONES_TODAS_POR_DEFECTO'] = False
+    try:
+        assert usernames(alerta_de(item), item) == ['tecnico']
+    finally:
+        app.config['SUSCRIPCIONES_TODAS_POR_DEFECTO'] = True
+
+
+def test_la_cache_se_invalida_al_suscribir(usuarios, crear_item):
+    item = crear_item()
+    alerta = alerta_de(item)
+    assert usernames(alerta, item) == ['jefe', 'tecnico']
+
+    suscribir_usuario(usuarios['tecnico'].id, 'tipo', 'servicio')
+
+    assert usernames(alerta, item) == ['jefe']
+
+
+def test_suscribir_dos_veces_devuelve_la_misma(usuarios):
+    primera = suscribir_usuario(usuarios['tecnico'].id, 'tipo', ' producto ')
+    segunda = suscribir_usuario(usuarios['tecnico'].id, 'tipo', 'producto')
+    assert primera.id == segunda.id and primera.valor == 'producto'
+
+
+@pytest.mark.parametrize('ambito, valor, mensaje', [
+    ('color', 'rojo', 'Ámbito inválido'),
+    ('tipo', '', 'Indique el valor'),
+    ('tipo', 'hardware', 'Tipo inválido'),
+    ('urgencia', 'urgente', 'Nivel de urgencia inválido'),
+    ('item', '999', 'El item no existe'),
+    ('item', 'abc', 'El item no existe'),
+])
+def test_validar_suscripcion(ambito, valor, mensaje):
+    with pytest.raises(ValueError, match=mensaje):
+        validar_suscripcion(ambito, valor)
@@ -0,0 +1,108 @@
+import pytest
+
+from app import db
+from app.models import Version, VersionContenido
+from app import versiones_service
+from app.versiones_service import (
+    codificar_delta, aplicar_delta, registrar_version, valores_versiones, valores_version,
+    reservar_numeros_version, VISTA_PREVIA
+)
+
+
+@pytest.mark.parametrize('anterior, nuevo', [
+    ('', ''),
+    ('', 'texto nuevo'),
+    ('texto viejo', ''),
+    ('abcdef', 'abcdef'),
+    ('el item funciona bien', 'el item funciona mal'),
+    ('inicio compartido y final', 'inicio distinto y final'),
+    ('aaaa', 'aaaaaaaa'),
+    ('línea 1\nlínea 2\nlínea 3', 'línea 0\nlínea 1\nlínea 3\nlínea 4'),
+])
+def test_delta_ida_y_vuelta(anterior, nuevo):
+    assert aplicar_delta(anterior, codificar_delta(anterior, nuevo)) == nuevo
+
+
+def test_delta_copia_los_tramos_comunes():
+    anterior = 'x' * 1000 + 'medio' + 'y' * 1000
+    operaciones = codificar_delta(anterior, 'x' * 1000 + 'MEDIO' + 'y' * 1000)
+    assert operaciones == [[0, 1000], 'MEDIO', [1005, 2005]]
+
+
+def test_delta_tramo_grande_sin_comparar(monkeypatch):
+    monkeypatch.setattr(versiones_service, 'MAX_COMPARACION', 10)
+    anterior, nuevo = 'a-bcdefgh-z', 'a-hgfedcb-z'
+    operaciones = codificar_delta(anterior, nuevo)
+    assert 'hgfedcb' in operaciones
+    assert aplicar_delta(anterior, operaciones) == nuevo
+
+
+def _editar(item, valores, usuario_id=None):
+    versiones = []
+    for anterior, nuevo in zip(valores, valores[1:]):
+        numero = reservar_numeros_version(item.id)
+        versiones.append(registrar_version(item.id, numero, 'Definición', anterior, nuevo, 'prueba', usuario_id))
+    db.session.commit()
+    return versiones
+
+
+def test_historial_reconstruye_valores_completos(app, crear_item):
+    app.config['VERSIONES_SNAPSHOT_CADA'] = 3
+    item = crear_item()
+    base = 'Descripción larga del item. ' * 40
+    valores = [base] + [base + f'Cambio {n}. ' * n for n in range(1, 8)]
+
+    versiones = _editar(item, valores)
+
+    assert [v.numero_version for v in versiones] == list(range(1, 8))
+    resultado = valores_versiones(versiones)
+    for version, anterior, nuevo in zip(versiones, valores, valores[1:]):
+        assert resultado[version.id] == {'campo': 'Definición', 'anterior': anterior, 'nuevo': nuevo,
+                                         'completo': True}
+
+    # La cadena alterna snapshots y deltas
+    entradas = VersionContenido.query.filter_by(item_id=item.id).order_by(VersionContenido.id).all()
+    assert any(not e.es_snapshot for e in entradas)
+    assert all(e.profundidad < 3 for e in entradas)
+
+
+def test_vista_previa_y_version_suelta(crear_item):
+    item = crear_item()
+    largo = 'z' * (VISTA_PREVIA * 2)
+    version, = _editar(item, ['corto', largo])
+
+    assert len(version.valor_nuevo) == VISTA_PREVIA
+    assert valores_version(version) == ('corto', largo, True)
+
+
+def test_cambio_fuera_del_historial_reinicia_la_cadena(crear_item):
+    item = crear_item()
+    _editar(item, ['uno', 'dos'])
+    # El valor actual ya no es el último registrado
+    version, = _editar(item, ['editado a mano', 'tres'])
+
+    assert valores_version(version) == ('editado a mano', 'tres', True)
+
+
+def test_version_sin_contenido_devuelve_la_vista_previa(crear_item):
+    item = crear_item()
+    version = Version(item_id=item.id, numero_version=1, campo_modificado='Nombre',
+                      valor_anterior='antes', valor_nuevo='después')
+    db.session.add(version)
+    db.session.commit()
+
+    assert valores_version(version) == ('antes', 'después', False)
+
+
+def test_reservar_numeros_consecutivos(crear_item):
+    item = crear_item()
+    assert reservar_numeros_version(item.id) == 1
+    assert reservar_numeros_version(item.id, cantidad=3) == 2
+    assert reservar_numeros_version(item.id) == 5
+    db.session.commit()
+    assert item.ultima_version == 5
+
+
+def test_reservar_numero_item_inexistente():
+    with pytest.raises(ValueError):
+        reservar_numeros_version(999)